@@ -0,0 +1,127 @@
+"""Compare reading objects through `Git.odb` with `git cat-file` on a synthetic repo.
+
+>>> python benchmarks/odb.py                      # ~1M objects, takes a few minutes to generate
+>>> python benchmarks/odb.py --objects 100000 --sample 5000"""
+
+import argparse
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from pathier import Pathier
+
+root = Pathier(__file__).parent
+sys.path.insert(0, str(root.parent / "src"))
+sys.path.insert(0, str(root))
+
+from synthetic import RepoSpec, make_repo
+
+from gitbetter import Git
+
+# Each generated commit adds about this many objects (the commit, ~3 blobs, and the trees above them)
+OBJECTS_PER_COMMIT = 8
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark Git.odb against git cat-file."
+    )
+    parser.add_argument(
+        "-o",
+        "--objects",
+        type=int,
+        default=1_000_000,
+        help="Approximate number of objects to generate. Default 1,000,000.",
+    )
+    parser.add_argument(
+        "-s",
+        "--sample",
+        type=int,
+        default=20_000,
+        help="Number of random objects to read. Default 20,000.",
+    )
+    parser.add_argument(
+        "--spawn-sample",
+        type=int,
+        default=200,
+        help="Number of objects to read with one `git cat-file -p` process each. Default 200.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def all_shas(repo: Pathier) -> list[str]:
+    return subprocess.run(
+        [
+            "git",
+            "cat-file",
+            "--batch-all-objects",
+            "--batch-check=%(objectname)",
+        ],
+        cwd=repo,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+
+
+def report(name: str, count: int, elapsed: float):
+    print(
+        f"{name:<28} {count:>8} objects {elapsed:>8.3f}s {count / elapsed:>12,.0f} objects/s"
+    )
+
+
+def main(args: argparse.Namespace | None = None):
+    if not args:
+        args = get_args()
+    commits = max(1, args.objects // OBJECTS_PER_COMMIT)
+    spec = RepoSpec(
+        commits=commits,
+        files=max(100, commits // 20),
+        branches=0,
+        tags=0,
+        binary_blobs=0,
+        seed=args.seed,
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        repo = make_repo(Pathier(tmp) / "repo", spec)
+        shas = all_shas(repo)
+        print(f"Generated {len(shas):,} objects in {time.perf_counter() - start:.1f}s")
+        rng = random.Random(args.seed)
+        sample = rng.sample(shas, min(args.sample, len(shas)))
+        with Git(True, cwd=repo) as git:
+            odb = git.odb
+            start = time.perf_counter()
+            for sha in sample:
+                odb.read(sha)
+            report("Git.odb.read", len(sample), time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for sha in sample:
+                odb.info(sha)
+            report("Git.odb.info", len(sample), time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in git.read_many(sample):
+                pass
+            report("cat-file --batch", len(sample), time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for sha in sample:
+                git.object_info(sha)
+            report("cat-file --batch-check", len(sample), time.perf_counter() - start)
+
+            spawned = sample[: args.spawn_sample]
+            start = time.perf_counter()
+            for sha in spawned:
+                subprocess.run(
+                    ["git", "cat-file", "-p", sha], cwd=repo, capture_output=True
+                )
+            report("cat-file -p per object", len(spawned), time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Time gitbetter's wrappers against a synthetic repo and compare them to a stored baseline.
+
+>>> python benchmarks/run.py --save          # record a baseline for this machine
+>>> python benchmarks/run.py                 # compare against benchmarks/baseline.json
+
+Baselines are machine specific, so `benchmarks/baseline.json` isn't committed.
+>>> python benchmarks/run.py --size medium -n 20 -t 0.5"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from pathier import Pathier
+
+root = Pathier(__file__).parent
+sys.path.insert(0, str(root.parent / "src"))
+sys.path.insert(0, str(root))
+
+from synthetic import SIZES, make_repo
+
+from gitbetter import Git
+
+TOUCHED_FILES = 100
+
+
+@dataclass
+class Case:
+    """A timed operation.
+
+    #### Fields:
+    * `name: str`
+    * `run: Callable[[Pathier], object]` (the timed part)
+    * `setup: Callable[[Pathier], None]` (untimed, before every run)
+    * `teardown: Callable[[Pathier], None]` (untimed, after every run, must restore the repo)
+    """
+
+    name: str
+    run: Callable[[Pathier], object]
+    setup: Callable[[Pathier], None] = field(default=lambda repo: None)
+    teardown: Callable[[Pathier], None] = field(default=lambda repo: None)
+
+
+def git(repo: Pathier, *args: str):
+    subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+
+def touched(repo: Pathier) -> list[str]:
+    return sorted(
+        path.relative_to(repo).as_posix() for path in (repo / "dir0").glob("*.txt")
+    )[:TOUCHED_FILES]
+
+
+def modify(repo: Pathier):
+    for path in touched(repo):
+        with open(repo / path, "a") as file:
+            file.write("benchmark\n")
+
+
+def reset(repo: Pathier):
+    git(repo, "reset", "-q", "--hard", "main")
+
+
+def undo_commit(repo: Pathier):
+    git(repo, "reset", "-q", "--hard", "HEAD~1")
+
+
+def make_feature_branch(repo: Pathier):
+    git(repo, "switch", "-q", "-c", "bench-feature")
+    modify(repo)
+    git(repo, "commit", "-q", "-am", "feature")
+
+
+def undo_merge(repo: Pathier):
+    git(repo, "switch", "-q", "main")
+    git(repo, "reset", "-q", "--hard", "ORIG_HEAD")
+    git(repo, "branch", "-q", "-D", "bench-feature")
+
+
+def startup(repo: Pathier):
+    env = dict(os.environ, PYTHONPATH=str(root.parent / "src"))
+    subprocess.run(
+        [sys.executable, "-m", "gitbetter.gitbetter", "-c", ""],
+        cwd=repo,
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+
+
+CASES = [
+    Case("current_branch", lambda repo: Git(True, cwd=repo).current_branch),
+    Case("dob", lambda repo: Git(True, cwd=repo).dob),
+    Case(
+        "untrack",
+        lambda repo: Git(True, cwd=repo).untrack(*touched(repo)),
+        teardown=reset,
+    ),
+    Case(
+        "add_files",
+        lambda repo: Git(True, cwd=repo).add_files(touched(repo)),
+        setup=modify,
+        teardown=reset,
+    ),
+    Case(
+        "commit_all",
+        lambda repo: Git(True, cwd=repo).commit_all("benchmark"),
+        setup=modify,
+        teardown=undo_commit,
+    ),
+    Case(
+        "merge_to",
+        lambda repo: Git(True, cwd=repo).merge_to("main"),
+        setup=make_feature_branch,
+        teardown=undo_merge,
+    ),
+    Case("list_branches", lambda repo: Git(True, cwd=repo).list_branches()),
+    Case("startup", startup),
+]
+
+
+def time_case(case: Case, repo: Pathier, repeat: int) -> dict[str, float]:
+    """Run `case` `repeat` times and return the min and median in seconds."""
+    times: list[float] = []
+    for _ in range(repeat):
+        case.setup(repo)
+        start = time.perf_counter()
+        case.run(repo)
+        times.append(time.perf_counter() - start)
+        case.teardown(repo)
+    return {"min": min(times), "median": statistics.median(times)}
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float,
+) -> list[str]:
+    """Returns the names of cases whose fastest run is more than `threshold` (a fraction) slower than the baseline's.
+
+    Comparing minimums keeps one-off hiccups (other processes, cold disk caches) from showing up as regressions.
+    """
+    return [
+        name
+        for name, result in results.items()
+        if name in baseline and result["min"] > baseline[name]["min"] * (1 + threshold)
+    ]
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark gitbetter against a synthetic repo."
+    )
+    parser.add_argument("-s", "--size", choices=SIZES, default="small")
+    parser.add_argument(
+        "-n", "--repeat", type=int, default=10, help="Runs per case. Default 10."
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown over the baseline minimum as a fraction. Default 0.25.",
+    )
+    parser.add_argument(
+        "-b", "--baseline", type=str, default=str(root / "baseline.json")
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="Store the results as the new baseline."
+    )
+    parser.add_argument(
+        "-k", "--cases", nargs="*", default=[], help="Only run these cases."
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace | None = None) -> int:
+    if not args:
+        args = get_args()
+    baseline_path = Pathier(args.baseline)
+    baselines = baseline_path.loads() if baseline_path.exists() else {}
+    cases = [case for case in CASES if not args.cases or case.name in args.cases]
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = make_repo(Pathier(tmp) / "repo", SIZES[args.size])
+        results = {case.name: time_case(case, repo, args.repeat) for case in cases}
+    baseline = baselines.get(args.size, {})
+    regressions = compare(results, baseline, args.threshold)
+    print(f"{'case':<15} {'median':>10} {'min':>10} {'baseline min':>12}")
+    for name, result in results.items():
+        previous = baseline.get(name, {}).get("min")
+        line = (
+            f"{name:<15} {result['median']*1000:>8.2f}ms {result['min']*1000:>8.2f}ms"
+        )
+        line += f" {previous*1000:>10.2f}ms" if previous else f" {'-':>12}"
+        print(line + ("  REGRESSED" if name in regressions else ""))
+    if args.save:
+        baselines[args.size] = {**baseline, **results}
+        baseline_path.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"Saved baseline to {baseline_path}")
+        return 0
+    if not baseline:
+        print(f"No `{args.size}` baseline in {baseline_path}, record one with --save.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
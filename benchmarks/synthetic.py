@@ -0,0 +1,101 @@
+import random
+import subprocess
+from dataclasses import dataclass
+
+from pathier import Pathier, Pathish
+
+
+@dataclass
+class RepoSpec:
+    """Shape of a generated repo.
+
+    #### Fields:
+    * `commits: int`
+    * `files: int` (text files, spread over `files // 50 + 1` directories)
+    * `branches: int` (besides `main`, pointing at commits spread across history)
+    * `tags: int`
+    * `binary_blobs: int` (random binary files added with the first commit)
+    * `blob_size: int` (bytes per binary file)
+    * `seed: int`"""
+
+    commits: int = 100
+    files: int = 200
+    branches: int = 10
+    tags: int = 10
+    binary_blobs: int = 5
+    blob_size: int = 64 * 1024
+    seed: int = 0
+
+
+SIZES = {
+    "small": RepoSpec(),
+    "medium": RepoSpec(
+        commits=2_000, files=5_000, branches=100, tags=200, binary_blobs=50
+    ),
+    "large": RepoSpec(
+        commits=20_000,
+        files=50_000,
+        branches=1_000,
+        tags=2_000,
+        binary_blobs=200,
+        blob_size=512 * 1024,
+    ),
+}
+
+
+def file_path(index: int) -> str:
+    return f"dir{index // 50}/file{index}.txt"
+
+
+def _data(content: bytes) -> bytes:
+    return b"data %d\n%s\n" % (len(content), content)
+
+
+def fast_import_stream(spec: RepoSpec) -> bytes:
+    """Build a `git fast-import` stream for `spec`.
+
+    The first commit adds every file, each later commit modifies a few of them."""
+    rng = random.Random(spec.seed)
+    stream: list[bytes] = []
+    timestamp = 1_600_000_000
+    for commit in range(1, spec.commits + 1):
+        timestamp += 3600
+        signature = b"Bench <bench@example.com> %d +0000" % timestamp
+        message = b"commit %d" % commit
+        stream.append(b"commit refs/heads/main\nmark :%d\n" % commit)
+        stream.append(b"author %s\ncommitter %s\n" % (signature, signature))
+        stream.append(_data(message))
+        if commit == 1:
+            changed = range(spec.files)
+            for blob in range(spec.binary_blobs):
+                stream.append(b"M 100644 inline bin/blob%d.bin\n" % blob)
+                stream.append(_data(rng.randbytes(spec.blob_size)))
+        else:
+            stream.append(b"from :%d\n" % (commit - 1))
+            changed = rng.sample(range(spec.files), min(3, spec.files))
+        for index in changed:
+            stream.append(b"M 100644 inline %s\n" % file_path(index).encode())
+            stream.append(_data(b"file %d\nrevision %d\n" % (index, commit)))
+    for branch in range(spec.branches):
+        mark = 1 + branch * spec.commits // max(spec.branches, 1)
+        stream.append(b"reset refs/heads/branch-%d\nfrom :%d\n\n" % (branch, mark))
+    for tag in range(spec.tags):
+        mark = 1 + tag * spec.commits // max(spec.tags, 1)
+        stream.append(b"reset refs/tags/v%d\nfrom :%d\n\n" % (tag, mark))
+    return b"".join(stream)
+
+
+def make_repo(path: Pathish, spec: RepoSpec) -> Pathier:
+    """Create a repo shaped like `spec` at `path` with `main` checked out and return its path."""
+    path = Pathier(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    def git(*args: str, input: bytes | None = None):
+        subprocess.run(["git", *args], cwd=path, input=input, check=True)
+
+    git("init", "-q", "-b", "main")
+    git("config", "user.name", "Bench")
+    git("config", "user.email", "bench@example.com")
+    git("fast-import", "--quiet", input=fast_import_stream(spec))
+    git("reset", "-q", "--hard", "main")
+    return path
@@ -1,4 +1,21 @@
-from gitbetter.git import Git, GitHub
+from typing import TYPE_CHECKING, Any
 
 __version__ = "4.0.1"
-__all__ = ["Git", "GitHub"]
+__all__ = ["AsyncGit", "Git", "GitHub"]
+
+if TYPE_CHECKING:
+    from gitbetter.asyncgit import AsyncGit
+    from gitbetter.git import Git, GitHub
+
+
+def __getattr__(name: str) -> Any:
+    # Imported on first access so the shell can start without loading `morbin` or `asyncio`
+    if name == "AsyncGit":
+        from gitbetter.asyncgit import AsyncGit
+
+        return AsyncGit
+    if name in ("Git", "GitHub"):
+        from gitbetter import git
+
+        return getattr(git, name)
+    raise AttributeError(f"module 'gitbetter' has no attribute '{name}'")
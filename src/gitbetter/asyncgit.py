@@ -0,0 +1,496 @@
+import asyncio
+import shlex
+import tempfile
+import weakref
+from contextlib import contextmanager
+from typing import AsyncGenerator
+
+from morbin import Output
+from pathier import Pathier, Pathish
+
+
+class AsyncOutputStream:
+    """Lines of `git {args}`'s stdout, see `AsyncGit.stream`.
+
+    Once iteration ends, `return_code` and `stderr` hold the command's exit code and error output.
+    Leaving the context (or awaiting `aclose()`) before the output is exhausted kills the command.
+
+    >>> async with git.stream("log --oneline") as log:
+    >>>     async for line in log:
+    >>>         print(line)
+    >>> print(log.return_code)"""
+
+    def __init__(self, git: "AsyncGit", args: tuple[str, ...], timeout: float | None):
+        self.command = git._command(args)
+        self.return_code: int | None = None
+        self.stderr = ""
+        self._lines = self._read(git, timeout)
+
+    def __aiter__(self) -> "AsyncOutputStream":
+        return self
+
+    async def __anext__(self) -> str:
+        return await self._lines.__anext__()
+
+    async def __aenter__(self) -> "AsyncOutputStream":
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._lines.aclose()
+
+    async def _read(
+        self, git: "AsyncGit", timeout: float | None
+    ) -> AsyncGenerator[str, None]:
+        # A file rather than a pipe, so a chatty stderr can't block git while stdout is being read
+        with tempfile.TemporaryFile() as stderr:
+            async with git.semaphore:
+                process = await asyncio.create_subprocess_exec(
+                    *self.command,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=stderr,
+                    cwd=git.cwd,
+                )
+                assert process.stdout
+                exhausted = False
+                try:
+                    while True:
+                        line = await asyncio.wait_for(
+                            process.stdout.readline(), timeout
+                        )
+                        if not line:
+                            exhausted = True
+                            break
+                        yield line.decode(errors="replace").rstrip("\n")
+                except asyncio.TimeoutError:
+                    raise TimeoutError(
+                        f"`{' '.join(self.command)}` timed out after {timeout}s."
+                    )
+                finally:
+                    if not exhausted and process.returncode is None:
+                        try:
+                            process.kill()
+                        except ProcessLookupError:
+                            pass
+                    self.return_code = await process.wait()
+                    stderr.seek(0)
+                    self.stderr = stderr.read().decode(errors="replace")
+
+
+class AsyncGit:
+    """Asyncio counterpart to `Git`.
+
+    Every subcommand wrapper is a coroutine built on `asyncio.create_subprocess_exec` and returns the same `Output` type as `Git`.
+
+    A semaphore caps how many git processes run at once and every wrapper accepts a per call `timeout` in seconds.
+
+    >>> git = AsyncGit(max_processes=4)
+    >>> with git.capturing_output():
+    >>>     outputs = await asyncio.gather(git.fetch(), git.status())"""
+
+    def __init__(
+        self,
+        capture_output: bool = False,
+        max_processes: int = 8,
+        timeout: float | None = None,
+        cwd: Pathish | None = None,
+    ):
+        """#### :params:
+
+        `capture_output`: Same as for `Git`.
+
+        `max_processes`: The maximum number of git processes this instance will run concurrently.
+
+        `timeout`: Default timeout, in seconds, for calls that don't specify one.
+
+        `cwd`: The repo directory commands run in. Defaults to the current working directory at call time.
+        """
+        self.capture_output = capture_output
+        self.cwd = Pathier(cwd) if cwd else None
+        self.max_processes = max_processes
+        self.timeout = timeout
+        # Semaphores are bound to the loop they're first used in, so each loop gets its own
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ] = weakref.WeakKeyDictionary()
+
+    @property
+    def program(self) -> str:
+        return "git"
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Limits the number of concurrently running git processes in the running event loop."""
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_processes)
+        return self._semaphores[loop]
+
+    @contextmanager
+    def capturing_output(self):
+        """Ensures `self.capture_output` is `True` while within the context.
+
+        Upon exiting the context, `self.capture_output` will be set back to whatever it was when the context was entered.
+        """
+        original_state = self.capture_output
+        self.capture_output = True
+        yield self
+        self.capture_output = original_state
+
+    def _command(self, args: tuple[str, ...]) -> list[str]:
+        command = [self.program]
+        for arg in args:
+            command.extend(shlex.split(arg))
+        return command
+
+    async def run(self, *args: str, timeout: float | None = None) -> Output:
+        """Run git with any number of args.
+
+        If the process doesn't finish within `timeout` seconds it's killed and `TimeoutError` is raised.
+
+        Returns an `Output` object."""
+        timeout = timeout if timeout is not None else self.timeout
+        pipe = asyncio.subprocess.PIPE if self.capture_output else None
+        async with self.semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *self._command(args), stdout=pipe, stderr=pipe, cwd=self.cwd
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise TimeoutError(
+                    f"`{' '.join(self._command(args))}` timed out after {timeout}s."
+                )
+        assert process.returncode is not None
+        if self.capture_output:
+            return Output(
+                [process.returncode],
+                stdout.decode(errors="replace"),
+                stderr.decode(errors="replace"),
+            )
+        return Output([process.returncode])
+
+    def stream(self, *args: str, timeout: float | None = None) -> AsyncOutputStream:
+        """Run git with any number of args and yield lines of stdout as they're produced.
+
+        The process is killed if the stream is closed early or a line takes longer than `timeout` seconds to arrive.
+        Once the output ends, the stream's `return_code` and `stderr` tell whether git succeeded.
+
+        >>> stream = git.stream("log --oneline")
+        >>> async for line in stream:
+        >>>     print(line)
+        >>> if stream.return_code:
+        >>>     print(stream.stderr)"""
+        return AsyncOutputStream(
+            self, args, timeout if timeout is not None else self.timeout
+        )
+
+    # Seat |===================================================Core===================================================|
+
+    async def add(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git add {args}"""
+        return await self.run(f"add {args}", timeout=timeout)
+
+    async def am(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git am {args}"""
+        return await self.run(f"am {args}", timeout=timeout)
+
+    async def annotate(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git annotate {args}"""
+        return await self.run(f"annotate {args}", timeout=timeout)
+
+    async def archive(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git archive {args}"""
+        return await self.run(f"archive {args}", timeout=timeout)
+
+    async def bisect(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git bisect {args}"""
+        return await self.run(f"bisect {args}", timeout=timeout)
+
+    async def blame(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git blame {args}"""
+        return await self.run(f"blame {args}", timeout=timeout)
+
+    async def branch(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git branch {args}"""
+        return await self.run(f"branch {args}", timeout=timeout)
+
+    async def bugreport(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git bugreport {args}"""
+        return await self.run(f"bugreport {args}", timeout=timeout)
+
+    async def bundle(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git bundle {args}"""
+        return await self.run(f"bundle {args}", timeout=timeout)
+
+    async def checkout(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git checkout {args}"""
+        return await self.run(f"checkout {args}", timeout=timeout)
+
+    async def cherry_pick(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git cherry-pick {args}"""
+        return await self.run(f"cherry-pick {args}", timeout=timeout)
+
+    async def citool(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git citool {args}"""
+        return await self.run(f"citool {args}", timeout=timeout)
+
+    async def clean(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git clean {args}"""
+        return await self.run(f"clean {args}", timeout=timeout)
+
+    async def clone(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git clone {args}"""
+        return await self.run(f"clone {args}", timeout=timeout)
+
+    async def commit(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git commit {args}"""
+        return await self.run(f"commit {args}", timeout=timeout)
+
+    async def config(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git config {args}"""
+        return await self.run(f"config {args}", timeout=timeout)
+
+    async def count_objects(
+        self, args: str = "", timeout: float | None = None
+    ) -> Output:
+        """>>> git count-objects {args}"""
+        return await self.run(f"count-objects {args}", timeout=timeout)
+
+    async def describe(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git describe {args}"""
+        return await self.run(f"describe {args}", timeout=timeout)
+
+    async def diagnose(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git diagnose {args}"""
+        return await self.run(f"diagnose {args}", timeout=timeout)
+
+    async def diff(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git diff {args}"""
+        return await self.run(f"diff {args}", timeout=timeout)
+
+    async def difftool(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git difftool {args}"""
+        return await self.run(f"difftool {args}", timeout=timeout)
+
+    async def fast_export(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git fast-export {args}"""
+        return await self.run(f"fast-export {args}", timeout=timeout)
+
+    async def fast_import(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git fast-import {args}"""
+        return await self.run(f"fast-import {args}", timeout=timeout)
+
+    async def fetch(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git fetch {args}"""
+        return await self.run(f"fetch {args}", timeout=timeout)
+
+    async def filter_branch(
+        self, args: str = "", timeout: float | None = None
+    ) -> Output:
+        """>>> git filter-branch {args}"""
+        return await self.run(f"filter-branch {args}", timeout=timeout)
+
+    async def format_patch(
+        self, args: str = "", timeout: float | None = None
+    ) -> Output:
+        """>>> git format-patch {args}"""
+        return await self.run(f"format-patch {args}", timeout=timeout)
+
+    async def fsck(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git fsck {args}"""
+        return await self.run(f"fsck {args}", timeout=timeout)
+
+    async def gc(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git gc {args}"""
+        return await self.run(f"gc {args}", timeout=timeout)
+
+    async def gitk(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git gitk {args}"""
+        return await self.run(f"gitk {args}", timeout=timeout)
+
+    async def gitweb(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git gitweb {args}"""
+        return await self.run(f"gitweb {args}", timeout=timeout)
+
+    async def grep(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git grep {args}"""
+        return await self.run(f"grep {args}", timeout=timeout)
+
+    async def gui(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git gui {args}"""
+        return await self.run(f"gui {args}", timeout=timeout)
+
+    async def help(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git help {args}"""
+        return await self.run(f"help {args}", timeout=timeout)
+
+    async def init(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git init {args}"""
+        return await self.run(f"init {args}", timeout=timeout)
+
+    async def instaweb(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git instaweb {args}"""
+        return await self.run(f"instaweb {args}", timeout=timeout)
+
+    async def log(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git log {args}"""
+        return await self.run(f"log {args}", timeout=timeout)
+
+    async def maintenance(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git maintenance {args}"""
+        return await self.run(f"maintenance {args}", timeout=timeout)
+
+    async def merge(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git merge {args}"""
+        return await self.run(f"merge {args}", timeout=timeout)
+
+    async def merge_tree(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git merge-tree {args}"""
+        return await self.run(f"merge-tree {args}", timeout=timeout)
+
+    async def mergetool(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git mergetool {args}"""
+        return await self.run(f"mergetool {args}", timeout=timeout)
+
+    async def mv(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git mv {args}"""
+        return await self.run(f"mv {args}", timeout=timeout)
+
+    async def notes(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git notes {args}"""
+        return await self.run(f"notes {args}", timeout=timeout)
+
+    async def pack_refs(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git pack-refs {args}"""
+        return await self.run(f"pack-refs {args}", timeout=timeout)
+
+    async def prune(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git prune {args}"""
+        return await self.run(f"prune {args}", timeout=timeout)
+
+    async def pull(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git pull {args}"""
+        return await self.run(f"pull {args}", timeout=timeout)
+
+    async def push(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git push {args}"""
+        return await self.run(f"push {args}", timeout=timeout)
+
+    async def range_diff(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git range-diff {args}"""
+        return await self.run(f"range-diff {args}", timeout=timeout)
+
+    async def rebase(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git rebase {args}"""
+        return await self.run(f"rebase {args}", timeout=timeout)
+
+    async def reflog(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git reflog {args}"""
+        return await self.run(f"reflog {args}", timeout=timeout)
+
+    async def remote(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git remote {args}"""
+        return await self.run(f"remote {args}", timeout=timeout)
+
+    async def repack(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git repack {args}"""
+        return await self.run(f"repack {args}", timeout=timeout)
+
+    async def replace(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git replace {args}"""
+        return await self.run(f"replace {args}", timeout=timeout)
+
+    async def request_pull(
+        self, args: str = "", timeout: float | None = None
+    ) -> Output:
+        """>>> git request-pull {args}"""
+        return await self.run(f"request-pull {args}", timeout=timeout)
+
+    async def rerere(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git rerere {args}"""
+        return await self.run(f"rerere {args}", timeout=timeout)
+
+    async def reset(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git reset {args}"""
+        return await self.run(f"reset {args}", timeout=timeout)
+
+    async def restore(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git restore {args}"""
+        return await self.run(f"restore {args}", timeout=timeout)
+
+    async def revert(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git revert {args}"""
+        return await self.run(f"revert {args}", timeout=timeout)
+
+    async def rm(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git rm {args}"""
+        return await self.run(f"rm {args}", timeout=timeout)
+
+    async def scalar(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git scalar {args}"""
+        return await self.run(f"scalar {args}", timeout=timeout)
+
+    async def shortlog(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git shortlog {args}"""
+        return await self.run(f"shortlog {args}", timeout=timeout)
+
+    async def show(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git show {args}"""
+        return await self.run(f"show {args}", timeout=timeout)
+
+    async def show_branch(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git show-branch {args}"""
+        return await self.run(f"show-branch {args}", timeout=timeout)
+
+    async def sparse_checkout(
+        self, args: str = "", timeout: float | None = None
+    ) -> Output:
+        """>>> git sparse-checkout {args}"""
+        return await self.run(f"sparse-checkout {args}", timeout=timeout)
+
+    async def stash(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git stash {args}"""
+        return await self.run(f"stash {args}", timeout=timeout)
+
+    async def status(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git status {args}"""
+        return await self.run(f"status {args}", timeout=timeout)
+
+    async def submodule(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git submodule {args}"""
+        return await self.run(f"submodule {args}", timeout=timeout)
+
+    async def switch(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git switch {args}"""
+        return await self.run(f"switch {args}", timeout=timeout)
+
+    async def tag(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git tag {args}"""
+        return await self.run(f"tag {args}", timeout=timeout)
+
+    async def verify_commit(
+        self, args: str = "", timeout: float | None = None
+    ) -> Output:
+        """>>> git verify-commit {args}"""
+        return await self.run(f"verify-commit {args}", timeout=timeout)
+
+    async def verify_tag(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git verify-tag {args}"""
+        return await self.run(f"verify-tag {args}", timeout=timeout)
+
+    async def version(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git version {args}"""
+        return await self.run(f"version {args}", timeout=timeout)
+
+    async def whatchanged(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git whatchanged {args}"""
+        return await self.run(f"whatchanged {args}", timeout=timeout)
+
+    async def worktree(self, args: str = "", timeout: float | None = None) -> Output:
+        """>>> git worktree {args}"""
+        return await self.run(f"worktree {args}", timeout=timeout)
@@ -0,0 +1,281 @@
+import os
+import shlex
+import tempfile
+from dataclasses import dataclass, field
+from typing import Callable
+
+from morbin import Output
+from pathier import Pathier
+
+from gitbetter.pathspecs import ARGV_PATHS_LIMIT, PATHSPEC_FROM_STDIN, pathspec_input
+
+# Subcommands a batch records instead of running
+RECORDED = {"add", "rm", "commit"}
+# Commit options that can be combined with staging paths through `--include`
+INCLUDABLE = {"--amend", "--no-edit"}
+
+
+@dataclass
+class Step:
+    """One git process run by a batch.
+
+    #### Fields:
+    * `argv: list[str]` (without the leading `git`)
+    * `covers: list[str]` (the recorded commands it replaced)
+    * `output: Output | None` (`None` if an earlier step failed and this one never ran)
+    """
+
+    argv: list[str]
+    covers: list[str]
+    output: Output | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.output is not None and not any(self.output.return_code)
+
+
+@dataclass
+class _Op:
+    kind: str  # "add", "untrack", "commit", or "raw"
+    paths: list[str] | None
+    # Commit options or, for "raw", the whole argv
+    args: list[str]
+    input: str | None
+    covers: list[str] = field(default_factory=list)
+
+
+def _stdin_paths(input: str | None) -> list[str]:
+    return [path for path in (input or "").split("\0") if path]
+
+
+def _parse(argv: list[str], input: str | None, cwd: Pathier) -> _Op:
+    """Turn a recorded command into an operation the planner knows how to merge."""
+    covers = [shlex.join(["git", *argv])]
+    if PATHSPEC_FROM_STDIN[0] in argv:
+        covers[0] += f"  # {shlex.join(_stdin_paths(input))}"
+    subcommand, rest = argv[0], argv[1:]
+    if subcommand == "add":
+        if rest == PATHSPEC_FROM_STDIN:
+            return _Op("add", _stdin_paths(input), [], None, covers)
+        if rest[:1] == ["--"] or not any(arg.startswith("-") for arg in rest):
+            return _Op(
+                "add", rest[1:] if rest[:1] == ["--"] else rest, [], None, covers
+            )
+    elif subcommand == "rm":
+        if rest == ["--cached", "--ignore-unmatch", *PATHSPEC_FROM_STDIN]:
+            return _Op("untrack", _stdin_paths(input), [], None, covers)
+        # Staging the removal of a file that's already gone is what `add` does too
+        if (
+            rest
+            and not any(arg.startswith("-") for arg in rest)
+            and not any(os.path.lexists(cwd / path) for path in rest)
+        ):
+            return _Op("add", rest, [], None, covers)
+    elif subcommand == "commit":
+        message = None
+        if rest[:2] == ["-F", "-"] and input is not None:
+            message, rest = input, rest[2:]
+        paths = None
+        if "--" in rest:
+            paths = rest[rest.index("--") + 1 :]
+            rest = rest[: rest.index("--")]
+        if set(rest) <= INCLUDABLE:
+            return _Op("commit", paths, rest, message, covers)
+    return _Op("raw", None, argv, input, covers)
+
+
+def plan(
+    recorded: list[tuple[list[str], str | None]],
+    cwd: Pathier,
+    tracked: Callable[[list[str]], bool],
+) -> list[_Op]:
+    """Merge recorded `(argv, input)` commands into as few processes as give the same result.
+
+    * Adjacent `add`s (and `rm`s of files that no longer exist) become one `add` of every path.
+    * Adjacent `rm --cached`s become one.
+    * An `add` followed by a commit of everything staged becomes `commit --include` of the added paths,
+    and an `add` followed by a commit of (at least) the same paths is dropped,
+    as long as `tracked(paths)` says every added path is a tracked file,
+    since `commit` ignores untracked paths where `add` would have started tracking them.
+    """
+    ops: list[_Op] = []
+    untracked: set[str] = set()
+    for argv, input in recorded:
+        op = _parse(argv, input, cwd)
+        last = ops[-1] if ops else None
+        if last and op.kind == last.kind and op.kind in ("add", "untrack"):
+            last.paths = list(dict.fromkeys([*last.paths, *op.paths]))  # type: ignore
+            last.covers += op.covers
+            continue
+        if (
+            last
+            and last.kind == "add"
+            and op.kind == "commit"
+            and (op.paths is None or set(last.paths) <= set(op.paths))  # type: ignore
+            and not untracked & set(last.paths)  # type: ignore
+            and tracked(last.paths)  # type: ignore
+        ):
+            if op.paths is None:
+                op.args = [*op.args, "--include"]
+                op.paths = last.paths
+            op.covers = last.covers + op.covers
+            ops.pop()
+        if op.kind == "untrack":
+            untracked.update(op.paths)  # type: ignore
+        ops.append(op)
+    return ops
+
+
+class Batch:
+    """`add`, `rm`, and `commit` commands recorded by `Git.batch()` and the processes they were merged into.
+
+    #### Fields:
+    * `steps: list[Step]` (every process run so far, in order)
+    * `recorded: int` (number of commands recorded)
+    * `failed: bool` (whether a step failed, later steps are listed but not run)
+
+    >>> with git.batch() as batch:
+    >>>     git.rename_file("old.py", "new.py")
+    >>>     git.add_files(["README.md"])
+    >>>     git.commit_message("Rename old.py")
+    >>> print(batch.breakdown())"""
+
+    def __init__(
+        self,
+        cwd: Pathier,
+        index: Pathier | None,
+        tracked: Callable[[list[str]], bool],
+    ):
+        self.cwd = cwd
+        self.index = index
+        self.tracked = tracked
+        self.steps: list[Step] = []
+        self.recorded = 0
+        self.failed = False
+        self._pending: list[tuple[list[str], str | None]] = []
+
+    def record(self, argv: list[str], input: str | None) -> bool:
+        """Queue `argv` (without the leading `git`) if it's a command batches merge, returns whether it was queued."""
+        if not argv or argv[0] not in RECORDED:
+            return False
+        if any(
+            arg.startswith("--pathspec-from-file=") and arg not in PATHSPEC_FROM_STDIN
+            for arg in argv
+        ):
+            # The pathspec file may be gone by the time the batch runs
+            return False
+        self._pending.append((argv, input))
+        self.recorded += 1
+        return True
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._pending)
+
+    def discard(self):
+        self._pending.clear()
+
+    def flush(self, run: Callable[[list[str], str | None], Output]):
+        """Plan and run every queued command with `run(argv, input)`.
+
+        Stops at the first failing process. If nothing was committed by then, the index is put back
+        the way it was before this flush, so a failed batch never leaves half its changes staged.
+        """
+        ops = plan(self._pending, self.cwd, self.tracked)
+        self._pending.clear()
+        if self.failed:
+            self.steps.extend(Step(self._argv(op), op.covers) for op in ops)
+            return
+        backup = self._read_index()
+        committed = False
+        for op in ops:
+            step = Step(self._argv(op), op.covers)
+            self.steps.append(step)
+            if self.failed:
+                continue
+            step.output = self._run(op, run)
+            if step.ok:
+                committed = committed or op.kind in ("commit", "raw")
+            else:
+                self.failed = True
+                if not committed:
+                    self._restore_index(backup)
+
+    def _argv(self, op: _Op) -> list[str]:
+        if op.kind == "raw":
+            return op.args
+        if op.kind == "add":
+            return ["add", *PATHSPEC_FROM_STDIN]
+        if op.kind == "untrack":
+            return ["rm", "--cached", "--ignore-unmatch", *PATHSPEC_FROM_STDIN]
+        argv = ["commit", *(["-F", "-"] if op.input is not None else []), *op.args]
+        return [*argv, "--", *op.paths] if op.paths is not None else argv
+
+    def _run(self, op: _Op, run: Callable[[list[str], str | None], Output]) -> Output:
+        if op.kind in ("add", "untrack"):
+            return run(self._argv(op), pathspec_input(op.paths))  # type: ignore
+        if op.kind == "commit" and op.paths:
+            if sum(len(path) + 1 for path in op.paths) >= ARGV_PATHS_LIMIT:
+                argv = self._argv(op)
+                argv = argv[: argv.index("--")]
+                with tempfile.TemporaryDirectory() as tmp:
+                    pathspec = Pathier(tmp) / "pathspec"
+                    pathspec.write_text(pathspec_input(op.paths), encoding="utf-8")
+                    return run(
+                        [
+                            *argv,
+                            f"--pathspec-from-file={pathspec}",
+                            "--pathspec-file-nul",
+                        ],
+                        op.input,
+                    )
+        return run(self._argv(op), op.input)
+
+    def _read_index(self) -> bytes | None:
+        if not self.index:
+            return None
+        try:
+            return self.index.read_bytes()
+        except OSError:
+            return None
+
+    def _restore_index(self, backup: bytes | None):
+        """Put `backup` back through `index.lock`, the same way git writes the index."""
+        if backup is None or not self.index:
+            return
+        lock = self.index.with_name(f"{self.index.name}.lock")
+        try:
+            fd = os.open(lock, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except OSError:
+            # Someone else holds the lock, leave the index alone
+            return
+        with os.fdopen(fd, "wb") as file:
+            file.write(backup)
+        os.replace(lock, self.index)
+
+    @property
+    def output(self) -> Output:
+        """Every step's output combined."""
+        from gitbetter.git import combine_outputs
+
+        return combine_outputs(step.output for step in self.steps if step.output)
+
+    @property
+    def saved(self) -> int:
+        """How many fewer processes were run than commands were recorded."""
+        return self.recorded - len(self.steps)
+
+    def breakdown(self) -> str:
+        """Each process that ran, its result, and the recorded commands it covers."""
+        lines = []
+        for i, step in enumerate(self.steps, 1):
+            if step.output is None:
+                status = "not run"
+            else:
+                status = "ok" if step.ok else f"failed ({step.output.return_code[-1]})"
+            lines.append(f"{i}. {shlex.join(['git', *step.argv])} | {status}")
+            lines += [f"   <- {command}" for command in step.covers]
+        lines.append(
+            f"{self.recorded} command(s) recorded, {len(self.steps)} process(es) run."
+        )
+        return "\n".join(lines)
@@ -0,0 +1,197 @@
+import os
+import subprocess
+import threading
+from dataclasses import dataclass
+from typing import IO, Iterable, Iterator
+
+
+@dataclass(slots=True)
+class ObjectInfo:
+    """Header info for a git object.
+
+    #### Fields:
+    * `sha: str`
+    * `type: str`
+    * `size: int`"""
+
+    sha: str
+    type: str
+    size: int
+
+
+@dataclass(slots=True)
+class GitObject(ObjectInfo):
+    """A git object and its raw content.
+
+    #### Fields:
+    * `sha: str`
+    * `type: str`
+    * `size: int`
+    * `data: bytes`"""
+
+    data: bytes
+
+
+class CatFile:
+    """A long lived `git cat-file` co-process.
+
+    Requests are written to the process' stdin one per line and the length prefixed replies are read back from its stdout,
+    so any number of object reads only costs one process startup.
+
+    The process is started on first use, restarted if it dies, and shut down by `close()`.
+
+    >>> with CatFile() as catfile:
+    >>>     obj = catfile.request("HEAD")
+    >>>     print(obj.data.decode())"""
+
+    def __init__(self, mode: str = "--batch", cwd: str | None = None):
+        """#### :params:
+
+        `mode`: Either `--batch` (header and content) or `--batch-check` (header only).
+
+        `cwd`: The repo directory to run in. Defaults to the current working directory.
+        """
+        self.mode = mode
+        self.cwd = cwd
+        self._process: subprocess.Popen[bytes] | None = None
+        self._started_in = ""
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "CatFile":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    @property
+    def alive(self) -> bool:
+        """Whether the co-process is currently running."""
+        return self._process is not None and self._process.poll() is None
+
+    def _start(self) -> subprocess.Popen[bytes]:
+        self._started_in = self.cwd or os.getcwd()
+        self._process = subprocess.Popen(
+            ["git", "cat-file", self.mode],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=self.cwd,
+        )
+        return self._process
+
+    def _ensure_running(self) -> subprocess.Popen[bytes]:
+        # A process started in another directory is reading the wrong repo
+        if not self.alive or self._started_in != (self.cwd or os.getcwd()):
+            self.close()
+            return self._start()
+        assert self._process
+        return self._process
+
+    def _read_reply(self, stdout: IO[bytes]) -> ObjectInfo | GitObject | None:
+        """Read one reply off the pipe.
+
+        Returns `None` if the object doesn't exist."""
+        header = stdout.readline()
+        if not header:
+            raise BrokenPipeError("git cat-file exited unexpectedly.")
+        header = header.rstrip(b"\n")
+        # "<object> missing" or "<object> ambiguous", where the object name may contain spaces
+        if header.endswith((b" missing", b" ambiguous")):
+            return None
+        sha, type_, size_ = header.rsplit(b" ", 2)
+        size = int(size_)
+        if self.mode == "--batch-check":
+            return ObjectInfo(sha.decode(), type_.decode(), size)
+        # Sized read straight off the buffered pipe, no intermediate chunks to join
+        data = stdout.read(size)
+        if len(data) != size:
+            raise BrokenPipeError("git cat-file exited unexpectedly.")
+        # Trailing newline after the content
+        stdout.read(1)
+        return GitObject(sha.decode(), type_.decode(), size, data)
+
+    def _check(self, rev: str):
+        if "\n" in rev:
+            # Would be read as two requests and desync every reply after it
+            raise ValueError(f"Revisions can't contain newlines: {rev!r}")
+
+    def request(self, rev: str) -> ObjectInfo | GitObject | None:
+        """Request a single object.
+
+        Returns `None` if `rev` doesn't resolve to an object.
+        Raises a `ValueError` if `rev` contains a newline."""
+        self._check(rev)
+        with self._lock:
+            # Retry once with a fresh process if the old one died mid request
+            for attempt in range(2):
+                process = self._ensure_running()
+                assert process.stdin and process.stdout
+                try:
+                    process.stdin.write(f"{rev}\n".encode())
+                    process.stdin.flush()
+                    return self._read_reply(process.stdout)
+                except (BrokenPipeError, OSError):
+                    self.close()
+                    if attempt:
+                        raise
+        return None
+
+    def request_many(
+        self, revs: Iterable[str]
+    ) -> Iterator[ObjectInfo | GitObject | None]:
+        """Stream requests for `revs` over the pipe and yield replies in the same order.
+
+        Requests are written from a separate thread so large batches can't deadlock on full pipe buffers.
+        Raises a `ValueError`, before anything is sent, if any of `revs` contains a newline.
+        """
+        revs = list(revs)
+        for rev in revs:
+            self._check(rev)
+        if not revs:
+            return
+        with self._lock:
+            process = self._ensure_running()
+            assert process.stdin and process.stdout
+            stdin = process.stdin
+
+            def write():
+                try:
+                    for rev in revs:
+                        stdin.write(f"{rev}\n".encode())
+                    stdin.flush()
+                except (BrokenPipeError, OSError):
+                    pass
+
+            writer = threading.Thread(target=write, daemon=True)
+            writer.start()
+            remaining = len(revs)
+            try:
+                for _ in revs:
+                    reply = self._read_reply(process.stdout)
+                    remaining -= 1
+                    yield reply
+            finally:
+                # Unread replies would desync the next request, so throw the process away
+                if remaining:
+                    process.kill()
+                    self.close()
+                writer.join()
+
+    def close(self):
+        """Shut down the co-process."""
+        process = getattr(self, "_process", None)
+        if process is None:
+            return
+        self._process = None
+        try:
+            if process.stdin:
+                process.stdin.close()
+            process.wait(timeout=5)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+        if process.stdout:
+            process.stdout.close()
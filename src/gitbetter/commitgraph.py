@@ -0,0 +1,393 @@
+import heapq
+import mmap
+import os
+import struct
+from bisect import bisect_right
+
+from pathier import Pathier
+
+from gitbetter.odb import ObjectDatabase
+
+SIGNATURE = b"CGPH"
+NO_PARENT = 0x70000000
+# Set on the second parent when a commit has more than two, the rest is an index into the EDGE chunk
+EXTRA_EDGES = 0x80000000
+# Set on the last parent of a commit in the EDGE chunk
+LAST_EDGE = 0x80000000
+# Tree sha, two parent positions, generation and commit time
+COMMIT_DATA = struct.Struct(">20xIIII")
+
+# Paint flags for merge base and ahead/behind walks
+LEFT = 1
+RIGHT = 2
+BOTH = LEFT | RIGHT
+STALE = 4
+
+
+class WalkAborted(RuntimeError):
+    """A walk would have read more than `max_commits` commits from the object database or found a commit missing,
+    so the query should be handed to git instead."""
+
+
+class CommitGraphFile:
+    """One memory mapped commit-graph file, either `objects/info/commit-graph` or a layer of a split chain.
+
+    Positions are global across a chain, so `offset` is the number of commits in the layers below this one.
+    """
+
+    def __init__(self, path: Pathier, offset: int = 0):
+        self.path = path
+        self.offset = offset
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mmap
+        if mm[:4] != SIGNATURE or mm[4] != 1 or mm[5] != 1:
+            self._mmap.close()
+            raise ValueError(f"{path} isn't a version 1 SHA-1 commit-graph.")
+        chunks: dict[bytes, int] = {}
+        for i in range(mm[6]):
+            chunk_id, chunk_offset = struct.unpack_from(">4sQ", mm, 8 + i * 12)
+            chunks[chunk_id] = chunk_offset
+        if not {b"OIDF", b"OIDL", b"CDAT"} <= chunks.keys():
+            self._mmap.close()
+            raise ValueError(f"{path} is missing required chunks.")
+        self._fanout = struct.unpack_from(">256I", mm, chunks[b"OIDF"])
+        self.count = self._fanout[255]
+        self._oids = chunks[b"OIDL"]
+        self._data = chunks[b"CDAT"]
+        self._edges = chunks.get(b"EDGE", 0)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def find(self, sha: bytes) -> int | None:
+        """Returns the global position of the binary `sha` or `None` if it isn't in this file."""
+        mm = self._mmap
+        first = sha[0]
+        lo = self._fanout[first - 1] if first else 0
+        hi = self._fanout[first]
+        base = self._oids
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = base + mid * 20
+            current = mm[start : start + 20]
+            if current < sha:
+                lo = mid + 1
+            elif current > sha:
+                hi = mid
+            else:
+                return self.offset + mid
+        return None
+
+    def oid(self, position: int) -> str:
+        start = self._oids + (position - self.offset) * 20
+        return self._mmap[start : start + 20].hex()
+
+    def commit(self, position: int) -> tuple[list[int], int]:
+        """Returns `(parent positions, generation)` for the commit at `position`."""
+        first, second, high, _ = COMMIT_DATA.unpack_from(
+            self._mmap, self._data + (position - self.offset) * COMMIT_DATA.size
+        )
+        # The top 30 bits are the topological level, the rest is the commit time
+        generation = high >> 2
+        if first == NO_PARENT:
+            return [], generation
+        if second == NO_PARENT:
+            return [first], generation
+        if not second & EXTRA_EDGES:
+            return [first, second], generation
+        parents = [first]
+        edge = self._edges + (second & ~EXTRA_EDGES) * 4
+        while True:
+            (parent,) = struct.unpack_from(">I", self._mmap, edge)
+            parents.append(parent & ~LAST_EDGE)
+            if parent & LAST_EDGE:
+                return parents, generation
+            edge += 4
+
+    def close(self):
+        self._mmap.close()
+
+
+class CommitGraph:
+    """A repo's commit-graph, either the single `objects/info/commit-graph` file or the layers listed in
+    `objects/info/commit-graphs/commit-graph-chain` (as written by `git maintenance` and `fetch.writeCommitGraph`).
+    """
+
+    def __init__(self, files: list[CommitGraphFile]):
+        self.files = files
+        self._offsets = [file.offset for file in files]
+        self.count = sum(len(file) for file in files)
+
+    @classmethod
+    def load(cls, objects: Pathier) -> "CommitGraph | None":
+        """Open the commit-graph under `objects` or return `None` if there isn't a usable one."""
+        info = objects / "info"
+        files: list[CommitGraphFile] = []
+        try:
+            if (info / "commit-graph").exists():
+                files.append(CommitGraphFile(info / "commit-graph"))
+            else:
+                chain = info / "commit-graphs" / "commit-graph-chain"
+                if not chain.exists():
+                    return None
+                offset = 0
+                for line in chain.read_text().split():
+                    file = CommitGraphFile(
+                        info / "commit-graphs" / f"graph-{line}.graph", offset
+                    )
+                    files.append(file)
+                    offset += len(file)
+        except (OSError, ValueError):
+            for file in files:
+                file.close()
+            return None
+        graph = cls(files)
+        # Files written by git before 2.18 have no generation numbers
+        if graph.count and not graph.commit(0)[1]:
+            graph.close()
+            return None
+        return graph
+
+    @staticmethod
+    def stamp(objects: Pathier) -> tuple:
+        """Changes whenever the commit-graph under `objects` is rewritten."""
+        stamp = []
+        for path in (
+            objects / "info" / "commit-graph",
+            objects / "info" / "commit-graphs" / "commit-graph-chain",
+        ):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stamp.append(None)
+            else:
+                stamp.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        return tuple(stamp)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _file(self, position: int) -> CommitGraphFile:
+        return self.files[bisect_right(self._offsets, position) - 1]
+
+    def find(self, sha: bytes) -> int | None:
+        for file in self.files:
+            position = file.find(sha)
+            if position is not None:
+                return position
+        return None
+
+    def oid(self, position: int) -> str:
+        return self._file(position).oid(position)
+
+    def commit(self, position: int) -> tuple[list[int], int]:
+        return self._file(position).commit(position)
+
+    def close(self):
+        for file in self.files:
+            file.close()
+
+
+# A commit is its position in the commit-graph or, if it was made after the graph was written, its hex sha
+Node = int | str
+
+
+class Ancestry:
+    """Ancestry queries (`is_ancestor`, `merge_bases`, `ahead_behind`) answered in process.
+
+    Commits in the repo's commit-graph are walked straight from the memory mapped file,
+    and their generation numbers cut walks off as soon as nothing further down can matter.
+    Commits newer than the graph (or every commit, if there's no graph) are parsed from the object database
+    and given generation numbers as they're read, up to `max_commits` per query before giving up with `WalkAborted`.
+
+    >>> ancestry = Ancestry(git.odb)
+    >>> ancestry.ahead_behind(git.resolve_ref("refs/heads/main"), git.resolve_ref("refs/remotes/origin/main"))
+    """
+
+    def __init__(self, odb: ObjectDatabase, max_commits: int = 50_000):
+        self.odb = odb
+        self.objects = odb.objects
+        self.max_commits = max_commits
+        self._graph: CommitGraph | None = None
+        self._graph_stamp: tuple | None = None
+        # sha -> (parents, generation) for commits that aren't in the graph
+        self._loaded: dict[str, tuple[list[Node], int]] = {}
+        self._budget = 0
+
+    def _start(self):
+        """Reopen the commit-graph if it was rewritten and reset the per query budget."""
+        if (self.objects.parent / "shallow").exists():
+            # Shallow commits have parents that were never fetched, git knows where to stop
+            raise WalkAborted("Shallow repository.")
+        stamp = CommitGraph.stamp(self.objects)
+        if stamp != self._graph_stamp:
+            if self._graph:
+                self._graph.close()
+            self._graph = CommitGraph.load(self.objects)
+            self._graph_stamp = stamp
+            # Parents of loaded commits may point at old graph positions
+            self._loaded.clear()
+        self._budget = self.max_commits
+
+    def _read(self, sha: str) -> tuple[str, bytes]:
+        obj = self.odb.read(sha)
+        if obj is None:
+            raise WalkAborted(f"Missing object {sha}.")
+        return obj.type, obj.data
+
+    def node(self, sha: str) -> Node:
+        """Returns the walk node for the commit (or tag pointing at a commit) `sha`."""
+        if (
+            self._graph
+            and (position := self._graph.find(bytes.fromhex(sha))) is not None
+        ):
+            return position
+        kind, data = self._read(sha)
+        while kind == "tag":
+            sha = data[7:47].decode()  # b"object <sha>\n"
+            if (
+                self._graph
+                and (position := self._graph.find(bytes.fromhex(sha))) is not None
+            ):
+                return position
+            kind, data = self._read(sha)
+        if kind != "commit":
+            raise ValueError(f"{sha} is a {kind}, not a commit.")
+        return sha
+
+    def sha(self, node: Node) -> str:
+        return self._graph.oid(node) if isinstance(node, int) else node  # type: ignore
+
+    def _parents(self, sha: str) -> list[Node]:
+        if self._budget <= 0:
+            raise WalkAborted(f"Read more than {self.max_commits} commits.")
+        self._budget -= 1
+        _, data = self._read(sha)
+        header = data.split(b"\n\n", 1)[0]
+        return [
+            self.node(line[7:].decode())
+            for line in header.split(b"\n")
+            if line.startswith(b"parent ")
+        ]
+
+    def commit(self, node: Node) -> tuple[list[Node], int]:
+        """Returns `(parents, generation)` for `node`."""
+        if isinstance(node, int):
+            return self._graph.commit(node)  # type: ignore
+        known = self._loaded.get(node)
+        if known:
+            return known
+        # Generations depend on every parent's, so read depth first and fill them in on the way back up
+        parsed: dict[str, list[Node]] = {}
+        stack = [node]
+        while stack:
+            sha = stack[-1]
+            if sha in self._loaded:
+                stack.pop()
+                continue
+            parents = parsed.get(sha)
+            if parents is None:
+                parents = parsed[sha] = self._parents(sha)
+            unknown = [
+                parent
+                for parent in parents
+                if isinstance(parent, str) and parent not in self._loaded
+            ]
+            if unknown:
+                stack.extend(unknown)
+                continue
+            generation = 1 + max(
+                (self.commit(parent)[1] for parent in parents), default=0
+            )
+            self._loaded[sha] = (parents, generation)
+            stack.pop()
+        return self._loaded[node]
+
+    def is_ancestor(self, ancestor: str, descendant: str) -> bool:
+        """Returns whether the commit `ancestor` is reachable from `descendant`. A commit is its own ancestor."""
+        self._start()
+        target = self.node(ancestor)
+        start = self.node(descendant)
+        if target == start:
+            return True
+        floor = self.commit(target)[1]
+        seen = {start}
+        stack = [start]
+        while stack:
+            for parent in self.commit(stack.pop())[0]:
+                if parent == target:
+                    return True
+                if parent in seen:
+                    continue
+                seen.add(parent)
+                # Anything at or below `target`'s generation can't have `target` as an ancestor
+                if self.commit(parent)[1] > floor:
+                    stack.append(parent)
+        return False
+
+    def _paint(self, left: str, right: str, settled: int, stale_results: bool):
+        """Walk down from `left` and `right` in generation order, yielding `(node, flags)` for every commit reached.
+
+        A commit is only popped once every commit above it has been, so its flags are final when it's yielded.
+        The walk stops once every queued commit has all the `settled` flags.
+        If `stale_results`, commits reachable from both sides mark everything below them `STALE`.
+        """
+        flags: dict[Node, int] = {}
+        queue: list[tuple[int, int, Node]] = []
+        counter = 0
+        for node, flag in ((self.node(left), LEFT), (self.node(right), RIGHT)):
+            if node not in flags:
+                counter += 1
+                heapq.heappush(queue, (-self.commit(node)[1], counter, node))
+            flags[node] = flags.get(node, 0) | flag
+        unsettled = sum(flag & settled != settled for flag in flags.values())
+        while unsettled:
+            _, _, node = heapq.heappop(queue)
+            flag = flags[node]
+            if flag & settled != settled:
+                unsettled -= 1
+            yield node, flag
+            if stale_results and flag & BOTH == BOTH:
+                flag |= STALE
+            for parent in self.commit(node)[0]:
+                current = flags.get(parent)
+                if current is None:
+                    flags[parent] = flag
+                    counter += 1
+                    heapq.heappush(queue, (-self.commit(parent)[1], counter, parent))
+                    unsettled += flag & settled != settled
+                elif current | flag != current:
+                    flags[parent] = current | flag
+                    if (
+                        current & settled != settled
+                        and (current | flag) & settled == settled
+                    ):
+                        unsettled -= 1
+
+    def merge_bases(self, left: str, right: str) -> list[str]:
+        """Returns the best common ancestors of `left` and `right`, the same commits as `git merge-base --all`."""
+        self._start()
+        return [
+            self.sha(node)
+            for node, flag in self._paint(left, right, STALE, True)
+            if flag & (BOTH | STALE) == BOTH
+        ]
+
+    def ahead_behind(self, left: str, right: str) -> tuple[int, int]:
+        """Returns how many commits are only reachable from `left` and how many are only reachable from `right`.
+
+        The same counts as `git rev-list --left-right --count left...right`."""
+        self._start()
+        ahead = behind = 0
+        for _, flag in self._paint(left, right, BOTH, False):
+            ahead += flag == LEFT
+            behind += flag == RIGHT
+        return ahead, behind
+
+    def close(self):
+        if self._graph:
+            self._graph.close()
+            self._graph = None
+            self._graph_stamp = None
+        self._loaded.clear()
@@ -0,0 +1,105 @@
+from datetime import datetime
+from typing import Callable, Iterable, Iterator
+
+# Field name -> (`git log --format` placeholder, converter)
+FIELDS: dict[str, tuple[str, Callable[[str], object]]] = {
+    "sha": ("%H", str),
+    "tree": ("%T", str),
+    "parents": ("%P", lambda value: tuple(value.split())),
+    "author_name": ("%an", str),
+    "author_email": ("%ae", str),
+    "author_time": ("%at", int),
+    "committer_name": ("%cn", str),
+    "committer_email": ("%ce", str),
+    "commit_time": ("%ct", int),
+    "subject": ("%s", str),
+    "body": ("%b", str),
+}
+
+DEFAULT_FIELDS = (
+    "sha",
+    "parents",
+    "author_name",
+    "author_email",
+    "author_time",
+    "subject",
+)
+
+
+class Commit:
+    """A single commit record.
+
+    Fields that weren't requested when the record was created are `None`."""
+
+    __slots__ = tuple(FIELDS)
+
+    sha: str
+    tree: str | None
+    parents: tuple[str, ...] | None
+    author_name: str | None
+    author_email: str | None
+    author_time: int | None
+    committer_name: str | None
+    committer_email: str | None
+    commit_time: int | None
+    subject: str | None
+    body: str | None
+
+    def __init__(self, **fields: object):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def __repr__(self) -> str:
+        return f"Commit({self.sha[:7] if self.sha else None}, {self.subject!r})"
+
+    @property
+    def authored(self) -> datetime | None:
+        """`author_time` as a `datetime`."""
+        return (
+            datetime.fromtimestamp(self.author_time)
+            if self.author_time is not None
+            else None
+        )
+
+    @property
+    def committed(self) -> datetime | None:
+        """`commit_time` as a `datetime`."""
+        return (
+            datetime.fromtimestamp(self.commit_time)
+            if self.commit_time is not None
+            else None
+        )
+
+
+def format_string(fields: Iterable[str]) -> str:
+    """Returns a NUL delimited `--format` string for `fields`."""
+    try:
+        return "%x00".join(FIELDS[field][0] for field in fields)
+    except KeyError as e:
+        raise ValueError(
+            f"Unknown commit field {e}. Available fields: {', '.join(FIELDS)}"
+        ) from e
+
+
+def parse_commits(chunks: Iterable[bytes], fields: tuple[str, ...]) -> Iterator[Commit]:
+    """Parse the output of `git log -z --format={format_string(fields)}` into `Commit` records.
+
+    `chunks` can be split at arbitrary byte boundaries, records are yielded as soon as they're complete.
+    """
+    converters = [(field, FIELDS[field][1]) for field in fields]
+    width = len(converters)
+    values: list[bytes] = []
+    remainder = b""
+    for chunk in chunks:
+        tokens = (remainder + chunk).split(b"\0")
+        remainder = tokens.pop()
+        for token in tokens:
+            values.append(token)
+            if len(values) == width:
+                yield Commit(
+                    **{
+                        field: convert(value.decode(errors="replace"))
+                        for (field, convert), value in zip(converters, values)
+                    }
+                )
+                values = []
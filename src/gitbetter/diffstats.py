@@ -0,0 +1,185 @@
+import csv
+import io
+import json
+import posixpath
+import sys
+from array import array
+from typing import Iterable, Iterator
+
+from pathier import Pathier, Pathish
+
+GROUPINGS = ("path", "dir", "author")
+
+
+class DiffStats:
+    """Added and deleted line counts aggregated per path, directory, or author.
+
+    Counts are kept in parallel `array` columns indexed by key instead of a dict per key,
+    so aggregating a long history costs a few dozen bytes per distinct key.
+
+    #### Columns:
+    * `keys: list[str]`
+    * `added: array` (lines)
+    * `deleted: array` (lines)
+    * `commits: array` (number of commits or diffs touching the key)
+    * `binary: array` (number of binary changes, which have no line counts)
+
+    >>> stats = git.churn(since="1 month ago", by="author")
+    >>> for author, added, deleted, commits, binary in stats.top(5):
+    >>>     print(author, added + deleted)"""
+
+    def __init__(self, by: str = "path"):
+        if by not in GROUPINGS:
+            raise ValueError(f"`by` must be one of {GROUPINGS}, not `{by}`.")
+        self.by = by
+        self.keys: list[str] = []
+        self._index: dict[str, int] = {}
+        self.added = array("Q")
+        self.deleted = array("Q")
+        self.commits = array("L")
+        self.binary = array("L")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __getitem__(self, key: str) -> tuple[int, int, int, int]:
+        """Returns `(added, deleted, commits, binary)` for `key`."""
+        i = self._index[key]
+        return self.added[i], self.deleted[i], self.commits[i], self.binary[i]
+
+    def __iter__(self) -> Iterator[tuple[str, int, int, int, int]]:
+        return self.rows()
+
+    def _slot(self, key: str) -> int:
+        i = self._index.get(key)
+        if i is None:
+            i = len(self.keys)
+            key = sys.intern(key)
+            self._index[key] = i
+            self.keys.append(key)
+            self.added.append(0)
+            self.deleted.append(0)
+            self.commits.append(0)
+            self.binary.append(0)
+        return i
+
+    def add(
+        self, key: str, added: int, deleted: int, binary: bool = False, new: bool = True
+    ):
+        """Add a change to `key`'s counts. `new` is whether this is the first change to `key` in the current commit."""
+        i = self._slot(key)
+        self.added[i] += added
+        self.deleted[i] += deleted
+        self.binary[i] += binary
+        self.commits[i] += new
+
+    def rows(self) -> Iterator[tuple[str, int, int, int, int]]:
+        """Yield `(key, added, deleted, commits, binary)` rows in the order keys were first seen."""
+        return zip(self.keys, self.added, self.deleted, self.commits, self.binary)
+
+    @property
+    def totals(self) -> tuple[int, int]:
+        """Total `(added, deleted)` lines."""
+        return sum(self.added), sum(self.deleted)
+
+    def top(self, n: int = 10) -> list[tuple[str, int, int, int, int]]:
+        """Returns the `n` rows with the most added plus deleted lines."""
+        order = sorted(
+            range(len(self.keys)),
+            key=lambda i: self.added[i] + self.deleted[i],
+            reverse=True,
+        )
+        return [
+            (
+                self.keys[i],
+                self.added[i],
+                self.deleted[i],
+                self.commits[i],
+                self.binary[i],
+            )
+            for i in order[:n]
+        ]
+
+    def to_csv(self, path: Pathish | None = None) -> str:
+        """Returns the rows as CSV with a header row, also writing them to `path` if given."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow([self.by, "added", "deleted", "commits", "binary"])
+        writer.writerows(self.rows())
+        text = buffer.getvalue()
+        if path:
+            Pathier(path).write_text(text)
+        return text
+
+    def to_json(self, path: Pathish | None = None) -> str:
+        """Returns the rows as a JSON list of objects, also writing them to `path` if given."""
+        text = json.dumps(
+            [
+                {
+                    self.by: key,
+                    "added": added,
+                    "deleted": deleted,
+                    "commits": commits,
+                    "binary": binary,
+                }
+                for key, added, deleted, commits, binary in self.rows()
+            ]
+        )
+        if path:
+            Pathier(path).write_text(text)
+        return text
+
+
+def _tokens(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Split a stream of bytes chunks on NUL."""
+    leftover = b""
+    for chunk in chunks:
+        parts = (leftover + chunk).split(b"\0")
+        leftover = parts.pop()
+        for part in parts:
+            yield part.decode(errors="replace")
+    if leftover:
+        yield leftover.decode(errors="replace")
+
+
+def parse_numstat(chunks: Iterable[bytes], by: str = "path") -> DiffStats:
+    """Aggregate `--numstat -z` output from `git diff` or `git log` into a `DiffStats`.
+
+    Log output is expected to use `--format=%x01%aN` so each commit starts with a `\\x01`-prefixed author token.
+    Renames are counted against the new path."""
+    stats = DiffStats(by)
+    author = ""
+    seen: set[str] = set()
+    tokens = _tokens(chunks)
+    for token in tokens:
+        if token.startswith("\x01"):
+            author = token[1:]
+            seen.clear()
+            continue
+        token = token.lstrip("\n")
+        if not token:
+            continue
+        added, deleted, path = token.split("\t", 2)
+        if not path:
+            # Rename: the old and new paths follow as their own tokens
+            next(tokens, "")
+            path = next(tokens, "")
+        if by == "author":
+            key = author
+        elif by == "dir":
+            key = posixpath.dirname(path) or "."
+        else:
+            key = path
+        binary = added == "-"
+        stats.add(
+            key,
+            0 if binary else int(added),
+            0 if binary else int(deleted),
+            binary,
+            key not in seen,
+        )
+        seen.add(key)
+    return stats
@@ -0,0 +1,76 @@
+import glob
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+from morbin import Output
+from pathier import Pathier, Pathish
+
+from gitbetter.git import Git
+
+
+@dataclass
+class FleetResult:
+    """The result of running a `Git` method in one repo of a fleet.
+
+    #### Fields:
+    * `repo: Pathier`
+    * `output: Output`
+    * `elapsed: float` (seconds)
+    * `error: str` (a raised exception, if any)"""
+
+    repo: Pathier
+    output: Output
+    elapsed: float
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error and all(code == 0 for code in self.output.return_code)
+
+
+def resolve_repos(paths: Iterable[Pathish]) -> list[Pathier]:
+    """Expand any glob patterns in `paths` and return the unique directories that are git repos."""
+    repos: list[Pathier] = []
+    for path in paths:
+        matches = glob.glob(str(Pathier(str(path)).expanduser())) or [str(path)]
+        for match in sorted(matches):
+            repo = Pathier(match).resolve()
+            if (repo / ".git").exists() and repo not in repos:
+                repos.append(repo)
+    return repos
+
+
+def _run_one(repo: Pathier, method: str, args: tuple[str, ...]) -> FleetResult:
+    start = time.perf_counter()
+    git = Git(True, cwd=repo)
+    try:
+        output = getattr(git, method)(*args)
+        error = ""
+    except Exception as e:
+        output = Output([1], stderr=str(e))
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        git.close()
+    return FleetResult(repo, output, time.perf_counter() - start, error)
+
+
+def run(
+    repos: Iterable[Pathish], method: str, *args: str, max_workers: int = 8
+) -> Iterator[FleetResult]:
+    """Call `Git.{method}(*args)` in every repo of `repos` using a pool of `max_workers` threads.
+
+    Results are yielded as each repo finishes, not in input order.
+    A repo that fails or raises doesn't stop the rest of the run.
+
+    >>> for result in fleet.run(["~/repos/*"], "fetch", "--all"):
+    >>>     print(result.repo, result.elapsed, result.output.stdout)"""
+    func = getattr(Git, method, None)
+    if method.startswith("_") or not callable(func):
+        raise ValueError(f"`{method}` is not a `Git` method.")
+    repos = resolve_repos(repos)
+    with ThreadPoolExecutor(max_workers) as executor:
+        futures = [executor.submit(_run_one, repo, method, args) for repo in repos]
+        for future in as_completed(futures):
+            yield future.result()
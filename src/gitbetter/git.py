@@ -1,11 +1,133 @@
+import contextlib
+import functools
+import json
+import os
+import shlex
+import subprocess
+import tempfile
+import time
 from datetime import datetime
-from urllib.parse import urlparse
+from typing import IO, Any, Callable, Iterable, Iterator
 
 from morbin import Morbin, Output
 from pathier import Pathier, Pathish
 
+from gitbetter.batch import Batch
+from gitbetter.catfile import CatFile, GitObject, ObjectInfo
+from gitbetter.commitgraph import Ancestry, WalkAborted
+from gitbetter.commits import DEFAULT_FIELDS, Commit, format_string, parse_commits
+from gitbetter.diffstats import DiffStats, parse_numstat
+from gitbetter.gitdir import common_dir, find_git_dir, find_work_tree
+from gitbetter.hooks import Hooks
+from gitbetter.index import Index
+from gitbetter.odb import ObjectDatabase
+from gitbetter.pacing import Pacer
+from gitbetter.pathspecs import ARGV_PATHS_LIMIT, PATHSPEC_FROM_STDIN, pathspec_input
+from gitbetter.parallel import TargetResult, run_targets
+from gitbetter.profiling import Profiler, _subcommand, instrumented
+from gitbetter.querycache import REVISION_BASE, QueryCache, query_key
+from gitbetter.refs import RefStore
+from gitbetter.remotes import owner_reponame, remote_cache
+from gitbetter.status import StatusSnapshot, changed_since, parse_porcelain_v2
+from gitbetter.stream import OutputStream
+
+# Subcommands that can delete or rewrite pack and commit-graph files, see `Git.release_maps`
+REWRITES_OBJECTS = {
+    "commit-graph",
+    "gc",
+    "maintenance",
+    "multi-pack-index",
+    "prune",
+    "prune-packed",
+    "repack",
+}
+
+
+def run_command(
+    command: list[str],
+    capture_output: bool = False,
+    shell: bool = False,
+    cwd: Pathish | None = None,
+    input: str | None = None,
+) -> Output:
+    """Run `command` in `cwd`, writing `input` to its stdin if given.
+
+    Returns an `Output` object, with `stdout` and `stderr` populated if `capture_output` is `True`.
+    """
+    if capture_output:
+        output = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            input=input,
+            shell=shell,
+            cwd=cwd,
+        )
+        return Output([output.returncode], output.stdout, output.stderr)
+    output = subprocess.run(command, text=True, input=input, shell=shell, cwd=cwd)
+    return Output([output.returncode])
+
+
+def combine_outputs(outputs: Iterable[Output]) -> Output:
+    """Combine any number of `Output` objects into one.
+
+    Unlike `sum()`, which rebuilds the accumulated lists and strings for every addition, this is linear in the total output size.
+    """
+    return_codes: list[int] = []
+    stdouts: list[str] = []
+    stderrs: list[str] = []
+    for output in outputs:
+        return_codes.extend(output.return_code)
+        stdouts.append(output.stdout)
+        stderrs.append(output.stderr)
+    return Output(return_codes, "".join(stdouts), "".join(stderrs))
+
 
 class Git(Morbin):
+    # Set to a `Profiler` to record every command this instance runs
+    profiler: Profiler | None = None
+    hooks: Hooks | None = None
+    query_cache: QueryCache | None = None
+    # The most recent `Output` of a command run without capturing output, i.e. one the user sees
+    last_output: Output | None = None
+
+    def __init__(
+        self,
+        capture_output: bool = False,
+        shell: bool = False,
+        cwd: Pathish | None = None,
+    ):
+        """See `Morbin` for `capture_output` and `shell`.
+
+        `cwd`: The repo directory commands run in. Defaults to the current working directory at call time.
+        """
+        super().__init__(capture_output, shell)
+        self.cwd = Pathier(cwd) if cwd else None
+        cwd_ = str(self.cwd) if self.cwd else None
+        self._catfile = CatFile("--batch", cwd_)
+        self._catfile_check = CatFile("--batch-check", cwd_)
+        # HEAD path -> (mtime_ns, inode, branch)
+        self._branch_cache: dict[str, tuple[int, int, str]] = {}
+        self.branch_cache_hits = 0
+        self.branch_cache_misses = 0
+        # git dir -> RefStore
+        self._ref_stores: dict[str, RefStore] = {}
+        # git dir -> ObjectDatabase
+        self._odbs: dict[str, ObjectDatabase] = {}
+        # git dir -> Ancestry
+        self._ancestries: dict[str, Ancestry] = {}
+        # index path -> Index
+        self._indexes: dict[str, Index] = {}
+        # The batch recording commands, if inside `batch()`
+        self._batch: Batch | None = None
+
+    def __enter__(self) -> "Git":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     # Seat |===================================================Core===================================================|
     @property
     def program(self) -> str:
@@ -17,6 +139,80 @@ class Git(Morbin):
     #    >>> git {command}"""
     #    return self.run(command)
 
+    @instrumented
+    def run(self, *args: str, input: str | None = None) -> Output:
+        """Run git with any number of args in `self.cwd`.
+
+        `input` will be written to the process' stdin if given.
+
+        When capturing output with a `query_cache` set, read-only commands on resolvable revisions are served from the cache.
+
+        Returns an `Output` object."""
+        command = [self.program]
+        for arg in args:
+            command.extend(shlex.split(arg))
+        return self._execute(command, input)
+
+    @instrumented
+    def run_argv(self, argv: list[Pathish], input: str | None = None) -> Output:
+        """Run git with `argv` in `self.cwd`.
+
+        Unlike `run`, arguments are passed on as given, so they're never re-split and need no quoting.
+
+        `input` will be written to the process' stdin if given.
+        >>> git.run_argv(["commit", "-F", "-"], input=message)"""
+        return self._execute([self.program, *map(str, argv)], input)
+
+    def _execute(self, command: list[str], input: str | None) -> Output:
+        if _subcommand(command[1:]) in REWRITES_OBJECTS:
+            self.release_maps()
+        if self._batch is not None:
+            if self._batch.record(command[1:], input):
+                return Output([])
+            # Anything else may depend on what's queued
+            self._flush_batch()
+        key = None
+        if self.query_cache is not None and self.capture_output and input is None:
+            key = self._query_key(command[1:])
+            if key and (cached := self.query_cache.get(key)):
+                return cached
+        output = run_command(command, self.capture_output, self.shell, self.cwd, input)
+        if key and not any(output.return_code):
+            self.query_cache.put(key, output)  # type: ignore
+        if not self.capture_output:
+            self.last_output = output
+        return output
+
+    def _query_key(self, argv: list[str]) -> str | None:
+        git_dir = find_git_dir(self.cwd)
+        if not git_dir:
+            return None
+        return query_key(
+            argv, git_dir, self.ref_store, Pathier(self.cwd or Pathier.cwd())
+        )
+
+    def stream(
+        self,
+        subcommand: str,
+        args: str = "",
+        chunk_size: int | None = None,
+        stderr: IO | int | None = None,
+    ) -> OutputStream:
+        """Run `git {subcommand} {args}` and return an `OutputStream` over its stdout.
+
+        Nothing is buffered beyond the pipe, so memory use doesn't depend on how much the command prints.
+        Closing the stream early kills the command.
+
+        Iterating yields lines unless `chunk_size` is given, then it yields `bytes` chunks of up to that size.
+        `stderr` is passed on to `subprocess.Popen`, git's errors go to the terminal by default.
+
+        >>> with git.stream("log", "-p") as log:
+        >>>     for line in log:
+        >>>         print(line)"""
+        self._flush_batch()
+        command = [self.program, *shlex.split(subcommand), *shlex.split(args)]
+        return OutputStream(command, self.cwd, chunk_size, stderr)
+
     # Seat
 
     def add(self, args: str = "") -> Output:
@@ -313,45 +509,195 @@ class Git(Morbin):
 
     # Seat |=================================================Convenience=================================================|
 
+    @property
+    def ancestry(self) -> Ancestry:
+        """Answers ancestry queries from this repo's commit-graph and object database without starting git.
+
+        One instance is kept per repo, so the commit-graph stays mapped across calls.
+        Prefer `is_ancestor`, `merge_base`, and `ahead_behind`, which fall back to git when a walk gets too long.
+        """
+        git_dir = find_git_dir(self.cwd)
+        if not git_dir:
+            raise FileNotFoundError("Not a git repository.")
+        key = str(git_dir)
+        if key not in self._ancestries:
+            self._ancestries[key] = Ancestry(self.odb)
+        return self._ancestries[key]
+
     @property
     def current_branch(self) -> str:
-        """Returns the name of the currently active branch."""
-        current_branch = ""
+        """Returns the name of the currently active branch.
+
+        Read from the repo's `HEAD` file and cached against its mtime and inode.
+        Falls back to `git symbolic-ref --short HEAD` if `HEAD` can't be read."""
+        git_dir = find_git_dir(self.cwd)
+        if git_dir:
+            head = git_dir / "HEAD"
+            try:
+                stat = head.stat()
+                key = str(head)
+                cached = self._branch_cache.get(key)
+                if cached and cached[:2] == (stat.st_mtime_ns, stat.st_ino):
+                    self.branch_cache_hits += 1
+                    return cached[2]
+                self.branch_cache_misses += 1
+                content = head.read_text().strip()
+            except OSError:
+                pass
+            else:
+                if content.startswith("ref: refs/heads/"):
+                    branch = content.removeprefix("ref: refs/heads/")
+                else:
+                    # Detached, match what `git branch` shows
+                    branch = f"(HEAD detached at {content[:7]})"
+                self._branch_cache[key] = (stat.st_mtime_ns, stat.st_ino, branch)
+                return branch
         with self.capturing_output():
-            branches = self.branch().stdout.splitlines()
-            for branch in branches:
-                if branch.startswith("*"):
-                    current_branch = branch[2:]
-                    break
-        return current_branch
+            return self.run_argv(["symbolic-ref", "--short", "HEAD"]).stdout.strip()
 
     @property
     def dob(self) -> datetime:
-        """Date of this repo's first commit."""
+        """Date of this repo's first commit.
+
+        Only root commits are listed, so the rest of the history is never loaded.
+        >>> git log --max-parents=0 --pretty=format:'%cs'"""
         with self.capturing_output():
-            output = self.log("--pretty=format:'%cs'")
-            return datetime.strptime(output.stdout.splitlines()[-1], "%Y-%m-%d")
+            output = self.run_argv(["log", "--max-parents=0", "--pretty=format:%cs"])
+            return min(
+                datetime.strptime(line, "%Y-%m-%d")
+                for line in output.stdout.splitlines()
+            )
+
+    @property
+    def index(self) -> Index:
+        """This repo's index, read straight from `.git/index` (or `$GIT_INDEX_FILE`) without starting git.
+
+        One instance is kept per index file and it's only parsed again when the file changes.
+        >>> "README.md" in git.index"""
+        git_dir = find_git_dir(self.cwd)
+        if not git_dir:
+            raise FileNotFoundError("Not a git repository.")
+        path = Pathier(os.environ.get("GIT_INDEX_FILE") or git_dir / "index")
+        key = str(path)
+        if key not in self._indexes:
+            self._indexes[key] = Index(path)
+        return self._indexes[key]
+
+    def _usable_index(self) -> Index | None:
+        """`self.index` if it can be parsed and no batched commands are waiting to change it, otherwise `None`."""
+        if self._batch is not None and self._batch.pending:
+            return None
+        try:
+            index = self.index
+            len(index)
+        except (OSError, ValueError):
+            return None
+        return index
+
+    def _index_path(self, path: Pathish, directories: bool = False) -> str | None:
+        """Returns `path` (relative to `self.cwd`) as an index path, relative to the top of the working tree.
+
+        Returns `None` for globs, pathspec magic, paths outside the working tree, and directories unless `directories`.
+        """
+        text = str(path)
+        if not text or text.startswith(":") or any(char in text for char in "*?["):
+            return None
+        root = find_work_tree(self.cwd)
+        if not root:
+            return None
+        full = os.path.join(self.cwd or os.getcwd(), text)
+        if not directories and os.path.isdir(full):
+            return None
+        relative = os.path.relpath(full, root)
+        if relative == "." or relative.startswith(".."):
+            return None
+        return relative.replace(os.sep, "/")
+
+    @property
+    def odb(self) -> ObjectDatabase:
+        """Reads objects straight from this repo's packs and loose objects without starting git.
+
+        One database is kept per repo, so its memory maps and delta base cache persist across calls.
+        >>> git.odb.read(git.resolve_ref("refs/heads/main")).data.decode()"""
+        git_dir = find_git_dir(self.cwd)
+        if not git_dir:
+            raise FileNotFoundError("Not a git repository.")
+        key = str(git_dir)
+        if key not in self._odbs:
+            self._odbs[key] = ObjectDatabase(git_dir)
+        return self._odbs[key]
 
     @property
     def origin_url(self) -> Output:
         """The remote origin url for this repo
         >>> git remote get-url origin"""
-        return self.remote("get-url origin")
+        return self.run_argv(["remote", "get-url", "origin"])
+
+    @property
+    def ref_store(self) -> RefStore:
+        """Reads refs straight from this repo's git directory.
+
+        One store is kept per repo, so its caches persist across calls."""
+        git_dir = find_git_dir(self.cwd)
+        if not git_dir:
+            raise FileNotFoundError("Not a git repository.")
+        key = str(git_dir)
+        if key not in self._ref_stores:
+            self._ref_stores[key] = RefStore(git_dir)
+        return self._ref_stores[key]
 
     def add_all(self) -> Output:
         """Stage all modified and untracked files.
         >>> git add ."""
-        return self.add(".")
+        return self.run_argv(["add", "."])
 
     def add_files(self, files: list[Pathish]) -> Output:
-        """Stage a list of files."""
-        args = " ".join([str(file) for file in files])
-        return self.add(args)
+        """Stage a list of files.
+
+        Paths are passed on stdin, so any number of them (including ones with spaces) only takes one process.
+        Files the index shows are tracked and unchanged, and missing files that aren't tracked, are skipped.
+        If that leaves nothing to add, git isn't run.
+        >>> git add --pathspec-from-file=- --pathspec-file-nul"""
+        index = self._usable_index()
+        if index:
+            root = find_work_tree(self.cwd)
+            files = [
+                file
+                for file in files
+                if (path := self._index_path(file)) is None
+                or (
+                    (entry := index.get(path)) is None
+                    and os.path.lexists(root / path)  # type: ignore
+                )
+                or (entry is not None and index.is_dirty(entry, root))  # type: ignore
+            ]
+            if not files:
+                return Output([0])
+        return self.run_argv(["add", *PATHSPEC_FROM_STDIN], input=pathspec_input(files))
 
     def add_remote_url(self, url: str, name: str = "origin") -> Output:
         """Add remote url to repo.
         >>> git remote add {name} {url}"""
-        return self.remote(f"add {name} {url}")
+        return self.run_argv(["remote", "add", name, url])
+
+    def ahead_behind(self, rev: str, other: str) -> tuple[int, int]:
+        """Returns how many commits `rev` has that `other` doesn't and how many `other` has that `rev` doesn't.
+
+        i.e. `git.ahead_behind("main", "origin/main")` is how far `main` is ahead of and behind `origin/main`.
+
+        Answered in process by `self.ancestry` when possible.
+        >>> git rev-list --left-right --count {rev}...{other}"""
+        left, right = self._commit_sha(rev), self._commit_sha(other)
+        try:
+            return self.ancestry.ahead_behind(left, right)
+        except WalkAborted:
+            pass
+        with self.capturing_output():
+            output = self.run_argv(
+                ["rev-list", "--left-right", "--count", f"{left}...{right}"]
+            )
+        ahead, behind = output.stdout.split()
+        return int(ahead), int(behind)
 
     def amend(self, files: list[Pathish] | None = None) -> Output:
         """Stage and commit changes to the previous commit.
@@ -361,26 +707,226 @@ class Git(Morbin):
         >>> git add {files} or git add .
         >>> git commit --amend --no-edit
         """
-        return (self.add_files(files) if files else self.add_all()) + self.commit(
-            "--amend --no-edit"
+        return combine_outputs(
+            [
+                self.add_files(files) if files else self.add_all(),
+                self.run_argv(["commit", "--amend", "--no-edit"]),
+            ]
         )
 
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[Batch]:
+        """Record `add`, `rm`, and `commit` commands inside the block instead of running them,
+        then run them merged into as few processes as give the same result when the block exits.
+
+        Adjacent adds and path lists are combined, and staging tracked files followed by a commit becomes a single `commit --include`.
+        Any other git command flushes what's queued first, so it always sees the same repo state it would have without batching.
+        In-process reads (`refs`, `odb`, `ancestry`, ...) don't flush.
+
+        The batch stops at the first failing process and, if nothing was committed yet, restores the index.
+        Nothing queued is run if the block raises.
+
+        Yields the `Batch`, whose `output` combines every process' output and `breakdown()` lists what ran for what.
+        >>> with git.batch() as batch:
+        >>>     git.rename_file("old.py", "new.py")
+        >>>     git.amend(["new.py", "old.py"])
+        >>> print(batch.breakdown())"""
+        if self._batch is not None:
+            # Nested blocks join the outer batch
+            yield self._batch
+            return
+        git_dir = find_git_dir(self.cwd)
+        cwd = Pathier(self.cwd or Pathier.cwd())
+        batch = Batch(cwd, git_dir / "index" if git_dir else None, self._tracked)
+        self._batch = batch
+        try:
+            yield batch
+            self._flush_batch()
+        except BaseException:
+            batch.discard()
+            raise
+        finally:
+            self._batch = None
+
+    def _flush_batch(self):
+        """Run whatever the current batch has queued."""
+        batch = self._batch
+        if batch is None or not batch.pending:
+            return
+        # Run the queued commands for real instead of recording them again
+        self._batch = None
+        try:
+            batch.flush(lambda argv, input: self.run_argv(argv, input=input))
+        finally:
+            self._batch = batch
+
+    def _tracked(self, paths: list[str]) -> bool:
+        """Whether every path (relative to `self.cwd`) is a file in the index."""
+        index = self._usable_index()
+        if not index:
+            return False
+        for path in paths:
+            relative = self._index_path(path)
+            entry = index.get(relative) if relative is not None else None
+            if not entry or entry.intent_to_add or entry.mode >> 12 not in (0o10, 0o12):
+                return False
+        return True
+
+    def branches(self) -> dict[str, str]:
+        """Returns local branches as a mapping of branch name to commit sha.
+
+        Read from `packed-refs` and `refs/heads` without starting git."""
+        return self.ref_store.branches()
+
+    def churn(
+        self,
+        since: str | None = None,
+        until: str | None = None,
+        by: str = "path",
+        rev: str = "HEAD",
+        paths: list[Pathish] | None = None,
+    ) -> DiffStats:
+        """Returns added and deleted lines over the commits reachable from `rev`, aggregated by `"path"`, `"dir"`, or `"author"`.
+
+        `since` and `until` take anything `git log` does, e.g. `"2 weeks ago"` or `"2024-01-01"`.
+        Output is parsed as it streams from git, so memory use depends on the number of distinct keys, not the size of the history.
+
+        Raises a `ValueError` with git's message if git fails (i.e. `rev` doesn't exist).
+        >>> git log --numstat -z --format=%x01%aN --since={since} --until={until} {rev} -- {paths}
+        """
+        args = ["--numstat", "-z", "--format=%x01%aN", rev]
+        if since:
+            args.append(f"--since={since}")
+        if until:
+            args.append(f"--until={until}")
+        return self._numstat("log", args, by, paths)
+
+    def close(self):
+        """Shut down any long lived git processes and memory maps owned by this instance."""
+        self._catfile.close()
+        self._catfile_check.close()
+        for store in self._ref_stores.values():
+            store.close()
+        self.release_maps()
+
+    def release_maps(self):
+        """Unmap the pack, pack index, and commit-graph files `odb` and `ancestry` read.
+
+        Mapped files can't be deleted or replaced on Windows, so this is done before running any of `REWRITES_OBJECTS`.
+        Call it before running those some other way. They're mapped again on the next lookup.
+        """
+        for ancestry in self._ancestries.values():
+            ancestry.close()
+        for odb in self._odbs.values():
+            odb.close()
+
+    def _commit_sha(self, rev: str) -> str:
+        """Returns the full sha `rev` resolves to.
+
+        Plain ref names are resolved through `self.ref_store`, anything else (`HEAD~2`, `@{u}`, short shas) by git.
+        Raises a `ValueError` if `rev` doesn't exist."""
+        if REVISION_BASE.fullmatch(rev) and "@{" not in rev:
+            if find_git_dir(self.cwd) and (sha := self.ref_store.resolve(rev)):
+                return sha
+        with self.capturing_output():
+            output = self.run_argv(
+                ["rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"]
+            )
+        if any(output.return_code):
+            raise ValueError(f"Unknown revision `{rev}`.")
+        return output.stdout.strip()
+
+    def _check_staged(self, paths: list[Pathish] | None = None) -> Output | None:
+        """Run `self.hooks` against the staged files.
+
+        Returns `None` if there are no hooks or every check passed, otherwise an `Output` with the failures in `stderr`.
+        When not capturing output, that `Output` is also `self.last_output`.
+        """
+        if not self.hooks:
+            return None
+        work_tree = find_work_tree(self.cwd) or Pathier(self.cwd or Pathier.cwd())
+        failures = self.hooks.run(self.staged_blobs(paths), work_tree)
+        if not failures:
+            return None
+        report = "\n".join(
+            f"{failure.check.name} failed:\n{failure.output}" for failure in failures
+        )
+        output = Output([1], stderr=report)
+        if not self.capture_output:
+            self.last_output = output
+        return output
+
+    @staticmethod
+    def _restore_index(index: Pathier, saved: tuple[bytes, os.stat_result] | None):
+        """Put back the index file `saved` from `index`, with its original mtime so git's stat checks see the same file."""
+        if saved is None:
+            index.unlink(missing_ok=True)
+            return
+        content, stat = saved
+        temp = index.with_name(f"{index.name}.gitbetter")
+        temp.write_bytes(content)
+        os.utime(temp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(temp, index)
+
     def commit_all(self, message: str) -> Output:
         """Stage and commit all files with `message`.
+
+        If `self.hooks` is set, the commit only happens when every check passes.
         >>> git add .
-        >>> git commit -m "{message}" """
-        return self.add_all() + self.commit(f'-m "{message}"')
+        >>> git commit -F -  # `message` on stdin"""
+        output = self.add_all()
+        if failed := self._check_staged():
+            return combine_outputs([output, failed])
+        return combine_outputs([output, self.commit_message(message)])
 
     def commit_files(self, files: list[Pathish], message: str) -> Output:
         """Commit a list of files or file patterns with commit message `message`.
-        >>> git commit {files} -m "{message}" """
-        files_arg = " ".join(str(file) for file in files)
-        return self.commit(f'{files_arg} -m "{message}"')
+
+        `message` is passed on stdin. Paths are passed as arguments,
+        or through a temporary pathspec file when there are too many for a command line,
+        so any number of them only takes one process.
+
+        If `self.hooks` is set, `files` are staged first and the commit only happens when every check passes.
+        If a check fails, the index is put back the way it was.
+        >>> git commit -F - -- {files}  # `message` on stdin"""
+        output = Output([])
+        if self.hooks:
+            index = self.index.path
+            try:
+                saved = (index.read_bytes(), index.stat())
+            except FileNotFoundError:
+                saved = None
+            output = self.add_files(files)
+            if failed := self._check_staged(files):
+                self._restore_index(index, saved)
+                return combine_outputs([output, failed])
+        paths = [str(file) for file in files]
+        if sum(len(path) + 1 for path in paths) < ARGV_PATHS_LIMIT:
+            return combine_outputs(
+                [output, self.commit_message(message, ["--", *paths])]
+            )
+        with tempfile.TemporaryDirectory() as tmp:
+            pathspec = Pathier(tmp) / "pathspec"
+            pathspec.write_text(pathspec_input(paths), encoding="utf-8")
+            return combine_outputs(
+                [
+                    output,
+                    self.commit_message(
+                        message,
+                        [f"--pathspec-from-file={pathspec}", "--pathspec-file-nul"],
+                    ),
+                ]
+            )
+
+    def commit_message(self, message: str, args: list[Pathish] | None = None) -> Output:
+        """Commit with `message` passed on stdin, so it's never parsed and needs no escaping.
+        >>> git commit -F - {args}"""
+        return self.run_argv(["commit", "-F", "-", *(args or [])], input=message)
 
     def create_new_branch(self, branch_name: str) -> Output:
         """Create and switch to a new branch named with `branch_name`.
         >>> git checkout -b {branch_name} --track"""
-        return self.checkout(f"-b {branch_name} --track")
+        return self.run_argv(["checkout", "-b", branch_name, "--track"])
 
     def delete_branch(self, branch_name: str, local_only: bool = True) -> Output:
         """Delete `branch_name` from repo.
@@ -393,14 +939,114 @@ class Git(Morbin):
         Then if not `local_only`:
         >>> git push origin --delete {branch_name}
         """
-        output = self.branch(f"--delete {branch_name}")
+        output = self.run_argv(["branch", "--delete", branch_name])
         if not local_only:
-            return output + self.push(f"origin --delete {branch_name}")
+            return combine_outputs(
+                [output, self.run_argv(["push", "origin", "--delete", branch_name])]
+            )
         return output
 
+    def diff_stats(
+        self, rev_range: str, paths: list[Pathish] | None = None, by: str = "path"
+    ) -> DiffStats:
+        """Returns added and deleted lines between the ends of `rev_range` (e.g. `v1.0..v2.0`), aggregated by `"path"` or `"dir"`.
+
+        Raises a `ValueError` with git's message if git fails (i.e. `rev_range` doesn't exist).
+        >>> git diff --numstat -z {rev_range} -- {paths}"""
+        if by == "author":
+            raise ValueError("A diff has no authors, use `churn` instead.")
+        return self._numstat("diff", ["--numstat", "-z", rev_range], by, paths)
+
+    def _numstat(
+        self, subcommand: str, args: list[str], by: str, paths: list[Pathish] | None
+    ) -> DiffStats:
+        DiffStats(by)  # Validate `by` before starting git
+        args.append("--")
+        args.extend(str(path) for path in paths or [])
+        # A file rather than a pipe, so a chatty stderr can't block git while stdout is being read
+        with tempfile.TemporaryFile() as stderr:
+            with self.stream(
+                subcommand, shlex.join(args), 1024 * 1024, stderr
+            ) as stream:
+                stats = parse_numstat(stream, by)
+            if stream.return_code:
+                stderr.seek(0)
+                message = stderr.read().decode(errors="replace").strip()
+                raise ValueError(
+                    message
+                    or f"git {subcommand} exited with status {stream.return_code}."
+                )
+        return stats
+
+    def dirty_files(self) -> list[str]:
+        """Returns tracked files whose working tree copy may differ from the index, relative to the top of the working tree.
+
+        Decided from each file's stat info against the index without starting git, see `Index.is_dirty`.
+        Falls back to git for indexes that can't be parsed (i.e. split indexes).
+        >>> git ls-files -z --full-name --modified -- :/"""
+        root = find_work_tree(self.cwd)
+        if not root:
+            raise FileNotFoundError("Not inside a git working tree.")
+        try:
+            return self.index.dirty(root)
+        except ValueError:
+            pass
+        with self.capturing_output():
+            output = self.run_argv(
+                ["ls-files", "-z", "--full-name", "--modified", "--", ":/"]
+            )
+        return list(dict.fromkeys(output.stdout.split("\0")[:-1]))
+
+    def enable_query_cache(self, disk: bool = False, **kwargs) -> QueryCache:
+        """Set `self.query_cache` to a new `QueryCache` and return it.
+
+        If `disk` is `True`, results are also stored in `.git/gitbetter-cache/queries.sqlite3`.
+        `kwargs` are passed to `QueryCache`."""
+        if disk:
+            git_dir = find_git_dir(self.cwd)
+            if not git_dir:
+                raise FileNotFoundError("Not a git repository.")
+            kwargs["path"] = common_dir(git_dir) / "gitbetter-cache" / "queries.sqlite3"
+        self.query_cache = QueryCache(**kwargs)
+        return self.query_cache
+
+    def fetch_all(
+        self,
+        parallel: int = 4,
+        args: str = "",
+        retries: int = 2,
+        retry_delay: float = 1.0,
+        progress: Callable[[TargetResult, int, int], None] | None = None,
+    ) -> dict[str, TargetResult]:
+        """Fetch every remote, running up to `parallel` fetches at once.
+
+        Failed fetches are retried with backoff, see `parallel.run_targets`.
+        `FETCH_HEAD` isn't written and auto maintenance is skipped, so the fetches don't contend for the same files.
+
+        Returns a `TargetResult` per remote name.
+        >>> git fetch --no-write-fetch-head --no-auto-maintenance {args} {remote}"""
+        worker = Git(True, cwd=self.cwd)
+        tasks = {
+            remote: functools.partial(
+                worker.run_argv,
+                [
+                    "fetch",
+                    "--no-write-fetch-head",
+                    "--no-auto-maintenance",
+                    *shlex.split(args),
+                    remote,
+                ],
+            )
+            for remote in self.remotes()
+        }
+        try:
+            return run_targets(tasks, parallel, retries, retry_delay, progress)
+        finally:
+            worker.close()
+
     def ignore(self, patterns: list[str]):
         """Add `patterns` to `.gitignore`."""
-        gitignore = Pathier(".gitignore")
+        gitignore = (self.cwd or Pathier.cwd()) / ".gitignore"
         if not gitignore.exists():
             gitignore.touch()
         ignores = gitignore.split()
@@ -412,66 +1058,526 @@ class Git(Morbin):
 
         If `files` is not given, all files will be added and committed.
         >>> git add {files} or git add .
-        >>> git commit -m "Initial commit" """
-        return (self.add_files(files) if files else self.add_all()) + self.commit(
-            '-m "Initial commit"'
+        >>> git commit -F -  # "Initial commit" on stdin"""
+        return combine_outputs(
+            [
+                self.add_files(files) if files else self.add_all(),
+                self.commit_message("Initial commit"),
+            ]
         )
 
+    def is_ancestor(self, ancestor: str, descendant: str) -> bool:
+        """Returns whether `ancestor` is reachable from `descendant`. A commit is its own ancestor.
+
+        Answered in process by `self.ancestry` when possible.
+        >>> git merge-base --is-ancestor {ancestor} {descendant}"""
+        left, right = self._commit_sha(ancestor), self._commit_sha(descendant)
+        try:
+            return self.ancestry.is_ancestor(left, right)
+        except WalkAborted:
+            pass
+        with self.capturing_output():
+            output = self.run_argv(["merge-base", "--is-ancestor", left, right])
+        return not any(output.return_code)
+
+    def is_dirty(self, path: Pathish) -> bool:
+        """Whether the tracked file at `path` (relative to `self.cwd`) may differ from the index, see `dirty_files`."""
+        relative = self._index_path(path)
+        root = find_work_tree(self.cwd)
+        if relative is None or not root:
+            return False
+        try:
+            entry = self.index.get(relative)
+            return bool(entry) and self.index.is_dirty(entry, root)  # type: ignore
+        except ValueError:
+            return relative in self.dirty_files()
+
+    def is_tracked(self, path: Pathish) -> bool:
+        """Whether `path` (relative to `self.cwd`) is tracked, or for a directory, whether anything in it is.
+
+        Read from the index without starting git."""
+        relative = self._index_path(path, directories=True)
+        if relative is None:
+            return False
+        try:
+            return self.index.covers(relative)
+        except ValueError:
+            return any(
+                file == relative or file.startswith(f"{relative}/")
+                for file in self.tracked_files()
+            )
+
+    def iter_commits(
+        self,
+        rev_range: str = "HEAD",
+        paths: list[Pathish] | None = None,
+        fields: tuple[str, ...] = DEFAULT_FIELDS,
+    ) -> Iterator[Commit]:
+        """Yield `Commit` records for `rev_range` as git produces them.
+
+        Output is streamed and parsed incrementally, so memory use doesn't grow with the size of the history.
+
+        #### :params:
+
+        `rev_range`: Anything `git log` accepts as a revision range, e.g. `main..my-feature`.
+
+        `paths`: Only include commits touching these paths.
+
+        `fields`: The `Commit` fields to populate. See `gitbetter.commits.FIELDS` for available fields.
+
+        Raises a `ValueError` with git's message, once the output ends, if git fails (i.e. `rev_range` doesn't exist).
+        >>> git log -z --format={fields} {rev_range} -- {paths}"""
+        command = ["git", "log", "-z", f"--format={format_string(fields)}", rev_range]
+        if paths:
+            command += ["--"] + [str(path) for path in paths]
+        # A file rather than a pipe, so a chatty stderr can't block git while stdout is being read
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(
+                command, stdout=subprocess.PIPE, stderr=stderr, cwd=self.cwd
+            )
+            stdout = process.stdout
+            assert stdout
+            try:
+                yield from parse_commits(iter(lambda: stdout.read1(65536), b""), fields)
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                stdout.close()
+                process.wait()
+            if process.returncode:
+                stderr.seek(0)
+                message = stderr.read().decode(errors="replace").strip()
+                raise ValueError(
+                    message or f"git log exited with status {process.returncode}."
+                )
+
     def list_branches(self) -> Output:
         """>>> git branch -vva"""
-        return self.branch("-vva")
+        return self.run_argv(["branch", "-vva"])
 
     def loggy(self) -> Output:
         """>>> git log --graph --abbrev-commit --name-only --pretty=tformat:'%C(auto)%h %C(green)(%cs|%cr)%C(auto)%d %C(magenta)%s'"""
-        return self.log(
-            "--graph --abbrev-commit --name-only --pretty=tformat:'%C(auto)%h %C(green)(%cs|%cr)%C(auto)%d %C(magenta)%s'"
+        return self.run_argv(
+            [
+                "log",
+                "--graph",
+                "--abbrev-commit",
+                "--name-only",
+                "--pretty=tformat:%C(auto)%h %C(green)(%cs|%cr)%C(auto)%d %C(magenta)%s",
+            ]
         )
 
+    def object_info(self, rev: str) -> ObjectInfo | None:
+        """Returns the sha, type, and size of the object `rev` resolves to or `None` if it doesn't exist.
+
+        Served by a persistent `git cat-file --batch-check` process."""
+        return self._catfile_check.request(rev)
+
+    def read_many(self, revs: Iterable[str]) -> Iterator[GitObject | None]:
+        """Yield the objects for `revs`, in order, streamed through a single `git cat-file --batch` process.
+
+        Missing objects yield `None`."""
+        for obj in self._catfile.request_many(revs):
+            yield obj  # type: ignore
+
+    def read_object(self, rev: str) -> GitObject | None:
+        """Returns the object `rev` resolves to or `None` if it doesn't exist.
+
+        Served by a persistent `git cat-file --batch` process.
+        >>> git.read_object("HEAD:README.md").data.decode()"""
+        return self._catfile.request(rev)  # type: ignore
+
+    def merge_base(self, rev: str, other: str) -> str | None:
+        """Returns the best common ancestor of `rev` and `other` or `None` if they don't share any history.
+
+        Answered in process by `self.ancestry` when possible.
+        When there's more than one best common ancestor (criss-cross merges), git picks which one to return.
+        >>> git merge-base {rev} {other}"""
+        left, right = self._commit_sha(rev), self._commit_sha(other)
+        try:
+            bases = self.ancestry.merge_bases(left, right)
+            if len(bases) < 2:
+                return bases[0] if bases else None
+        except WalkAborted:
+            pass
+        with self.capturing_output():
+            output = self.run_argv(["merge-base", left, right])
+        return output.stdout.strip() or None
+
+    def _fast_forwards_in_place(self, branch: str) -> bool:
+        """Whether `merge_to` can move `branch` itself instead of having `git merge` do it after switching.
+
+        Not if the config asks for merge commits (`merge.ff` or `branch.{branch}.mergeoptions`),
+        there's a `post-merge` hook `git merge` would run, or `branch` is checked out in another worktree.
+        """
+        with self.capturing_output():
+            output = self.run_argv(
+                [
+                    "config",
+                    "--get-regexp",
+                    r"^merge\.ff$|^branch\..*\.mergeoptions$|^core\.hookspath$",
+                ]
+            )
+        git_dir = find_git_dir(self.cwd)
+        if not git_dir:
+            return False
+        # Later config files override earlier ones
+        config = dict(line.partition(" ")[::2] for line in output.stdout.splitlines())
+        if config.get("merge.ff", "").lower() in ("false", "no", "off", "0"):
+            return False
+        if "--no-ff" in shlex.split(config.get(f"branch.{branch}.mergeoptions", "")):
+            return False
+        common = common_dir(git_dir)
+        hooks = common / "hooks"
+        if "core.hookspath" in config:
+            hooks = (find_work_tree(self.cwd) or git_dir) / os.path.expanduser(
+                config["core.hookspath"]
+            )
+        if os.access(hooks / "post-merge", os.X_OK):
+            return False
+        heads = [common / "HEAD", *(common / "worktrees").glob("*/HEAD")]
+        for head in heads:
+            try:
+                if head.read_text().strip() == f"ref: refs/heads/{branch}":
+                    return False
+            except OSError:
+                continue
+        return True
+
     def merge_to(self, branch: str = "main") -> Output:
         """Merge the current branch with `branch` after switching to `branch`.
 
         i.e. If on branch `my-feature`,
         >>> git.merge_to()
 
-        will switch to `main` and merge `my-feature` into `main`."""
+        will switch to `main` and merge `my-feature` into `main`.
+
+        If `branch` already contains the current branch, this only switches.
+        If `branch` can be fast-forwarded, it's moved to the current commit before switching,
+        so the working tree isn't checked out twice.
+        The branch's reflog gets the same `merge {current}: Fast-forward` entry `git merge` writes.
+        That's skipped in favor of a real `git merge` if the config asks for merge commits
+        (`merge.ff=false` or `--no-ff` in `branch.{branch}.mergeoptions`), a `post-merge` hook is set up,
+        or `branch` is checked out in another worktree.
+        """
         current_branch = self.current_branch
-        output = self.switch(branch)
-        output += self.merge(current_branch)
-        return output
+        target = self.resolve_ref(f"refs/heads/{branch}")
+        if target:
+            current = self._commit_sha("HEAD")
+            if self.is_ancestor(current, target):
+                return self.run_argv(["switch", branch])
+            if self.is_ancestor(target, current) and self._fast_forwards_in_place(
+                branch
+            ):
+                with self.capturing_output():
+                    # Only moves `branch` if it's still at `target`
+                    output = self.run_argv(
+                        [
+                            "update-ref",
+                            "-m",
+                            f"merge {current_branch}: Fast-forward",
+                            f"refs/heads/{branch}",
+                            current,
+                            target,
+                        ]
+                    )
+                if not any(output.return_code):
+                    return combine_outputs([output, self.run_argv(["switch", branch])])
+        return combine_outputs(
+            [
+                self.run_argv(["switch", branch]),
+                self.run_argv(["merge", current_branch]),
+            ]
+        )
 
     def new_repo(self) -> Output:
         """Initialize a new repo in current directory.
         >>> git init -b main"""
-        return self.init("-b main")
+        return self.run_argv(["init", "-b", "main"])
 
     def push_new_branch(self, branch: str) -> Output:
         """Push a new branch to origin with tracking.
         >>> git push -u origin {branch}"""
-        return self.push(f"-u origin {branch}")
+        return self.run_argv(["push", "-u", "origin", branch])
+
+    def staged_blobs(self, paths: list[Pathish] | None = None) -> dict[str, str]:
+        """Returns staged files (excluding deletions) as a mapping of repo relative path to blob sha.
+
+        Limited to `paths` if given.
+        `git diff` can't read pathspecs from a file, so a command line's worth of `paths` is passed per process.
+        >>> git diff --cached --raw -z --no-abbrev --no-renames --diff-filter=d -- {paths}
+        """
+        command = [
+            "diff",
+            "--cached",
+            "--raw",
+            "-z",
+            "--no-abbrev",
+            "--no-renames",
+            "--diff-filter=d",
+        ]
+        chunks: list[list[str]] = [[]]
+        size = 0
+        for path in map(str, paths or []):
+            if chunks[-1] and size + len(path) + 1 > ARGV_PATHS_LIMIT:
+                chunks.append([])
+                size = 0
+            chunks[-1].append(path)
+            size += len(path) + 1
+        staged: dict[str, str] = {}
+        with self.capturing_output():
+            for chunk in chunks:
+                if paths is None:
+                    output = self.run_argv(command)
+                elif chunk:
+                    output = self.run_argv([*command, "--", *chunk])
+                else:
+                    continue
+                tokens = output.stdout.split("\0")
+                # `:old_mode new_mode old_sha new_sha status` followed by the path
+                for meta, path in zip(tokens[::2], tokens[1::2]):
+                    staged[path] = meta.split()[3]
+        return staged
+
+    def status_snapshot(
+        self,
+        previous: StatusSnapshot | None = None,
+        fsmonitor: bool = False,
+        max_incremental_paths: int = 1000,
+    ) -> StatusSnapshot:
+        """Returns a structured `StatusSnapshot` of the working tree.
+
+        #### :params:
+
+        `previous`: A snapshot from an earlier call.
+        If given, only paths whose mtime changed since it was taken (plus its dirty paths) are re-checked and everything else is carried over.
+        Ignored directories found by earlier scans (see `StatusSnapshot.ignored_dirs`) aren't looked inside.
+        A full scan is done instead if the index or `HEAD` moved, a `.gitignore` changed,
+        or more than `max_incremental_paths` paths changed.
+
+        `fsmonitor`: Let git use its builtin fsmonitor and untracked cache.
+
+        >>> git status --porcelain=v2 -z --branch"""
+        git_dir = find_git_dir(self.cwd)
+        root = find_work_tree(self.cwd)
+        if not git_dir or not root:
+            raise FileNotFoundError("Not inside a git working tree.")
+        taken_at = time.time_ns()
+        try:
+            stat = (git_dir / "index").stat()
+            index_stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            index_stamp = (0, 0)
+        # Reports ignored directories without descending into them, so later scans can skip them
+        args = ["status", "--porcelain=v2", "-z", "--branch", "--ignored=matching"]
+        if fsmonitor:
+            args = [
+                "-c",
+                "core.fsmonitor=true",
+                "-c",
+                "core.untrackedCache=true",
+                *args,
+            ]
+        pathspecs: list[str] | None = None
+        if previous and previous.index_stamp == index_stamp:
+            # File mtimes come from a coarser clock than `time.time_ns()` (2s on some filesystems),
+            # so look back a little to not miss writes that landed just after the previous scan started
+            pathspecs = changed_since(
+                root,
+                previous.taken_at - 2_000_000_000,
+                [path.rstrip("/") for path in previous.ignored_dirs],
+            )
+            pathspecs += [
+                path
+                for entry in previous.entries.values()
+                for path in (entry.path, entry.orig_path)
+                if path
+            ]
+            pathspecs = list(dict.fromkeys(pathspecs))
+            if (
+                "." in pathspecs
+                or len(pathspecs) > max_incremental_paths
+                # What's ignored may have changed anywhere below it
+                or any(os.path.basename(path) == ".gitignore" for path in pathspecs)
+            ):
+                pathspecs = None
+        with self.capturing_output():
+            if previous is None or pathspecs is None:
+                return self._snapshot(args, taken_at, index_stamp)
+            # Still run when nothing changed to refresh the branch header,
+            # `.git` is never reported so it makes a pathspec that matches nothing
+            snapshot = self._snapshot(
+                [
+                    *args,
+                    "--",
+                    *(f":(top,literal){path}" for path in pathspecs or [".git"]),
+                ],
+                taken_at,
+                index_stamp,
+            )
+        if snapshot.oid != previous.oid:
+            return self.status_snapshot(fsmonitor=fsmonitor)
+        entries = {
+            path: entry
+            for path, entry in previous.entries.items()
+            if not any(
+                path == spec or path.startswith(f"{spec}/") for spec in pathspecs
+            )
+        }
+        entries.update(snapshot.entries)
+        snapshot.entries = entries
+        snapshot.ignored_dirs = sorted(
+            {
+                path
+                for path in previous.ignored_dirs
+                if not any(
+                    path.rstrip("/") == spec or path.startswith(f"{spec}/")
+                    for spec in pathspecs
+                )
+            }
+            | set(snapshot.ignored_dirs)
+        )
+        return snapshot
+
+    def _snapshot(
+        self, args: list[str], taken_at: int, index_stamp: tuple[int, int]
+    ) -> StatusSnapshot:
+        snapshot = parse_porcelain_v2(self.run_argv(args).stdout)
+        snapshot.taken_at = taken_at
+        snapshot.index_stamp = index_stamp
+        # Only asked for to find ignored directories, ignored files aren't part of the status
+        ignored = [
+            path for path, entry in snapshot.entries.items() if entry.kind == "ignored"
+        ]
+        snapshot.ignored_dirs = sorted(path for path in ignored if path.endswith("/"))
+        for path in ignored:
+            del snapshot.entries[path]
+        return snapshot
 
     def switch_branch(self, branch_name: str) -> Output:
         """Switch to the branch specified by `branch_name`.
         >>> git checkout {branch_name}"""
-        return self.checkout(branch_name)
+        return self.run_argv(["checkout", branch_name])
 
     def undo(self) -> Output:
         """Undo uncommitted changes.
         >>> git checkout ."""
-        return self.checkout(".")
+        return self.run_argv(["checkout", "."])
 
     def untrack(self, *paths: Pathish) -> Output:
         """Remove any number of `paths` from the index.
 
-        Equivalent to
-        >>> git rm --cached {path}
-
-        for each path in `paths`."""
-        paths_ = [str(path) for path in paths]
-        return sum(
-            [self.rm(f"--cached {path}") for path in paths_[1:]],
-            self.rm(f"--cached {paths_[0]}"),
+        Paths are passed on stdin, so this is a single process regardless of how many paths there are,
+        and the returned `Output` has one return code for all of them rather than one per path.
+        Paths that match nothing are ignored instead of failing the others.
+        Paths the index shows aren't tracked are skipped. If that leaves nothing to untrack, git isn't run.
+        >>> git rm --cached --ignore-unmatch --pathspec-from-file=- --pathspec-file-nul
+        """
+        index = self._usable_index()
+        if index:
+            paths = tuple(
+                path
+                for path in paths
+                if (relative := self._index_path(path, directories=True)) is None
+                or index.covers(relative)
+            )
+            if not paths:
+                return Output([0])
+        return self.run_argv(
+            ["rm", "--cached", "--ignore-unmatch", *PATHSPEC_FROM_STDIN],
+            input=pathspec_input(paths),
         )
 
+    def refs(self) -> dict[str, str]:
+        """Returns every ref as a mapping of full ref name to sha.
+
+        Read from `packed-refs` and `refs/` without starting git."""
+        return self.ref_store.refs()
+
+    def resolve_ref(self, name: str) -> str | None:
+        """Returns the sha for the full ref `name` (e.g. `refs/tags/v1.0.0`) or `None` if it doesn't exist.
+
+        A packed ref lookup is a bisect over the memory mapped `packed-refs` file."""
+        return self.ref_store.get(name)
+
+    def tags(self) -> dict[str, str]:
+        """Returns tags as a mapping of tag name to the sha the tag points at.
+
+        Read from `packed-refs` and `refs/tags` without starting git."""
+        return self.ref_store.tags()
+
+    def tracked_files(self) -> list[str]:
+        """Returns every tracked path, relative to the top of the working tree.
+
+        Read from the index without starting git, falling back to git for indexes that can't be parsed (i.e. split indexes).
+        >>> git ls-files -z --full-name -- :/"""
+        try:
+            return self.index.paths()
+        except ValueError:
+            pass
+        with self.capturing_output():
+            output = self.run_argv(["ls-files", "-z", "--full-name", "--", ":/"])
+        return list(dict.fromkeys(output.stdout.split("\0")[:-1]))
+
+    def remotes(self) -> list[str]:
+        """Returns the names of this repo's remotes.
+
+        Read from the repo's config file without starting git."""
+        return list(remote_cache.remotes(self.cwd))
+
+    def submodule_paths(self) -> list[str]:
+        """Returns the paths of the submodules listed in `.gitmodules`, relative to the top of the working tree.
+        >>> git config --file .gitmodules --get-regexp '^submodule\\..*\\.path$'"""
+        work_tree = find_work_tree(self.cwd)
+        if not work_tree or not (work_tree / ".gitmodules").exists():
+            return []
+        with self.capturing_output():
+            output = self.run_argv(
+                [
+                    "config",
+                    "--file",
+                    work_tree / ".gitmodules",
+                    "--get-regexp",
+                    r"^submodule\..*\.path$",
+                ]
+            )
+        return [
+            line.split(" ", 1)[1] for line in output.stdout.splitlines() if " " in line
+        ]
+
+    def update_submodules(
+        self,
+        parallel: int = 4,
+        args: str = "",
+        retries: int = 2,
+        retry_delay: float = 1.0,
+        progress: Callable[[TargetResult, int, int], None] | None = None,
+    ) -> dict[str, TargetResult]:
+        """Initialize and update every submodule, running up to `parallel` updates at once.
+
+        Submodules are initialized in one call first so the updates don't contend for the repo's config file.
+        Failed updates are retried with backoff, see `parallel.run_targets`.
+
+        Returns a `TargetResult` per submodule path.
+        >>> git submodule init
+        >>> git submodule update {args} -- {path}"""
+        work_tree = find_work_tree(self.cwd)
+        paths = self.submodule_paths()
+        if not work_tree or not paths:
+            return {}
+        worker = Git(True, cwd=work_tree)
+        worker.run_argv(["submodule", "init"])
+        tasks = {
+            path: functools.partial(
+                worker.run_argv, ["submodule", "update", *shlex.split(args), "--", path]
+            )
+            for path in paths
+        }
+        try:
+            return run_targets(tasks, parallel, retries, retry_delay, progress)
+        finally:
+            worker.close()
+
     def rename_file(self, file: Pathish, new_name: str) -> Output:
         """Rename `file` to `new_name` and add renaming to staging index.
 
@@ -479,18 +1585,55 @@ class Git(Morbin):
 
         Equivalent to renaming `old_file.py` to `new_file.py` then executing
         >>> git add new_file.py
-        >>> git rm old_file.py"""
+        >>> git rm old_file.py
+
+        If the index shows `old_file.py` isn't tracked, only `new_file.py` is added."""
         file = Pathier(file)
+        index = self._usable_index()
+        tracked = True
+        if index and (path := self._index_path(file)) is not None:
+            tracked = index.covers(path)
         new_file = file.replace(file.with_name(new_name))
-        return self.add_files([new_file]) + self.rm(str(file))
+        outputs = [self.add_files([new_file])]
+        if tracked:
+            outputs.append(self.run_argv(["rm", file]))
+        return combine_outputs(outputs)
 
 
 # |===============================Requires GitHub CLI to be installed and configured===============================|
 class GitHub(Morbin):
+    # Set to a `Profiler` to record every command this instance runs
+    profiler: Profiler | None = None
+
+    def __init__(
+        self,
+        capture_output: bool = False,
+        shell: bool = False,
+        cwd: Pathish | None = None,
+    ):
+        """See `Morbin` for `capture_output` and `shell`.
+
+        `cwd`: The repo directory commands run in. Defaults to the current working directory at call time.
+        """
+        super().__init__(capture_output, shell)
+        self.cwd = Pathier(cwd) if cwd else None
+
     @property
     def program(self) -> str:
         return "gh"
 
+    @instrumented
+    def run(self, *args: str, input: str | None = None) -> Output:
+        """Run gh with any number of args in `self.cwd`.
+
+        `input` will be written to the process' stdin if given.
+
+        Returns an `Output` object."""
+        command = [self.program]
+        for arg in args:
+            command.extend(shlex.split(arg))
+        return run_command(command, self.capture_output, self.shell, self.cwd, input)
+
     @property
     def owner(self) -> str:
         return self._owner_reponame().split("/")[0]
@@ -500,15 +1643,212 @@ class GitHub(Morbin):
         return self._owner_reponame().split("/")[1]
 
     def _change_visibility(self, visibility: str) -> Output:
-        return self.run(
-            f"repo edit {self.owner}/{self.repo_name} --visibility {visibility}"
-        )
+        return self.run(f"repo edit {self._owner_reponame()} --visibility {visibility}")
 
     def _owner_reponame(self) -> str:
-        """Returns "owner/repo-name", assuming there's one remote origin url and it's for github."""
-        git = Git()
-        with git.capturing_output():
-            return urlparse(git.origin_url.stdout.strip("\n")).path.strip("/")
+        """Returns "owner/repo-name", assuming there's one remote origin url and it's for github.
+
+        The url is read from the repo's config file and cached until that file changes.
+        Falls back to `git remote get-url origin` if origin isn't set in the config file itself.
+        """
+        url = remote_cache.url(self.cwd)
+        if not url:
+            with Git(True, cwd=self.cwd) as git:
+                url = git.origin_url.stdout.strip()
+        return owner_reponame(url)
+
+    def _is_rate_limited(self, output: Output) -> bool:
+        error = output.stderr.lower()
+        return "rate limit" in error or "http 429" in error
+
+    def _paced_run(self, pacer: Pacer, args: str, retries: int = 5) -> Output:
+        """Run `args`, backing off and retrying while GitHub reports rate limiting."""
+        with self.capturing_output():
+            for _ in range(retries):
+                pacer.wait()
+                output = self.run(args)
+                if not self._is_rate_limited(output):
+                    pacer.succeeded()
+                    return output
+                pacer.throttled()
+        return output
+
+    def _repo_names(self, repos: Iterable[Pathish]) -> dict[str, str | None]:
+        """Map each of `repos` to "owner/repo-name".
+
+        Existing directories are treated as local repos and resolved from their origin url,
+        anything else is assumed to already be "owner/repo-name"."""
+        names: dict[str, str | None] = {}
+        for repo in repos:
+            path = Pathier(repo)
+            if path.is_dir():
+                url = remote_cache.url(path)
+                try:
+                    names[str(repo)] = owner_reponame(url) if url else None
+                except ValueError:
+                    names[str(repo)] = None
+            else:
+                names[str(repo)] = str(repo)
+        return names
+
+    def graphql(
+        self,
+        query: str,
+        variables: dict[str, Any] | None = None,
+        pacer: Pacer | None = None,
+        retries: int = 5,
+    ) -> dict[str, Any]:
+        """Send a GraphQL request through `gh api graphql` and return the decoded response.
+
+        Rate limited requests are retried with backoff. Failures are returned in the response's `errors` list.
+        """
+        pacer = pacer or Pacer()
+        body = json.dumps({"query": query, "variables": variables or {}})
+        with self.capturing_output():
+            for _ in range(retries):
+                pacer.wait()
+                output = self.run("api graphql --input -", input=body)
+                try:
+                    response = json.loads(output.stdout)
+                except json.JSONDecodeError:
+                    response = {
+                        "errors": [{"message": output.stderr.strip() or output.stdout}]
+                    }
+                errors = response.get("errors") or []
+                if self._is_rate_limited(output) or any(
+                    error.get("type") == "RATE_LIMITED" for error in errors
+                ):
+                    pacer.throttled()
+                    continue
+                pacer.succeeded()
+                rate_limit = (response.get("data") or {}).get("rateLimit")
+                if rate_limit and rate_limit["remaining"] < 10:
+                    reset = datetime.fromisoformat(
+                        rate_limit["resetAt"].replace("Z", "+00:00")
+                    )
+                    pacer.throttled(
+                        (reset - datetime.now(reset.tzinfo)).total_seconds()
+                    )
+                return response
+        return response
+
+    def bulk_info(
+        self, repos: Iterable[str], batch_size: int = 100
+    ) -> dict[str, dict[str, Any] | None]:
+        """Look up the node id and visibility for many "owner/repo-name" repos with one aliased GraphQL query per `batch_size` repos.
+
+        Repos that don't exist or aren't accessible map to `None`."""
+        repos = list(dict.fromkeys(repos))
+        info: dict[str, dict[str, Any] | None] = {}
+        pacer = Pacer()
+        for start in range(0, len(repos), batch_size):
+            batch = repos[start : start + batch_size]
+            variables: dict[str, str] = {}
+            for i, repo in enumerate(batch):
+                variables[f"o{i}"], _, variables[f"n{i}"] = repo.partition("/")
+            definitions = ", ".join(
+                f"$o{i}: String!, $n{i}: String!" for i in range(len(batch))
+            )
+            fields = " ".join(
+                f"r{i}: repository(owner: $o{i}, name: $n{i}) {{ id nameWithOwner visibility }}"
+                for i in range(len(batch))
+            )
+            response = self.graphql(
+                f"query({definitions}) {{ rateLimit {{ remaining resetAt }} {fields} }}",
+                variables,
+                pacer,
+            )
+            data = response.get("data") or {}
+            for i, repo in enumerate(batch):
+                info[repo] = data.get(f"r{i}")
+        return info
+
+    def bulk_create(
+        self, names: Iterable[str], public: bool = False, batch_size: int = 25
+    ) -> dict[str, Output]:
+        """Create many repos with one aliased `createRepository` GraphQL mutation per `batch_size` repos.
+
+        Returns an `Output` per repo name with the new repo's url in `stdout` or the error in `stderr`.
+        """
+        names = list(dict.fromkeys(names))
+        visibility = "PUBLIC" if public else "PRIVATE"
+        results: dict[str, Output] = {}
+        pacer = Pacer()
+        for start in range(0, len(names), batch_size):
+            batch = names[start : start + batch_size]
+            definitions = ", ".join(f"$n{i}: String!" for i in range(len(batch)))
+            fields = " ".join(
+                f"r{i}: createRepository(input: {{name: $n{i}, visibility: {visibility}}}) {{ repository {{ url }} }}"
+                for i in range(len(batch))
+            )
+            response = self.graphql(
+                f"mutation({definitions}) {{ {fields} }}",
+                {f"n{i}": name for i, name in enumerate(batch)},
+                pacer,
+            )
+            results.update(self._alias_results(batch, response))
+        return results
+
+    def _alias_results(
+        self, batch: list[str], response: dict[str, Any]
+    ) -> dict[str, Output]:
+        """Map `r{i}` aliases in a GraphQL response back to `batch` items."""
+        data = response.get("data") or {}
+        errors: dict[str, str] = {}
+        for error in response.get("errors") or []:
+            alias = (error.get("path") or [""])[0]
+            errors[alias] = error.get("message", "")
+        results: dict[str, Output] = {}
+        for i, item in enumerate(batch):
+            result = data.get(f"r{i}")
+            if result and f"r{i}" not in errors:
+                results[item] = Output(
+                    [0], (result.get("repository") or {}).get("url", "")
+                )
+            else:
+                message = errors.get(f"r{i}") or errors.get("") or "Unknown error."
+                results[item] = Output([1], stderr=message)
+        return results
+
+    def bulk_delete(self, repos: Iterable[Pathish]) -> dict[str, Output]:
+        """Delete many repos, given as local repo paths or "owner/repo-name".
+
+        GraphQL has no repository deletion, so this is one paced `gh api -X DELETE` per repo.
+        Returns an `Output` per repo."""
+        results: dict[str, Output] = {}
+        pacer = Pacer()
+        for repo, name in self._repo_names(repos).items():
+            if not name:
+                results[repo] = Output([1], stderr="No GitHub origin url found.")
+                continue
+            results[repo] = self._paced_run(pacer, f"api -X DELETE repos/{name}")
+        return results
+
+    def bulk_edit(self, repos: Iterable[Pathish], visibility: str) -> dict[str, Output]:
+        """Set the visibility (`public`, `private`, or `internal`) of many repos, given as local repo paths or "owner/repo-name".
+
+        Current visibility for every repo is fetched with a single aliased GraphQL query and repos that are already
+        at `visibility` are skipped. GraphQL can't change visibility, so the remaining repos get a paced `gh api -X PATCH` each.
+
+        Returns an `Output` per repo."""
+        visibility = visibility.lower()
+        names = self._repo_names(repos)
+        info = self.bulk_info(name for name in names.values() if name)
+        results: dict[str, Output] = {}
+        pacer = Pacer()
+        for repo, name in names.items():
+            current = info.get(name) if name else None
+            if not name:
+                results[repo] = Output([1], stderr="No GitHub origin url found.")
+            elif current is None:
+                results[repo] = Output([1], stderr=f"Could not find {name}.")
+            elif current["visibility"].lower() == visibility:
+                results[repo] = Output([0], f"{name} is already {visibility}.")
+            else:
+                results[repo] = self._paced_run(
+                    pacer, f"api -X PATCH repos/{name} -f visibility={visibility}"
+                )
+        return results
 
     def create_remote(self, name: str, public: bool = False) -> Output:
         """Uses GitHub CLI (must be installed and configured) to create a remote GitHub repo.
@@ -535,7 +1875,7 @@ class GitHub(Morbin):
 
     def delete_remote(self) -> Output:
         """Uses GitHub CLI (must be isntalled and configured) to delete the remote for this repo."""
-        return self.run(f"repo delete {self.owner}/{self.repo_name} --yes")
+        return self.run(f"repo delete {self._owner_reponame()} --yes")
 
     def make_private(self) -> Output:
         """Uses GitHub CLI (must be installed and configured) to set the repo's visibility to private."""
@@ -1,16 +1,36 @@
+import argparse
 import os
-from datetime import datetime
+import sys
+from typing import TYPE_CHECKING, Callable, ParamSpec, TypeVar
 
 from argshell import ArgShell, Namespace, with_parser
-from noiftimer import Timer
-from pathier import Pathier
 
-from gitbetter import Git, GitHub, parsers
+# `parsers` only depends on `argshell`, so importing it here costs nothing extra.
+# Everything else (`Git`, `GitHub`, `noiftimer`, etc.) is imported on first use to keep time-to-prompt down.
+from gitbetter import parsers
+
+if TYPE_CHECKING:
+    from morbin import Output
+
+    from gitbetter.git import Git, GitHub
+    from gitbetter.liveprompt import LivePrompt
+    from gitbetter.parallel import TargetResult
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+def convenience(func: Callable[P, R]) -> Callable[P, R]:
+    """Mark a `do_*` command as a convenience command so `help` lists it separately from the git commands."""
+    setattr(func, "convenience", True)
+    return func
 
 
 class GitArgShell(ArgShell):
     git_header = "Built in Git commands (type '{command} -h' or '{command} --help'):"
     convenience_header = "Convenience commands (type 'help {command}'):"
+    # Rendered `help` listing per class
+    _help_text: dict[type, str] = {}
 
     def do_help(self, arg: str):
         """List available commands with "help" or detailed help with "help cmd".
@@ -42,54 +62,111 @@ class GitArgShell(ArgShell):
                 return
             func()
         else:
-            names = self.get_names()
-            cmds_doc: list[str] = []
-            cmds_undoc: list[str] = []
-            topics: set[str] = set()
-            for name in names:
-                if name[:5] == "help_":
-                    topics.add(name[5:])
-            names.sort()
-            # There can be duplicates if routines overridden
-            prevname = ""
-            for name in names:
-                if name[:3] == "do_":
-                    if name == prevname:
-                        continue
-                    prevname = name
-                    cmd = name[3:]
-                    if cmd in topics:
-                        cmds_doc.append(cmd)
-                        topics.remove(cmd)
-                    elif getattr(self, name).__doc__:
-                        cmds_doc.append(cmd)
-                    else:
-                        cmds_undoc.append(cmd)
-            # |========================Modification Start========================|
-            content = Pathier(__file__).read_text()
-            convenience_index = content.rfind("=Convenience=")
-            git_commands: list[str] = []
-            convenience_commands: list[str] = []
-            for cmd in cmds_doc:
-                if content.find(f"do_{cmd}") < convenience_index:
-                    git_commands.append(cmd)
+            help_text = self._help_text.get(type(self))
+            if help_text is None:
+                help_text = self._render_help()
+                self._help_text[type(self)] = help_text
+            self.stdout.write(help_text)
+
+    def _render_help(self) -> str:
+        """Build the command listing shown by a bare `help`.
+
+        Commands are sorted into git and convenience commands by the `convenience` decorator,
+        so this only depends on the class and is rendered once per class."""
+        names = self.get_names()
+        cmds_doc: list[str] = []
+        cmds_undoc: list[str] = []
+        topics: set[str] = set()
+        for name in names:
+            if name[:5] == "help_":
+                topics.add(name[5:])
+        names.sort()
+        # There can be duplicates if routines overridden
+        prevname = ""
+        for name in names:
+            if name[:3] == "do_":
+                if name == prevname:
+                    continue
+                prevname = name
+                cmd = name[3:]
+                if cmd in topics:
+                    cmds_doc.append(cmd)
+                    topics.remove(cmd)
+                elif getattr(self, name).__doc__:
+                    cmds_doc.append(cmd)
                 else:
-                    convenience_commands.append(cmd)
-            self.stdout.write("%s\n" % str(self.doc_leader))
+                    cmds_undoc.append(cmd)
+        # |========================Modification Start========================|
+        git_commands: list[str] = []
+        convenience_commands: list[str] = []
+        for cmd in cmds_doc:
+            if getattr(getattr(self, f"do_{cmd}"), "convenience", False):
+                convenience_commands.append(cmd)
+            else:
+                git_commands.append(cmd)
+        # Topics are printed through the rich console, so capture there
+        with self.console.capture() as capture:
+            self.console.print(str(self.doc_leader))
             self.print_topics(self.git_header, git_commands, 15, 80)
             self.print_topics(self.convenience_header, convenience_commands, 15, 80)
             # |========================Modification Stop========================|
             self.print_topics(self.misc_header, sorted(topics), 15, 80)
             self.print_topics(self.undoc_header, cmds_undoc, 15, 80)
+        return capture.get()
 
 
 class GitBetter(GitArgShell):
     """GitBetter Shell."""
 
     execute_in_terminal_if_unrecognized = True
-    git = Git()
     intro = "Starting gitbetter...\nEnter 'help' or '?' for command help."
-    prompt = f"gitbetter::{Pathier.cwd()}>"
+    prompt = f"gitbetter::{os.getcwd()}>"
+    # Longest the live prompt waits after a command for its refresh before showing the stale state
+    live_prompt_grace = 0.05
+    _git: "Git | None" = None
+    _live_prompt: "LivePrompt | None" = None
+    # Exit status of the last unrecognized command run in the system shell
+    _system_status = 0
+    # The git dir and config file stamps `git.hooks` was loaded for
+    _hooks_stamp: list | None = None
+
+    @property
+    def git(self) -> "Git":
+        """Created on first use."""
+        if self._git is None:
+            from gitbetter.git import Git
+
+            self._git = Git()
+        return self._git
+
+    @property
+    def github(self) -> "GitHub":
+        from gitbetter.git import GitHub
+
+        github = GitHub()
+        github.profiler = self.git.profiler
+        return github
+
+    def _load_hooks(self):
+        """Set `self.git.hooks` from the current repo's `gitbetter-check` config sections.
+
+        Config is only read again when the repo or one of its config files changes."""
+        from gitbetter.gitdir import config_files, find_git_dir, stamps
+        from gitbetter.hooks import Hooks
+
+        git_dir = find_git_dir(self.git.cwd)
+        stamp = [str(git_dir), stamps(config_files(git_dir))] if git_dir else None
+        if stamp and stamp == self._hooks_stamp:
+            return
+        with self.git.capturing_output():
+            config = self.git.config("--get-regexp '^gitbetter-check\\.'").stdout
+        self.git.hooks = Hooks.from_config(config) if config else None
+        self._hooks_stamp = stamp
+
+    def _print_check_failures(self, output: "Output"):
+        """Print the report of failed commit checks, the only `stderr` an uncaptured `output` has."""
+        if output.stderr:
+            print(output.stderr)
 
     @property
     def unrecognized_command_behavior_status(self):
@@ -97,14 +174,87 @@ class GitBetter(GitArgShell):
 
     def default(self, line: str):
         if self.execute_in_terminal_if_unrecognized:
-            os.system(line)
+            self._system_status = os.waitstatus_to_exitcode(os.system(line))
         else:
             super().default(line)
 
+    def run_commands(self, commands: list[str]) -> int:
+        """Run each of `commands` as if entered at the prompt.
+
+        Returns `0` if every command succeeded, otherwise the exit status of the last failure:
+        the return code of a failed git command, the status of a failed system command, or `1` if a command raised.
+        """
+        status = 0
+        for command in commands:
+            if self._git:
+                self._git.last_output = None
+            self._system_status = 0
+            try:
+                self.onecmd(command)
+            except Exception as e:
+                print(f"{command}: {e}", file=sys.stderr)
+                status = 1
+                continue
+            output = self._git.last_output if self._git else None
+            codes = [code for code in output.return_code if code] if output else []
+            if codes or self._system_status:
+                status = codes[-1] if codes else self._system_status
+        return status
+
+    def _page(self, subcommand: str, args: str):
+        """Print the output of `git {subcommand} {args}` as it arrives.
+
+        When attached to a terminal, git's own pager is used, so `core.pager`, `pager.{subcommand}` and `color.ui` are respected.
+        Either way the exit status is recorded in `self.git.last_output`.
+        """
+        if sys.stdin.isatty() and sys.stdout.isatty():
+            self.git.run(f"--paginate {subcommand}", args)
+            return
+        from morbin import Output
+
+        def run() -> Output:
+            with self.git.stream(subcommand, args) as stream:
+                for line in stream:
+                    print(line)
+            return Output([stream.return_code])
+
+        if self.git.profiler:
+            self.git.last_output = self.git.profiler.measure(
+                self.git.program, (subcommand, args), run, False
+            )
+        else:
+            self.git.last_output = run()
+
+    def postcmd(self, stop: bool, line: str) -> bool:
+        if self._live_prompt:
+            self._update_live_prompt()
+        return stop
+
+    def postloop(self):
+        if self._live_prompt:
+            self._live_prompt.close()
+            self._live_prompt = None
+
+    def _update_live_prompt(self):
+        """Refresh the live prompt after a command, following the shell into other repos."""
+        from gitbetter.liveprompt import LivePrompt
+
+        live = self._live_prompt
+        if live and str(live.cwd) != os.getcwd():
+            live.close()
+            live = None
+        if live:
+            live.refresh()
+        else:
+            live = LivePrompt()
+        self._live_prompt = live
+        live.wait(self.live_prompt_grace)
+        self.prompt = live.render()
+
     def do_cd(self, path: str):
         """Change current working directory to `path`."""
         os.chdir(path)
-        self.prompt = f"gitbetter::{Pathier.cwd()}>"
+        self.prompt = f"gitbetter::{os.getcwd()}>"
 
     def do_help(self, arg: str):
         """List available commands with "help" or detailed help with "help cmd"."""
@@ -117,6 +267,50 @@ class GitBetter(GitArgShell):
                 )
         print()
 
+    @with_parser(parsers.stats_parser)
+    def do_stats(self, args: Namespace):
+        """Record timing for every git/gh command this shell runs and show or export the results.
+
+        Recording is off until `stats on`."""
+        from gitbetter.profiling import Profiler
+
+        profiler = self.git.profiler
+        if args.action == "on":
+            self.git.profiler = profiler or Profiler()
+            print("Recording command stats.")
+        elif args.action == "off":
+            self.git.profiler = None
+            print("Stopped recording command stats.")
+        elif not profiler:
+            print("Not recording, use `stats on` to start.")
+        elif args.action == "clear":
+            profiler.clear()
+        elif args.action in ("jsonl", "trace"):
+            if not args.path:
+                print(f"A path is required to export {args.action}.")
+                return
+            if args.action == "jsonl":
+                profiler.to_jsonl(args.path)
+            else:
+                profiler.to_chrome_trace(args.path)
+            print(f"Exported {len(profiler.invocations)} commands to {args.path}.")
+        else:
+            print(profiler.histogram())
+
+    @with_parser(parsers.prompt_parser)
+    def do_prompt(self, args: Namespace):
+        """Show the branch, how far it is ahead of/behind `origin/{branch}`, and how many files are dirty in the prompt.
+
+        The state is computed in the background after every command and whenever `.git` changes,
+        so the prompt never waits on git. A `…` marks a state that's still being refreshed.
+        """
+        if args.action == "on":
+            if not self._live_prompt:
+                self._update_live_prompt()
+        else:
+            self.postloop()
+            self.prompt = f"gitbetter::{os.getcwd()}>"
+
     def do_toggle_unrecognized_command_behavior(self, arg: str):
         """Toggle whether the shell will attempt to execute unrecognized commands as system commands in the terminal.
         When on (the default), `GitBetter` will treat unrecognized commands as if you added the `sys` command in front of the input, i.e. `os.system(your_input)`.
@@ -158,8 +352,10 @@ class GitBetter(GitArgShell):
         self.git.bisect(args)
 
     def do_blame(self, args: str):
-        """>>> git blame {args}"""
-        self.git.blame(args)
+        """>>> git blame {args}
+
+        Output is paged as it arrives."""
+        self._page("blame", args)
 
     def do_branch(self, args: str):
         """>>> git branch {args}"""
@@ -214,8 +410,10 @@ class GitBetter(GitArgShell):
         self.git.diagnose(args)
 
     def do_diff(self, args: str):
-        """>>> git diff {args}"""
-        self.git.diff(args)
+        """>>> git diff {args}
+
+        Output is paged as it arrives."""
+        self._page("diff", args)
 
     def do_difftool(self, args: str):
         """>>> git difftool {args}"""
@@ -258,8 +456,10 @@ class GitBetter(GitArgShell):
         self.git.gitweb(args)
 
     def do_grep(self, args: str):
-        """>>> git grep {args}"""
-        self.git.grep(args)
+        """>>> git grep {args}
+
+        Output is paged as it arrives."""
+        self._page("grep", args)
 
     def do_gui(self, args: str):
         """>>> git gui {args}"""
@@ -274,8 +474,10 @@ class GitBetter(GitArgShell):
         self.git.instaweb(args)
 
     def do_log(self, args: str):
-        """>>> git log {args}"""
-        self.git.log(args)
+        """>>> git log {args}
+
+        Output is paged as it arrives."""
+        self._page("log", args)
 
     def do_maintenance(self, args: str):
         """>>> git maintenance {args}"""
@@ -427,6 +629,7 @@ class GitBetter(GitArgShell):
 
     # Seat |==================================Convenience==================================|
 
+    @convenience
     def do_add_url(self, url: str):
         """Add remote origin url for repo and push repo.
         >>> git remote add origin {url}
@@ -434,100 +637,198 @@ class GitBetter(GitArgShell):
         self.git.add_remote_url(url)
         self.git.push("-u origin main")
 
+    @convenience
     @with_parser(parsers.add_files_parser)
     def do_amend(self, args: Namespace):
         """Stage files and add to previous commit."""
-        self.git.amend(args.files)
+        with self.git.batch():
+            self.git.amend(args.files)
 
+    @convenience
     def do_branches(self, _: str):
         """Show local and remote branches.
         >>> git branch -vva"""
         self.git.list_branches()
 
+    @convenience
     def do_commitall(self, message: str):
         """Stage and commit all modified and untracked files with this message.
         >>> git add .
-        >>> git commit -m \"{message}\" """
-        message = message.strip('"').replace('"', "'")
-        self.git.add_all()
-        self.git.commit(f'-m "{message}"')
+        >>> git commit -F -  # message on stdin"""
+        message = message.strip('"')
+        self._load_hooks()
+        self._print_check_failures(self.git.commit_all(message))
 
+    @convenience
     @with_parser(parsers.delete_branch_parser)
     def do_delete_branch(self, args: Namespace):
         """Delete branch."""
         self.git.delete_branch(args.branch, not args.remote)
 
+    @convenience
     def do_delete_gh_repo(self, _: str):
         """Delete this repo from GitHub.
 
         GitHub CLI must be installed and configured.
 
         May require you to reauthorize and rerun command."""
-        GitHub().delete_remote()
+        self.github.delete_remote()
 
+    @convenience
     def do_dob(self, _: str):
         """Date of this repo's first commit."""
+        from datetime import datetime
+
+        from noiftimer import Timer
+
         dob = self.git.dob
         elapsed = Timer.format_time((datetime.now() - dob).total_seconds())
         print(f"{dob:%m/%d/%Y}|{elapsed} ago")
 
+    @convenience
+    @with_parser(parsers.fleet_parser)
+    def do_fleet(self, args: Namespace):
+        """Run a `Git` method across many repos in parallel, printing each repo's result as it finishes.
+
+        i.e. `fleet fetch ~/repos/* --args="--all"`"""
+        from gitbetter import fleet
+
+        args_ = (args.args,) if args.args else ()
+        failed = 0
+        try:
+            for result in fleet.run(
+                args.repos, args.method, *args_, max_workers=args.workers
+            ):
+                status = "ok" if result.ok else "failed"
+                failed += not result.ok
+                print(f"{result.repo} | {status} | {result.elapsed:.2f}s")
+                for text in (result.output.stdout, result.output.stderr):
+                    if text.strip():
+                        print(text.rstrip())
+        except ValueError as e:
+            print(e)
+            return
+        print(f"{failed} repo(s) failed.")
+
+    def _print_target(self, result: "TargetResult", done: int, total: int):
+        status = "ok" if result.ok else "failed"
+        attempts = f" ({result.attempts} attempts)" if result.attempts > 1 else ""
+        print(
+            f"[{done}/{total}] {result.target} | {status} | {result.elapsed:.2f}s{attempts}"
+        )
+        if not result.ok and result.output.stderr.strip():
+            print(result.output.stderr.rstrip())
+
+    @convenience
+    @with_parser(parsers.parallel_parser)
+    def do_fetch_all(self, args: Namespace):
+        """Fetch every remote in parallel, printing each remote's result as it finishes."""
+        results = self.git.fetch_all(
+            args.jobs, args.args, args.retries, progress=self._print_target
+        )
+        if not results:
+            print("No remotes.")
+
+    @convenience
     def do_ignore(self, patterns: str):
         """Add the list of patterns/file names to `.gitignore` and commit with the message `chore: add to gitignore`."""
         self.git.ignore(patterns.split())
-        self.git.commit_files([".gitignore"], "chore: add to gitignore")
+        self._load_hooks()
+        self._print_check_failures(
+            self.git.commit_files([".gitignore"], "chore: add to gitignore")
+        )
 
+    @convenience
     @with_parser(parsers.add_files_parser)
     def do_initcommit(self, args: Namespace):
         """Stage and commit all files with message "Initial Commit"."""
         self.git.initcommit(args.files)
 
+    @convenience
     def do_loggy(self, _: str):
         """>>> git --oneline --name-only --abbrev-commit --graph"""
         self.git.loggy()
 
+    @convenience
     def do_make_private(self, _: str):
         """Make the GitHub remote for this repo private.
 
         This repo must exist and GitHub CLI must be installed and configured."""
-        GitHub().make_private()
+        self.github.make_private()
 
+    @convenience
     def do_make_public(self, _: str):
         """Make the GitHub remote for this repo public.
 
         This repo must exist and GitHub CLI must be installed and configured."""
-        GitHub().make_public()
+        self.github.make_public()
 
+    @convenience
     def do_merge_to(self, branch: str):
         """Merge the current branch into the provided branch after switching to the provided branch.
 
         If no branch name is given, "main" will be used."""
         self.git.merge_to(branch or "main")
 
+    @convenience
     def do_new_branch(self, name: str):
         """Create and switch to a new branch with this `name`."""
         self.git.create_new_branch(name)
 
+    @convenience
     @with_parser(parsers.new_remote_parser)
     def do_new_gh_remote(self, args: Namespace):
         """Create a remote GitHub repository for this repo.
 
         GitHub CLI must be installed and configured for this to work."""
-        GitHub().create_remote_from_cwd(args.public)
+        self.github.create_remote_from_cwd(args.public)
 
+    @convenience
     def do_new_repo(self, _: str):
         """Create a new git repo in this directory."""
         self.git.new_repo()
 
+    @convenience
     def do_push_new(self, _: str):
         """Push current branch to origin with `-u` flag.
+
+        If `origin` already has every commit on this branch, only the upstream is set and nothing is pushed.
         >>> git push -u origin {this_branch}"""
-        self.git.push_new_branch(self.git.current_branch)
+        branch = self.git.current_branch
+        remote = f"refs/remotes/origin/{branch}"
+        if (
+            self.git.resolve_ref(remote)
+            and not self.git.ahead_behind(branch, remote)[0]
+        ):
+            with self.git.capturing_output():
+                tracking = self.git.run_argv(
+                    ["config", "--get", f"branch.{branch}.merge"]
+                )
+            if not tracking.stdout.strip():
+                self.git.run_argv(["branch", "--set-upstream-to", f"origin/{branch}"])
+            print(f"Nothing to push, `origin/{branch}` is up to date.")
+            return
+        self.git.push_new_branch(branch)
+
+    @convenience
+    @with_parser(parsers.parallel_parser)
+    def do_update_submodules(self, args: Namespace):
+        """Initialize and update every submodule in parallel, printing each submodule's result as it finishes.
+
+        i.e. `update_submodules -j 8 --args="--recursive"`"""
+        results = self.git.update_submodules(
+            args.jobs, args.args, args.retries, progress=self._print_target
+        )
+        if not results:
+            print("No submodules.")
 
+    @convenience
     def do_undo(self, _: str):
         """Undo all uncommitted changes.
         >>> git checkout ."""
         self.git.undo()
 
+    @convenience
     @with_parser(parsers.add_files_parser)
     def do_untrack(self, args: Namespace):
         """Untrack files matching provided path/pattern list.
@@ -536,15 +837,39 @@ class GitBetter(GitArgShell):
         >>> git rm --cached {path}"""
         self.git.untrack(*args.files)
 
+    @convenience
     @with_parser(parsers.rename_file_parser)
     def do_rename_file(self, args: Namespace):
         """Renames a file.
         After renaming the file, the renaming change is staged for commit."""
-        self.git.rename_file(args.file, args.new_name)
-
-
-def main():
-    GitBetter().cmdloop()
+        with self.git.batch():
+            self.git.rename_file(args.file, args.new_name)
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="gitbetter", description="Custom git shell to type less and commit more."
+    )
+    parser.add_argument(
+        "-c",
+        "--command",
+        type=str,
+        action="append",
+        default=[],
+        help=""" Run this shell command and exit instead of starting the shell.
+        Can be given multiple times to run several commands in order.
+        Exits with a non-zero status if any of them fail.""",
+    )
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace | None = None):
+    if not args:
+        args = get_args()
+    shell = GitBetter()
+    if args.command:
+        sys.exit(shell.run_commands(args.command))
+    shell.cmdloop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,82 @@
+import os
+
+from pathier import Pathier, Pathish
+
+
+def find_git_dir(start: Pathish | None = None) -> Pathier | None:
+    """Returns the git directory for the repo containing `start` (defaults to the current working directory).
+
+    Honors `$GIT_DIR` and follows `gitdir:` links used by worktrees and submodules.
+
+    Returns `None` if `start` isn't inside a repo."""
+    if start is None and "GIT_DIR" in os.environ:
+        return Pathier(os.environ["GIT_DIR"]).resolve()
+    path = Pathier(start or Pathier.cwd()).resolve()
+    for directory in [path, *path.parents]:
+        dotgit = directory / ".git"
+        if dotgit.is_dir():
+            return dotgit
+        if dotgit.is_file():
+            try:
+                content = dotgit.read_text().strip()
+            except OSError:
+                return None
+            if content.startswith("gitdir:"):
+                return (directory / content.removeprefix("gitdir:").strip()).resolve()
+            return None
+    return None
+
+
+def find_work_tree(start: Pathish | None = None) -> Pathier | None:
+    """Returns the top level directory of the working tree containing `start` (defaults to the current working directory).
+
+    Returns `None` if `start` isn't inside a working tree."""
+    path = Pathier(start or Pathier.cwd()).resolve()
+    for directory in [path, *path.parents]:
+        if (directory / ".git").exists():
+            return directory
+    return None
+
+
+def common_dir(git_dir: Pathier) -> Pathier:
+    """Returns the directory holding shared repo data (refs, objects, config) for `git_dir`.
+
+    This is `git_dir` itself unless `git_dir` belongs to a linked worktree."""
+    commondir = git_dir / "commondir"
+    try:
+        return (git_dir / commondir.read_text().strip()).resolve()
+    except OSError:
+        return git_dir
+
+
+def config_files(git_dir: Pathier) -> list[Pathier]:
+    """Returns the config files git reads for `git_dir`, lowest priority first:
+    system, global (`$XDG_CONFIG_HOME/git/config` and `~/.gitconfig`), the repo's, and the worktree's.
+
+    Honors `$GIT_CONFIG_SYSTEM`, `$GIT_CONFIG_NOSYSTEM`, and `$GIT_CONFIG_GLOBAL`.
+    Files pulled in with `include.path` aren't followed."""
+    files = []
+    if not os.environ.get("GIT_CONFIG_NOSYSTEM"):
+        files.append(Pathier(os.environ.get("GIT_CONFIG_SYSTEM") or "/etc/gitconfig"))
+    if "GIT_CONFIG_GLOBAL" in os.environ:
+        files.append(Pathier(os.environ["GIT_CONFIG_GLOBAL"]))
+    else:
+        xdg = os.environ.get("XDG_CONFIG_HOME") or Pathier.home() / ".config"
+        files += [Pathier(xdg) / "git" / "config", Pathier.home() / ".gitconfig"]
+    files += [common_dir(git_dir) / "config", git_dir / "config.worktree"]
+    return files
+
+
+def stamps(paths: list[Pathier]) -> list[list[int]]:
+    """Returns `[mtime_ns, size]` for each of `paths`, `[0, 0]` for ones that don't exist.
+
+    Comparing stamps is how cached values notice that the files they were read from changed.
+    """
+    result = []
+    for path in paths:
+        try:
+            stat = path.stat()
+            result.append([stat.st_mtime_ns, stat.st_size])
+        except OSError:
+            result.append([0, 0])
+    return result
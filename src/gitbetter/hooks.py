@@ -0,0 +1,192 @@
+import fnmatch
+import json
+import os
+import shlex
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from pathier import Pathier, Pathish
+
+from gitbetter.gitdir import common_dir, find_git_dir
+
+
+@dataclass(frozen=True)
+class Check:
+    """A command run against staged files before committing.
+
+    Matching file paths are appended to `command` and a non-zero exit code fails the check.
+
+    #### Fields:
+    * `name: str`
+    * `command: str` (e.g. `"black --check"`)
+    * `patterns: tuple[str, ...]` (`fnmatch` patterns matched against repo relative paths)
+    """
+
+    name: str
+    command: str
+    patterns: tuple[str, ...] = ("*",)
+
+    @property
+    def key(self) -> str:
+        """Cache key, so editing a check's command invalidates its cached results."""
+        return f"{self.name}:{self.command}"
+
+    def matches(self, path: str) -> bool:
+        return any(fnmatch.fnmatch(path, pattern) for pattern in self.patterns)
+
+
+@dataclass
+class CheckFailure:
+    """#### Fields:
+    * `check: Check`
+    * `files: list[str]` (the shard the check failed on)
+    * `output: str` (combined stdout and stderr)"""
+
+    check: Check
+    files: list[str]
+    output: str
+
+
+def _run_shard(command: str, files: list[str], cwd: str) -> tuple[int, str]:
+    """Run `command` on `files` in `cwd`. Executed in a pool worker."""
+    try:
+        process = subprocess.run(
+            shlex.split(command) + files,
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+    except OSError as error:
+        return 1, str(error)
+    return process.returncode, process.stdout
+
+
+class Hooks:
+    """Runs `checks` over staged files in a process pool before `Git.commit_all` and `Git.commit_files` commit.
+
+    Each check's files are split into one shard per worker.
+    Passing results are cached by blob sha in `.git/gitbetter/hooks.json`,
+    so a file's content is only checked once per check.
+    The cache keeps the `max_cached` most recently seen shas per check and drops checks that are no longer configured.
+
+    >>> git = Git()
+    >>> git.hooks = Hooks([Check("black", "black --check", ("*.py",))])
+    >>> git.commit_all("feat: something")"""
+
+    def __init__(
+        self,
+        checks: list[Check],
+        max_workers: int | None = None,
+        max_cached: int = 10_000,
+    ):
+        self.checks = checks
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_cached = max_cached
+
+    @classmethod
+    def from_config(cls, config: str) -> "Hooks":
+        """Load checks from `git config --get-regexp '^gitbetter-check\\.'` output.
+
+        i.e. a repo's `.git/config` containing
+        >>> [gitbetter-check "black"]
+        >>>     command = black --check
+        >>>     pattern = *.py
+
+        `pattern` can be given multiple times and defaults to every file."""
+        commands: dict[str, str] = {}
+        patterns: dict[str, list[str]] = {}
+        for line in config.splitlines():
+            key, _, value = line.partition(" ")
+            section, _, option = key.rpartition(".")
+            name = section.partition(".")[2]
+            if option == "command":
+                commands[name] = value
+            elif option == "pattern":
+                patterns.setdefault(name, []).append(value)
+        return cls(
+            [
+                Check(name, command, tuple(patterns.get(name, ["*"])))
+                for name, command in commands.items()
+            ]
+        )
+
+    def _cache_path(self, repo: Pathier) -> Pathier | None:
+        git_dir = find_git_dir(repo)
+        return common_dir(git_dir) / "gitbetter" / "hooks.json" if git_dir else None
+
+    def _load_cache(self, path: Pathier | None) -> dict[str, dict[str, None]]:
+        """Check key -> passing shas, ordered least to most recently seen."""
+        if not path or not path.exists():
+            return {}
+        try:
+            return {
+                key: dict.fromkeys(shas)
+                for key, shas in json.loads(path.read_text()).items()
+            }
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self, path: Pathier | None, cache: dict[str, dict[str, None]]):
+        if not path:
+            return
+        keys = {check.key for check in self.checks}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps(
+                {
+                    key: list(shas)[-self.max_cached :] if self.max_cached else []
+                    for key, shas in cache.items()
+                    if key in keys
+                }
+            )
+        )
+
+    def run(self, staged: dict[str, str], repo: Pathish) -> list[CheckFailure]:
+        """Run every check against the matching paths in `staged` (path -> blob sha) with `repo` as the working directory.
+
+        Returns the failures, which is empty if everything passed."""
+        repo = Pathier(repo)
+        cache_path = self._cache_path(repo)
+        cache = self._load_cache(cache_path)
+        shards: list[tuple[Check, list[str]]] = []
+        for check in self.checks:
+            passed = cache.setdefault(check.key, {})
+            files = []
+            for path, sha in staged.items():
+                if not check.matches(path):
+                    continue
+                if sha in passed:
+                    # Mark as recently seen so it outlives shas that are no longer staged
+                    del passed[sha]
+                    passed[sha] = None
+                else:
+                    files.append(path)
+            if not files:
+                continue
+            count = min(self.max_workers, len(files))
+            shards.extend((check, files[i::count]) for i in range(count))
+        if not shards:
+            self._save_cache(cache_path, cache)
+            return []
+        failures: list[CheckFailure] = []
+        with ProcessPoolExecutor(self.max_workers) as executor:
+            futures = [
+                (
+                    check,
+                    files,
+                    executor.submit(_run_shard, check.command, files, str(repo)),
+                )
+                for check, files in shards
+            ]
+            for check, files, future in futures:
+                return_code, output = future.result()
+                if return_code:
+                    failures.append(CheckFailure(check, files, output))
+                else:
+                    cache[check.key].update(
+                        dict.fromkeys(staged[path] for path in files)
+                    )
+        self._save_cache(cache_path, cache)
+        return failures
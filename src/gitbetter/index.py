@@ -0,0 +1,262 @@
+import bisect
+import mmap
+import os
+import stat
+import struct
+import threading
+from dataclasses import dataclass
+
+from pathier import Pathier
+
+SIGNATURE = b"DIRC"
+# ctime, mtime (seconds and nanoseconds), dev, ino, mode, uid, gid, size, sha, flags
+ENTRY = struct.Struct(">10I20sH")
+# Flags
+ASSUME_VALID = 0x8000
+EXTENDED = 0x4000
+STAGE = 0x3000
+NAME_LENGTH = 0x0FFF
+# Extended flags
+SKIP_WORKTREE = 0x4000
+INTENT_TO_ADD = 0x2000
+GITLINK = 0o160000
+
+
+@dataclass
+class IndexEntry:
+    """One entry in the index.
+
+    #### Fields:
+    * `path: str` (relative to the top of the working tree, `/` separated)
+    * `sha: str`
+    * `mode: int`
+    * `size: int` (truncated to 32 bits, like git stores it)
+    * `mtime_ns: int`
+    * `ino: int`
+    * `stage: int` (non zero for the sides of a merge conflict)
+    * `assume_valid: bool`
+    * `skip_worktree: bool`
+    * `intent_to_add: bool`"""
+
+    path: str
+    sha: str
+    mode: int
+    size: int
+    mtime_ns: int
+    ino: int
+    stage: int = 0
+    assume_valid: bool = False
+    skip_worktree: bool = False
+    intent_to_add: bool = False
+
+
+def _varint(data: mmap.mmap, pos: int) -> tuple[int, int]:
+    """Read a big endian base 128 offset as used by index v4 path compression, returns `(value, new_pos)`."""
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+
+def parse_index(data: mmap.mmap) -> tuple[int, list[IndexEntry]]:
+    """Returns `(version, entries)` for raw index file `data`.
+
+    Raises a `ValueError` for anything but a version 2, 3, or 4 index, and for split indexes,
+    whose entries are mostly in a separate shared index file."""
+    if data[:4] != SIGNATURE:
+        raise ValueError("Not an index file.")
+    version, count = struct.unpack_from(">II", data, 4)
+    if version not in (2, 3, 4):
+        raise ValueError(f"Unsupported index version {version}.")
+    entries: list[IndexEntry] = []
+    pos = 12
+    previous = b""
+    for _ in range(count):
+        start = pos
+        (
+            _,
+            _,
+            mtime,
+            mtime_ns,
+            _,
+            ino,
+            mode,
+            _,
+            _,
+            size,
+            sha,
+            flags,
+        ) = ENTRY.unpack_from(data, pos)
+        pos += ENTRY.size
+        extended = 0
+        if flags & EXTENDED:
+            (extended,) = struct.unpack_from(">H", data, pos)
+            pos += 2
+        if version == 4:
+            # Each path drops this many bytes from the end of the previous one and appends the rest
+            strip, pos = _varint(data, pos)
+            end = data.find(b"\0", pos)
+            name = previous[: len(previous) - strip] + data[pos:end]
+            previous = name
+            pos = end + 1
+        else:
+            length = flags & NAME_LENGTH
+            end = data.find(b"\0", pos) if length == NAME_LENGTH else pos + length
+            name = data[pos:end]
+            # Padded with 1 to 8 NULs to a multiple of 8 bytes
+            pos = start + ((end - start + 8) & ~7)
+        entries.append(
+            IndexEntry(
+                name.decode(errors="surrogateescape"),
+                sha.hex(),
+                mode,
+                size,
+                mtime * 1_000_000_000 + mtime_ns,
+                ino,
+                (flags & STAGE) >> 12,
+                bool(flags & ASSUME_VALID),
+                bool(extended & SKIP_WORKTREE),
+                bool(extended & INTENT_TO_ADD),
+            )
+        )
+    # Extensions, up to the trailing checksum
+    while pos + 8 <= len(data) - 20:
+        signature, size = struct.unpack_from(">4sI", data, pos)
+        if signature == b"link":
+            raise ValueError("Split indexes aren't supported.")
+        pos += 8 + size
+    return version, entries
+
+
+class Index:
+    """The index (`.git/index`), memory mapped and parsed only when its mtime or size changes.
+
+    Paths are relative to the top of the working tree and `/` separated.
+    Directory entries of a sparse index end with `/` and cover every path below them.
+
+    >>> index = Index(find_git_dir() / "index")
+    >>> "README.md" in index"""
+
+    def __init__(self, path: Pathier):
+        self.path = path
+        self._version = 0
+        self._entries: dict[str, IndexEntry] = {}
+        self._sparse_dirs: tuple[str, ...] = ()
+        self._sorted: list[str] = []
+        self._stamp: tuple[int, int] | None = None
+        self._mtime_ns = 0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """Parse the index again if it changed since the last look."""
+        try:
+            info = os.stat(self.path)
+        except FileNotFoundError:
+            # A new repo has no index until something is staged
+            self._entries, self._sparse_dirs, self._stamp = {}, (), None
+            self._sorted = []
+            self._version = 0
+            return
+        stamp = (info.st_mtime_ns, info.st_size)
+        if stamp == self._stamp:
+            return
+        with open(self.path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                self._version, entries = parse_index(data)
+        # Keep the lowest stage of a conflicted path, which is its common ancestor
+        self._entries = {}
+        for entry in entries:
+            self._entries.setdefault(entry.path, entry)
+        self._sparse_dirs = tuple(
+            path for path, entry in self._entries.items() if stat.S_ISDIR(entry.mode)
+        )
+        self._sorted = sorted(self._entries)
+        self._stamp = stamp
+        self._mtime_ns = info.st_mtime_ns
+
+    @property
+    def version(self) -> int:
+        """The index format version, `0` if there's no index yet."""
+        with self._lock:
+            self._refresh()
+            return self._version
+
+    def entries(self) -> dict[str, IndexEntry]:
+        """Every entry keyed by path, in index order."""
+        with self._lock:
+            self._refresh()
+            return dict(self._entries)
+
+    def paths(self) -> list[str]:
+        """Every tracked path, sorted the way git sorts them."""
+        with self._lock:
+            self._refresh()
+            return list(self._entries)
+
+    def get(self, path: str) -> IndexEntry | None:
+        with self._lock:
+            self._refresh()
+            return self._entries.get(path)
+
+    def __contains__(self, path: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return path in self._entries or path.startswith(self._sparse_dirs)
+
+    def covers(self, path: str) -> bool:
+        """Whether `path` or, if it's a directory, anything below it is tracked."""
+        with self._lock:
+            self._refresh()
+            if path in self._entries or path.startswith(self._sparse_dirs):
+                return True
+            prefix = f"{path.rstrip('/')}/"
+            i = bisect.bisect_left(self._sorted, prefix)
+            return i < len(self._sorted) and self._sorted[i].startswith(prefix)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._entries)
+
+    def is_dirty(self, entry: IndexEntry, root: Pathier | str) -> bool:
+        """Whether the working tree file for `entry` may differ from the index, going by its `lstat` alone.
+
+        Like git, a file whose stat info matches is assumed unchanged. Unlike git, a mismatch isn't followed by
+        comparing contents, so a file that was only touched counts as dirty.
+        Files modified within the same timestamp tick as the index was written are always dirty,
+        since their stat info can't tell.
+        Submodules, sparse entries, and `assume-unchanged` files are never dirty."""
+        if entry.assume_valid or entry.skip_worktree or entry.mode == GITLINK:
+            return False
+        if entry.intent_to_add or stat.S_ISDIR(entry.mode):
+            return entry.intent_to_add
+        try:
+            info = os.lstat(os.path.join(root, entry.path))
+        except OSError:
+            return True
+        if stat.S_ISLNK(entry.mode) != stat.S_ISLNK(info.st_mode):
+            return True
+        if stat.S_ISREG(info.st_mode) and bool(info.st_mode & 0o100) != bool(
+            entry.mode & 0o100
+        ):
+            return True
+        if (info.st_size & 0xFFFFFFFF) != entry.size:
+            return True
+        if entry.ino and (info.st_ino & 0xFFFFFFFF) != entry.ino:
+            return True
+        mtime_ns = info.st_mtime_ns
+        if not entry.mtime_ns % 1_000_000_000:
+            # Written without nanoseconds
+            mtime_ns -= mtime_ns % 1_000_000_000
+        return mtime_ns != entry.mtime_ns or entry.mtime_ns >= self._mtime_ns
+
+    def dirty(self, root: Pathier) -> list[str]:
+        """Paths whose working tree file may differ from the index, see `is_dirty`."""
+        entries = self.entries()
+        # Converting a `Pathier` to `str` is slow enough to matter per file
+        top = str(root)
+        return [path for path, entry in entries.items() if self.is_dirty(entry, top)]
@@ -0,0 +1,336 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+from pathier import Pathier, Pathish
+
+from gitbetter.gitdir import common_dir, find_git_dir, find_work_tree
+
+# inotify event masks, see `man 7 inotify`
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT = struct.Struct("iIII")
+# Files directly in the git dir that change what the prompt shows
+WATCHED_FILES = {"HEAD", "index", "packed-refs"}
+
+
+@dataclass
+class PromptState:
+    """What the live prompt shows for a repo.
+
+    #### Fields:
+    * `branch: str`
+    * `ahead: int | None` (commits on `branch` that `origin/{branch}` doesn't have, `None` if there's no `origin/{branch}`)
+    * `behind: int | None`
+    * `dirty: int` (tracked files whose working tree copy may differ from the index)"""
+
+    branch: str
+    ahead: int | None = None
+    behind: int | None = None
+    dirty: int = 0
+
+    def __str__(self) -> str:
+        parts = [self.branch]
+        if self.ahead:
+            parts.append(f"↑{self.ahead}")
+        if self.behind:
+            parts.append(f"↓{self.behind}")
+        if self.dirty:
+            parts.append(f"~{self.dirty}")
+        return " ".join(parts)
+
+
+def _watched_dirs(git_dir: Pathier) -> list[str]:
+    """The git dir, the common dir of a linked worktree, and every directory under `refs`."""
+    common = common_dir(git_dir)
+    dirs = list(dict.fromkeys([str(git_dir), str(common)]))
+    for top, _, _ in os.walk(common / "refs"):
+        dirs.append(top)
+    return dirs
+
+
+class PollingWatcher:
+    """Notices changes to `HEAD`, the index, and refs by comparing their mtimes every `interval` seconds.
+
+    >>> watcher = PollingWatcher(find_git_dir())
+    >>> if watcher.wait(5):
+    >>>     print("Something changed.")"""
+
+    def __init__(self, git_dir: Pathier, interval: float = 1.0):
+        self.git_dir = git_dir
+        self.interval = interval
+        self._refs = str(common_dir(git_dir) / "refs")
+        self._stamp = self._snapshot()
+
+    def _snapshot(self) -> dict[str, int]:
+        stamp = {}
+        for directory in _watched_dirs(self.git_dir):
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(".lock") or entry.is_dir():
+                            continue
+                        if (
+                            directory.startswith(self._refs)
+                            or entry.name in WATCHED_FILES
+                        ):
+                            stamp[entry.path] = entry.stat().st_mtime_ns
+            except OSError:
+                continue
+        return stamp
+
+    def wait(self, timeout: float) -> bool:
+        """Block for up to `timeout` seconds, returns whether anything changed."""
+        deadline = time.monotonic() + timeout
+        while True:
+            stamp = self._snapshot()
+            if stamp != self._stamp:
+                self._stamp = stamp
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Notices changes to `HEAD`, the index, and refs through inotify, so nothing is read until they change.
+
+    Only available on Linux, `watch()` falls back to `PollingWatcher` elsewhere.
+    Raises an `OSError` if inotify can't be set up."""
+
+    def __init__(self, git_dir: Pathier):
+        self.git_dir = git_dir
+        name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(name or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # watch descriptor -> directory
+        self._dirs: dict[int, str] = {}
+        self._refs = str(common_dir(git_dir) / "refs")
+        try:
+            for directory in _watched_dirs(git_dir):
+                self._add(directory)
+        except OSError:
+            self.close()
+            raise
+
+    def _add(self, directory: str):
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), WATCH_MASK | IN_MODIFY
+        )
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Can't watch {directory}")
+        self._dirs[wd] = directory
+
+    def _relevant(self, wd: int, mask: int, name: str) -> bool:
+        directory = self._dirs.get(wd, "")
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO) and directory.startswith(self._refs):
+                # A new ref namespace, e.g. the first branch with a `/` in its name
+                try:
+                    self._add(os.path.join(directory, name))
+                except OSError:
+                    pass
+            return directory.startswith(self._refs)
+        if name.endswith(".lock"):
+            # Git writes `x.lock` and renames it over `x`, the rename is what counts
+            return False
+        if directory.startswith(self._refs):
+            return True
+        # In-place writes to the git dir are mostly logs and messages, the files that matter are replaced
+        return name in WATCHED_FILES and not mask & IN_MODIFY
+
+    def wait(self, timeout: float) -> bool:
+        """Block for up to `timeout` seconds, returns whether anything changed."""
+        if self._fd < 0:
+            return False
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        changed = False
+        pos = 0
+        while pos + EVENT.size <= len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, pos)
+            pos += EVENT.size
+            name = os.fsdecode(data[pos : pos + length].rstrip(b"\0"))
+            pos += length
+            if mask & IN_Q_OVERFLOW or self._relevant(wd, mask, name):
+                changed = True
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def watch(git_dir: Pathier, interval: float = 1.0) -> InotifyWatcher | PollingWatcher:
+    """Returns an `InotifyWatcher` for `git_dir` where inotify is available, otherwise a `PollingWatcher`."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(git_dir)
+        except (OSError, AttributeError):
+            # `AttributeError` if libc has no inotify functions
+            pass
+    return PollingWatcher(git_dir, interval)
+
+
+class LivePrompt:
+    """A shell prompt showing the branch, how far it is ahead of/behind `origin/{branch}`, and how many files are dirty.
+
+    Everything is computed by a background thread, after `refresh()` is called and whenever `HEAD`,
+    the index, or refs change, so `render()` never waits on the repo.
+    Until a refresh finishes, `render()` shows the last known state marked with `…`.
+    Bursts of changes (i.e. the several files a commit rewrites) are merged into one refresh
+    once nothing has changed for `debounce` seconds.
+
+    >>> prompt = LivePrompt()
+    >>> prompt.refresh()
+    >>> input(prompt.render())
+    gitbetter::/home/me/repo [main ↑1 ~2]>"""
+
+    def __init__(
+        self,
+        cwd: Pathish | None = None,
+        debounce: float = 0.1,
+        poll_interval: float = 1.0,
+    ):
+        self.cwd = Pathier(cwd or Pathier.cwd())
+        self.git_dir = find_git_dir(self.cwd)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.state: PromptState | None = None
+        self.error: Exception | None = None
+        # Refreshes requested so far and the number of them the current `state` accounts for
+        self._requested = 0
+        self._done = 0
+        # Whether a requested refresh should skip the debounce
+        self._urgent = False
+        self._wake = threading.Event()
+        self._finished = threading.Condition()
+        self._closed = False
+        self._threads: list[threading.Thread] = []
+        if not self.git_dir:
+            return
+        self._watcher = watch(self.git_dir, poll_interval)
+        self._threads = [
+            threading.Thread(target=self._refresh_loop, daemon=True),
+            threading.Thread(target=self._watch_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        self.refresh(False)
+
+    @property
+    def stale(self) -> bool:
+        """Whether a refresh has been requested that hasn't finished yet."""
+        return self._done < self._requested
+
+    def refresh(self, urgent: bool = True):
+        """Ask the background thread to recompute the state, returns immediately.
+
+        Unless `urgent`, the refresh waits for changes to settle first."""
+        if not self._threads:
+            return
+        with self._finished:
+            self._requested += 1
+            self._urgent = self._urgent or urgent
+        self._wake.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until the state is up to date, returns `False` if `timeout` ran out first."""
+        with self._finished:
+            return self._finished.wait_for(lambda: not self.stale, timeout)
+
+    def render(self) -> str:
+        """The prompt for the last known state, never blocks."""
+        prompt = f"gitbetter::{self.cwd}"
+        if self.state:
+            marker = " …" if self.stale else ""
+            prompt += f" [{self.state}{marker}]"
+        elif self.stale:
+            prompt += " […]"
+        return f"{prompt}>"
+
+    def _compute(self, git) -> PromptState:
+        branch = git.current_branch
+        state = PromptState(branch)
+        remote = f"refs/remotes/origin/{branch}"
+        local = f"refs/heads/{branch}"
+        if git.resolve_ref(local) and git.resolve_ref(remote):
+            state.ahead, state.behind = git.ahead_behind(local, remote)
+        state.dirty = len(git.dirty_files())
+        return state
+
+    def _refresh_loop(self):
+        from gitbetter.git import Git
+
+        with Git(True, cwd=find_work_tree(self.cwd) or self.cwd) as git:
+            while True:
+                self._wake.wait()
+                # Wait for things to settle so a burst of changes costs one refresh,
+                # but not so long that a steady stream of them starves the prompt
+                deadline = time.monotonic() + max(self.debounce * 10, 1.0)
+                while (
+                    self._wake.is_set()
+                    and not self._urgent
+                    and not self._closed
+                    and time.monotonic() < deadline
+                ):
+                    self._wake.clear()
+                    time.sleep(self.debounce)
+                if self._closed:
+                    return
+                with self._finished:
+                    self._wake.clear()
+                    self._urgent = False
+                    requested = self._requested
+                try:
+                    self.state = self._compute(git)
+                    self.error = None
+                except Exception as e:
+                    # Keep showing the last known state
+                    self.error = e
+                with self._finished:
+                    self._done = requested
+                    self._finished.notify_all()
+
+    def _watch_loop(self):
+        try:
+            while not self._closed:
+                if self._watcher.wait(self.poll_interval):
+                    self.refresh(False)
+        finally:
+            self._watcher.close()
+
+    def close(self):
+        """Stop the background threads.
+
+        The watcher thread notices within `poll_interval` seconds and isn't waited for.
+        """
+        self._closed = True
+        self._wake.set()
+        if self._threads:
+            self._threads[0].join()
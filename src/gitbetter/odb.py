@@ -0,0 +1,420 @@
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+from pathier import Pathier
+
+from gitbetter.catfile import GitObject, ObjectInfo
+from gitbetter.gitdir import common_dir
+
+TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+OFS_DELTA = 6
+REF_DELTA = 7
+IDX_MAGIC = b"\377tOc"
+
+
+def _varint(data: bytes | memoryview, pos: int) -> tuple[int, int]:
+    """Read a little endian base 128 size from a delta header, returns `(value, new_pos)`."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild an object from its delta base and a git delta."""
+    _, pos = _varint(delta, 0)
+    size, pos = _varint(delta, pos)
+    result = bytearray()
+    end = len(delta)
+    while pos < end:
+        command = delta[pos]
+        pos += 1
+        if command & 0x80:
+            offset = length = 0
+            for i in range(4):
+                if command & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if command & (0x10 << i):
+                    length |= delta[pos] << (8 * i)
+                    pos += 1
+            result += base[offset : offset + (length or 0x10000)]
+        elif command:
+            result += delta[pos : pos + command]
+            pos += command
+        else:
+            raise ValueError("Invalid delta opcode 0.")
+    if len(result) != size:
+        raise ValueError("Delta produced the wrong size.")
+    return bytes(result)
+
+
+class PackIndex:
+    """A memory mapped version 2 pack `.idx` file.
+
+    Lookups narrow the range with the fanout table and bisect the sorted sha table, so nothing is parsed up front.
+    """
+
+    def __init__(self, path: Pathier):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:4] != IDX_MAGIC or self._mmap[4:8] != b"\0\0\0\2":
+            self._mmap.close()
+            raise ValueError(f"{path} isn't a version 2 pack index.")
+        self._fanout = struct.unpack_from(">256I", self._mmap, 8)
+        self.count = self._fanout[255]
+        self._shas = 8 + 256 * 4
+        self._offsets = self._shas + self.count * 24  # shas, then crc32s
+        self._large_offsets = self._offsets + self.count * 4
+
+    def __len__(self) -> int:
+        return self.count
+
+    def find(self, sha: bytes) -> int | None:
+        """Returns the pack offset for the binary `sha` or `None` if it isn't in this pack."""
+        mm = self._mmap
+        first = sha[0]
+        lo = self._fanout[first - 1] if first else 0
+        hi = self._fanout[first]
+        base = self._shas
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = base + mid * 20
+            current = mm[start : start + 20]
+            if current < sha:
+                lo = mid + 1
+            elif current > sha:
+                hi = mid
+            else:
+                return self._offset(mid)
+        return None
+
+    def _offset(self, i: int) -> int:
+        (offset,) = struct.unpack_from(">I", self._mmap, self._offsets + i * 4)
+        if offset & 0x80000000:
+            (offset,) = struct.unpack_from(
+                ">Q", self._mmap, self._large_offsets + (offset & 0x7FFFFFFF) * 8
+            )
+        return offset
+
+    def shas(self) -> list[str]:
+        """Every object sha in this pack, sorted."""
+        mm = self._mmap
+        return [
+            mm[start : start + 20].hex()
+            for start in range(self._shas, self._shas + self.count * 20, 20)
+        ]
+
+    def close(self):
+        self._mmap.close()
+
+
+class Pack:
+    """A memory mapped `.pack` file and its index."""
+
+    def __init__(self, idx_path: Pathier):
+        self.index = PackIndex(idx_path)
+        self.path = idx_path.with_suffix(".pack")
+        # Cache key, converting a `Pathier` to `str` is slow enough to matter per object
+        self.name = str(self.path)
+        with open(self.path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            self._stamp = (stat.st_ino, stat.st_mtime_ns)
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+    @property
+    def replaced(self) -> bool:
+        """Whether the `.pack` file was deleted or replaced (i.e. rewritten with the same name) since it was mapped."""
+        try:
+            stat = os.stat(self.name)
+        except OSError:
+            return True
+        return (stat.st_ino, stat.st_mtime_ns) != self._stamp
+
+    def header(self, offset: int) -> tuple[int, int, int, int | bytes | None]:
+        """Returns `(type, size, data_offset, base)` for the entry at `offset`.
+
+        `base` is the base's pack offset for an OFS delta, the base's binary sha for a REF delta, and `None` otherwise.
+        """
+        mm = self._mmap
+        entry = offset
+        byte = mm[offset]
+        offset += 1
+        kind = (byte >> 4) & 7
+        size = byte & 0x0F
+        shift = 4
+        while byte & 0x80:
+            byte = mm[offset]
+            offset += 1
+            size |= (byte & 0x7F) << shift
+            shift += 7
+        base: int | bytes | None = None
+        if kind == OFS_DELTA:
+            byte = mm[offset]
+            offset += 1
+            distance = byte & 0x7F
+            while byte & 0x80:
+                byte = mm[offset]
+                offset += 1
+                distance = ((distance + 1) << 7) | (byte & 0x7F)
+            base = entry - distance
+        elif kind == REF_DELTA:
+            base = mm[offset : offset + 20]
+            offset += 20
+        return kind, size, offset, base
+
+    def inflate(self, offset: int, size: int, limit: int | None = None) -> bytes:
+        """Decompress the entry data starting at `offset`, stopping after `limit` bytes if given.
+
+        Input is fed in windows a little bigger than the worst case compressed size,
+        since zlib copies whatever input is left over and the rest of the pack can be huge.
+        """
+        decompressor = zlib.decompressobj()
+        window = 1024 if limit else size + 5 * (size // 16383 + 1) + 64
+        chunks: list[bytes] = []
+        produced = 0
+        while not decompressor.eof and offset < len(self._mmap):
+            chunk = decompressor.decompress(
+                self._view[offset : offset + window], limit - produced if limit else 0
+            )
+            offset += window
+            chunks.append(chunk)
+            produced += len(chunk)
+            if limit and produced >= limit:
+                break
+        return b"".join(chunks)
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+        self.index.close()
+
+
+class ObjectDatabase:
+    """Reads objects straight from a repo's `objects` directory without starting git.
+
+    Packs are memory mapped and looked up through their `.idx` files, loose objects are read and inflated directly.
+    Delta chains are resolved in process, with recently used delta bases kept in an LRU cache of up to `cache_bytes`.
+    New packs (after a fetch, gc, or repack) are picked up automatically and removed ones are unmapped.
+
+    >>> odb = ObjectDatabase(find_git_dir())
+    >>> odb.read(git.resolve_ref("refs/heads/main")).data.decode()"""
+
+    def __init__(self, git_dir: Pathier, cache_bytes: int = 32 * 1024 * 1024):
+        self.objects = common_dir(git_dir) / "objects"
+        self.cache_bytes = cache_bytes
+        self._packs: dict[str, Pack] = {}
+        self._pack_order: list[Pack] = []
+        self._pack_stamp: int | None = None
+        self._cache: OrderedDict[tuple[str, int], tuple[int, bytes]] = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.RLock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._dirs = self._object_dirs()
+        self._pack_dirs = [os.path.join(directory, "pack") for directory in self._dirs]
+
+    def _object_dirs(self) -> list[Pathier]:
+        """`objects` plus any alternate object directories."""
+        dirs = [self.objects]
+        alternates = self.objects / "info" / "alternates"
+        if alternates.exists():
+            for line in alternates.read_text().splitlines():
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    path = Pathier(line)
+                    dirs.append(path if path.is_absolute() else self.objects / path)
+        return dirs
+
+    def _refresh_packs(self):
+        """Open packs that appeared and unmap ones that were removed since the last look."""
+        stamp = 0
+        for directory in self._pack_dirs:
+            try:
+                stamp ^= os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+        if stamp == self._pack_stamp:
+            return
+        found: dict[str, Pack] = {}
+        dropped: list[Pack] = []
+        for directory in self._dirs:
+            for idx in sorted((directory / "pack").glob("*.idx")):
+                key = str(idx)
+                pack = self._packs.pop(key, None)
+                if pack and pack.replaced:
+                    dropped.append(pack)
+                    pack = None
+                if pack is None and idx.with_suffix(".pack").exists():
+                    try:
+                        pack = Pack(idx)
+                    except (OSError, ValueError):
+                        continue
+                if pack:
+                    found[key] = pack
+        dropped.extend(self._packs.values())
+        for pack in dropped:
+            pack.close()
+        if dropped:
+            # Cached delta bases are keyed by pack path and offset, which a replaced pack reuses
+            self._cache.clear()
+            self._cached_bytes = 0
+        self._packs = found
+        self._pack_order = list(found.values())
+        self._pack_stamp = stamp
+
+    def _locate(self, sha: bytes) -> tuple[Pack, int] | None:
+        self._refresh_packs()
+        for i, pack in enumerate(self._pack_order):
+            offset = pack.index.find(sha)
+            if offset is not None:
+                if i:
+                    # Objects tend to come from the same pack as the last one
+                    self._pack_order.insert(0, self._pack_order.pop(i))
+                return pack, offset
+        return None
+
+    def _loose_path(self, sha: str) -> str | None:
+        for directory in self._dirs:
+            path = os.path.join(directory, sha[:2], sha[2:])
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _read_loose(
+        self, sha: str, header_only: bool = False
+    ) -> tuple[str, int, bytes] | None:
+        path = self._loose_path(sha)
+        if not path:
+            return None
+        decompressor = zlib.decompressobj()
+        with open(path, "rb") as file:
+            if header_only:
+                raw = decompressor.decompress(file.read(4096), 64)
+            else:
+                raw = decompressor.decompress(file.read())
+        header, _, data = raw.partition(b"\0")
+        kind, size = header.decode().split(" ")
+        return kind, int(size), data
+
+    def _remember(self, key: tuple[str, int], kind: int, data: bytes):
+        if len(data) > self.cache_bytes:
+            return
+        self._cache[key] = (kind, data)
+        self._cached_bytes += len(data)
+        while self._cached_bytes > self.cache_bytes:
+            _, (_, evicted) = self._cache.popitem(last=False)
+            self._cached_bytes -= len(evicted)
+
+    def _unpack(self, pack: Pack, offset: int) -> tuple[int, bytes]:
+        """Returns `(type, data)` for the entry at `offset`, resolving any delta chain."""
+        chain: list[tuple[Pack, int, int, int]] = []
+        while True:
+            key = (pack.name, offset)
+            cached = self._cache.get(key)
+            if cached:
+                self.cache_hits += 1
+                self._cache.move_to_end(key)
+                kind, data = cached
+                break
+            kind, size, data_offset, base = pack.header(offset)
+            if kind == OFS_DELTA:
+                chain.append((pack, offset, data_offset, size))
+                offset = base  # type: ignore
+            elif kind == REF_DELTA:
+                chain.append((pack, offset, data_offset, size))
+                located = self._locate(base)  # type: ignore
+                if located is None:
+                    loose = self._read_loose(base.hex())  # type: ignore
+                    if loose is None:
+                        raise ValueError(f"Missing delta base {base.hex()}.")  # type: ignore
+                    kind = {name: number for number, name in TYPES.items()}[loose[0]]
+                    data = loose[2]
+                    break
+                pack, offset = located
+            else:
+                data = pack.inflate(data_offset, size)
+                break
+        if chain:
+            self.cache_misses += 1
+        for depth, (delta_pack, delta_offset, data_offset, size) in enumerate(
+            reversed(chain)
+        ):
+            data = apply_delta(data, delta_pack.inflate(data_offset, size))
+            # Intermediate results are what later lookups in the same chain start from
+            if depth < len(chain) - 1:
+                self._remember((delta_pack.name, delta_offset), kind, data)
+        return kind, data
+
+    def read(self, sha: str) -> GitObject | None:
+        """Returns the object with the full hex `sha` or `None` if it doesn't exist."""
+        with self._lock:
+            located = self._locate(bytes.fromhex(sha))
+            if located:
+                kind, data = self._unpack(*located)
+                return GitObject(sha, TYPES[kind], len(data), data)
+            loose = self._read_loose(sha)
+            if loose:
+                kind_name, _, data = loose
+                return GitObject(sha, kind_name, len(data), data)
+            return None
+
+    def info(self, sha: str) -> ObjectInfo | None:
+        """Returns the type and size of the object with the full hex `sha` or `None` if it doesn't exist.
+
+        Only the headers of the object (and of any delta chain down to its base) are decompressed.
+        """
+        with self._lock:
+            located = self._locate(bytes.fromhex(sha))
+            if located:
+                pack, offset = located
+                kind, size, data_offset, base = pack.header(offset)
+                if kind in TYPES:
+                    return ObjectInfo(sha, TYPES[kind], size)
+                # The result size is the second varint of the delta, the type is the chain's base type
+                delta = pack.inflate(data_offset, size, 32)
+                _, pos = _varint(delta, 0)
+                result_size, _ = _varint(delta, pos)
+                while kind == OFS_DELTA:
+                    kind, _, _, base = pack.header(base)  # type: ignore
+                if kind == REF_DELTA:
+                    base_info = self.info(base.hex())  # type: ignore
+                    return (
+                        ObjectInfo(sha, base_info.type, result_size)
+                        if base_info
+                        else None
+                    )
+                return ObjectInfo(sha, TYPES[kind], result_size)
+            loose = self._read_loose(sha, header_only=True)
+            if loose:
+                return ObjectInfo(sha, loose[0], loose[1])
+            return None
+
+    def __contains__(self, sha: str) -> bool:
+        with self._lock:
+            return bool(self._locate(bytes.fromhex(sha)) or self._loose_path(sha))
+
+    def close(self):
+        """Unmap every pack and drop cached objects.
+
+        On Windows, mapped files can't be deleted or replaced, so close before `git gc` or `git repack` runs.
+        Lookups after closing map the packs again."""
+        with self._lock:
+            for pack in self._packs.values():
+                pack.close()
+            self._packs = {}
+            self._pack_order = []
+            self._pack_stamp = None
+            self._cache.clear()
+            self._cached_bytes = 0
@@ -0,0 +1,47 @@
+import time
+
+
+class Pacer:
+    """Adaptive delay between requests to a rate limited service.
+
+    The delay grows by `backoff` every time a request is throttled and shrinks by `recovery` after every success,
+    so a batch runs as fast as the service allows.
+
+    >>> pacer = Pacer()
+    >>> for repo in repos:
+    >>>     pacer.wait()
+    >>>     output = edit(repo)
+    >>>     if "rate limit" in output.stderr:
+    >>>         pacer.throttled()
+    >>>     else:
+    >>>         pacer.succeeded()"""
+
+    def __init__(
+        self,
+        delay: float = 0.0,
+        min_delay: float = 0.0,
+        max_delay: float = 60.0,
+        backoff: float = 2.0,
+        recovery: float = 0.5,
+    ):
+        self.delay = delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.recovery = recovery
+
+    def wait(self):
+        """Sleep for the current delay."""
+        if self.delay > 0:
+            time.sleep(self.delay)
+
+    def succeeded(self):
+        self.delay = max(self.min_delay, self.delay * self.recovery)
+        if self.delay < 0.01:
+            self.delay = self.min_delay
+
+    def throttled(self, retry_after: float | None = None):
+        """Increase the delay, to at least `retry_after` seconds if given."""
+        self.delay = min(
+            self.max_delay, max(retry_after or 0, (self.delay or 0.5) * self.backoff)
+        )
@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable
+
+from morbin import Output
+
+
+@dataclass
+class TargetResult:
+    """The result of running a command for one remote or submodule.
+
+    #### Fields:
+    * `target: str` (remote name or submodule path)
+    * `output: Output` (from the last attempt)
+    * `elapsed: float` (seconds, across every attempt)
+    * `attempts: int`"""
+
+    target: str
+    output: Output
+    elapsed: float
+    attempts: int
+
+    @property
+    def ok(self) -> bool:
+        return all(code == 0 for code in self.output.return_code)
+
+
+def run_targets(
+    tasks: dict[str, Callable[[], Output]],
+    parallel: int = 4,
+    retries: int = 2,
+    retry_delay: float = 1.0,
+    progress: Callable[[TargetResult, int, int], None] | None = None,
+) -> dict[str, TargetResult]:
+    """Call every task in `tasks` (target -> task) with a pool of `parallel` threads.
+
+    A failing task is retried up to `retries` times, waiting `retry_delay` seconds before the first retry and doubling after that.
+    `progress` is called with each result, the number of finished targets, and the total as targets finish.
+
+    Returns results in the same order as `tasks`."""
+
+    def attempt(target: str, task: Callable[[], Output]) -> TargetResult:
+        start = time.perf_counter()
+        for attempts in range(1, retries + 2):
+            output = task()
+            if not any(output.return_code):
+                break
+            if attempts <= retries:
+                time.sleep(retry_delay * 2 ** (attempts - 1))
+        return TargetResult(target, output, time.perf_counter() - start, attempts)
+
+    results: dict[str, TargetResult] = {}
+    if not tasks:
+        return results
+    with ThreadPoolExecutor(parallel) as executor:
+        futures = [
+            executor.submit(attempt, target, task) for target, task in tasks.items()
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results[result.target] = result
+            if progress:
+                progress(result, done, len(tasks))
+    return {target: results[target] for target in tasks}
@@ -44,3 +44,93 @@ def rename_file_parser() -> ArgShellParser:
     parser.add_argument("file", type=str, help=""" The file to be renamed. """)
     parser.add_argument("new_name", type=str, help=""" The new name for the file. """)
     return parser
+
+
+def fleet_parser() -> ArgShellParser:
+    parser = ArgShellParser()
+    parser.add_argument(
+        "method",
+        type=str,
+        help=""" The `Git` method to run in each repo, e.g. `fetch` or `status`. """,
+    )
+    parser.add_argument(
+        "repos",
+        type=str,
+        nargs="+",
+        help=""" Repo paths or glob patterns, e.g. `~/repos/*`. """,
+    )
+    parser.add_argument(
+        "-a",
+        "--args",
+        type=str,
+        default="",
+        help=""" Argument string to pass to the method, e.g. `--args="--all --prune"`. """,
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=8,
+        help=""" The max number of repos to run at once. """,
+    )
+    return parser
+
+
+def stats_parser() -> ArgShellParser:
+    parser = ArgShellParser()
+    parser.add_argument(
+        "action",
+        type=str,
+        nargs="?",
+        default="show",
+        choices=["show", "on", "off", "clear", "jsonl", "trace"],
+        help=""" `show` prints the per command histogram, `on`/`off` toggle recording,
+        `clear` drops recorded commands, `jsonl`/`trace` export to `path` as JSON lines or Chrome trace format.""",
+    )
+    parser.add_argument(
+        "path",
+        type=str,
+        nargs="?",
+        default=None,
+        help=""" File to export to. """,
+    )
+    return parser
+
+
+def prompt_parser() -> ArgShellParser:
+    parser = ArgShellParser()
+    parser.add_argument(
+        "action",
+        type=str,
+        nargs="?",
+        default="on",
+        choices=["on", "off"],
+        help=""" `on` shows the branch, ahead/behind counts, and dirty file count in the prompt, `off` goes back to the plain prompt.""",
+    )
+    return parser
+
+
+def parallel_parser() -> ArgShellParser:
+    parser = ArgShellParser()
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=4,
+        help=""" The max number of targets to run at once. """,
+    )
+    parser.add_argument(
+        "-r",
+        "--retries",
+        type=int,
+        default=2,
+        help=""" How many times to retry a failed target. """,
+    )
+    parser.add_argument(
+        "-a",
+        "--args",
+        type=str,
+        default="",
+        help=""" Extra arguments for each git command, e.g. `--args="--prune"`. """,
+    )
+    return parser
@@ -0,0 +1,12 @@
+from typing import Iterable
+
+from pathier import Pathish
+
+PATHSPEC_FROM_STDIN = ["--pathspec-from-file=-", "--pathspec-file-nul"]
+# Above this many bytes of paths, commits pass pathspecs through a file instead of argv
+ARGV_PATHS_LIMIT = 32 * 1024
+
+
+def pathspec_input(paths: Iterable[Pathish]) -> str:
+    """Returns `paths` as NUL terminated pathspecs for use with `PATHSPEC_FROM_STDIN`."""
+    return "".join(f"{path}\0" for path in paths)
@@ -0,0 +1,246 @@
+import functools
+import json
+import os
+import shlex
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+from morbin import Output
+from pathier import Pathier, Pathish
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+@dataclass(slots=True)
+class Invocation:
+    """Measurements for a single command invocation.
+
+    #### Fields:
+    * `program: str`
+    * `subcommand: str`
+    * `argv_size: int` (bytes)
+    * `start: float` (`time.time()` at launch)
+    * `wall_time: float` (seconds)
+    * `cpu_time: float` (seconds of user + system time used by child processes, `0` where unsupported)
+    * `stdout_bytes: int | None` (`None` if output wasn't captured)
+    * `stderr_bytes: int | None` (`None` if output wasn't captured)
+    * `return_code: int`
+    * `thread: int`
+    * `cpu_time_approximate: bool` (whether other commands ran at the same time, see below)
+
+    Child CPU time is only reported for the whole process, so `cpu_time` is the difference across the call.
+    When commands run concurrently (i.e. under `fleet` or `parallel`) it includes time used by the others
+    and `cpu_time_approximate` is `True`."""
+
+    program: str
+    subcommand: str
+    argv_size: int
+    start: float
+    wall_time: float
+    cpu_time: float
+    stdout_bytes: int | None
+    stderr_bytes: int | None
+    return_code: int
+    thread: int
+    cpu_time_approximate: bool = False
+
+
+def _children_cpu_time() -> float:
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _subcommand(argv: list[str]) -> str:
+    """The first non-option token of `argv`, skipping the values of git's `-c` and `-C` options."""
+    skip = False
+    for token in argv:
+        if skip:
+            skip = False
+        elif token in ("-c", "-C"):
+            skip = True
+        elif not token.startswith("-"):
+            return token
+    return ""
+
+
+class Profiler:
+    """Collects an `Invocation` for every command run by the `Git` or `GitHub` instances it's attached to.
+
+    >>> git = Git()
+    >>> git.profiler = Profiler()
+    >>> git.status()
+    >>> print(git.profiler.histogram())"""
+
+    def __init__(self):
+        self.invocations: list[Invocation] = []
+        self._lock = threading.Lock()
+        # Calls currently running -> whether another call overlapped them
+        self._running: dict[int, bool] = {}
+        self._next_call = 0
+
+    def clear(self):
+        with self._lock:
+            self.invocations.clear()
+
+    def measure(
+        self,
+        program: str,
+        args: tuple[str | list[str], ...],
+        run: Callable[[], Output],
+        captured: bool = True,
+    ) -> Output:
+        """Call `run` and record how long it took and what it produced.
+
+        `args` are argument strings to be split like a shell would, or already split argv lists.
+        `captured` is whether `run` captures output, output sizes are only recorded if it does.
+        Calls that return without any return codes (commands a `Git.batch()` queued instead of running) aren't recorded.
+        """
+        argv = [
+            str(token)
+            for arg in args
+            for token in (arg if isinstance(arg, list) else shlex.split(arg))
+        ]
+        with self._lock:
+            call = self._next_call
+            self._next_call += 1
+            overlapped = bool(self._running)
+            for other in self._running:
+                self._running[other] = True
+            self._running[call] = overlapped
+        cpu_start = _children_cpu_time()
+        start = time.time()
+        wall_start = time.perf_counter()
+        try:
+            output = run()
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = _children_cpu_time() - cpu_start
+            with self._lock:
+                overlapped = self._running.pop(call)
+        if not output.return_code:
+            return output
+        invocation = Invocation(
+            program,
+            _subcommand(argv),
+            len(" ".join([program, *argv]).encode()),
+            start,
+            wall_time,
+            cpu_time,
+            len(output.stdout.encode()) if captured else None,
+            len(output.stderr.encode()) if captured else None,
+            output.return_code[-1],
+            threading.get_ident(),
+            overlapped,
+        )
+        with self._lock:
+            self.invocations.append(invocation)
+        return output
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Per subcommand totals keyed by `{program} {subcommand}`."""
+        groups: dict[str, list[Invocation]] = {}
+        for invocation in self.invocations:
+            key = f"{invocation.program} {invocation.subcommand}".strip()
+            groups.setdefault(key, []).append(invocation)
+        summary: dict[str, dict[str, float]] = {}
+        for key, invocations in groups.items():
+            times = sorted(invocation.wall_time for invocation in invocations)
+            summary[key] = {
+                "calls": len(times),
+                "total": sum(times),
+                "mean": sum(times) / len(times),
+                "median": times[len(times) // 2],
+                "max": times[-1],
+                "cpu": sum(invocation.cpu_time for invocation in invocations),
+                "cpu_approximate": sum(
+                    invocation.cpu_time_approximate for invocation in invocations
+                ),
+                "failures": sum(
+                    invocation.return_code != 0 for invocation in invocations
+                ),
+            }
+        return summary
+
+    def histogram(self, width: int = 30) -> str:
+        """Returns a text histogram of total wall time per subcommand, slowest first."""
+        summary = sorted(
+            self.summary().items(), key=lambda item: item[1]["total"], reverse=True
+        )
+        if not summary:
+            return "No commands recorded."
+        longest = max(stats["total"] for _, stats in summary) or 1
+        name_width = max(len(name) for name, _ in summary)
+        lines = [
+            f"{'command':<{name_width}} | {'calls':>5} | {'total':>8} | {'mean':>8} | {'max':>8} | {'cpu':>8}"
+        ]
+        for name, stats in summary:
+            bar = "#" * max(1, round(width * stats["total"] / longest))
+            # Includes other commands' CPU time when calls overlapped
+            approximate = "~" if stats["cpu_approximate"] else " "
+            lines.append(
+                f"{name:<{name_width}} | {stats['calls']:>5} | {stats['total']:>7.3f}s | {stats['mean']:>7.3f}s | {stats['max']:>7.3f}s | {approximate}{stats['cpu']:>6.3f}s {bar}"
+            )
+        if any(stats["cpu_approximate"] for _, stats in summary):
+            lines.append("~ cpu includes commands that ran at the same time.")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _record(invocation: Invocation) -> dict:
+        """`invocation` as a dict, without the fields that weren't measured."""
+        return {
+            key: value for key, value in asdict(invocation).items() if value is not None
+        }
+
+    def to_jsonl(self, path: Pathish):
+        """Write one JSON object per invocation to `path`."""
+        Pathier(path).write_text(
+            "".join(
+                json.dumps(self._record(invocation)) + "\n"
+                for invocation in self.invocations
+            )
+        )
+
+    def to_chrome_trace(self, path: Pathish):
+        """Write invocations to `path` in Chrome's trace event format.
+
+        Open the file with `chrome://tracing` or https://ui.perfetto.dev."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": f"{invocation.program} {invocation.subcommand}".strip(),
+                "cat": invocation.program,
+                "ph": "X",
+                "ts": invocation.start * 1_000_000,
+                "dur": invocation.wall_time * 1_000_000,
+                "pid": pid,
+                "tid": invocation.thread,
+                "args": self._record(invocation),
+            }
+            for invocation in self.invocations
+        ]
+        Pathier(path).write_text(json.dumps({"traceEvents": events}))
+
+
+def instrumented(run: Callable[..., Output]) -> Callable[..., Output]:
+    """Decorator for `run` methods that records each call with the instance's `profiler`, if it has one."""
+
+    @functools.wraps(run)
+    def wrapper(self, *args, **kwargs) -> Output:
+        profiler: Profiler | None = getattr(self, "profiler", None)
+        if profiler is None:
+            return run(self, *args, **kwargs)
+        return profiler.measure(
+            self.program,
+            args,
+            lambda: run(self, *args, **kwargs),
+            getattr(self, "capture_output", True),
+        )
+
+    return wrapper
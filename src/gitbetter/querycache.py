@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from morbin import Output
+from pathier import Pathier, Pathish
+
+from gitbetter.gitdir import common_dir, config_files, find_work_tree, stamps
+from gitbetter.profiling import _subcommand
+from gitbetter.refs import FULL_SHA, RefStore
+
+# Subcommands whose output only depends on the objects their revisions resolve to
+CACHEABLE = {
+    "blame",
+    "describe",
+    "log",
+    "ls-tree",
+    "rev-list",
+    "rev-parse",
+    "show",
+    "shortlog",
+}
+# Subcommands that default to `HEAD` when no revision is given
+DEFAULTS_TO_HEAD = {"describe", "log", "rev-list", "show", "shortlog"}
+# Options whose output depends on every ref instead of just the named ones
+ALL_REFS = re.compile(
+    r"^(--all|--branches|--tags|--remotes|--glob|--exclude|--decorate|--source)|%[dD]"
+)
+# Options whose output depends on the clock, the working tree, or reflogs
+UNCACHEABLE = re.compile(
+    r"^(--since|--until|--after|--before|--max-age|--min-age|--dirty|--broken|--reflog|-g$|--walk-reflogs|--contents)"
+    r"|relative|%[ac]r|@\{"
+)
+# Refs that change how commits are shown (notes) or which objects are read (replacements) without being named
+DISPLAY_REFS = ("refs/notes/", "refs/replace/")
+ABBREVIATED_SHA = re.compile(r"^[0-9a-f]{7,63}$")
+# `v1.0~2`, `main^{tree}`, `HEAD:path/to/file` -> base is `v1.0`, `main`, `HEAD`
+REVISION_BASE = re.compile(r"^[^~^:]*")
+
+
+def query_key(
+    argv: list[str], git_dir: Pathier, store: RefStore, cwd: Pathier
+) -> str | None:
+    """Returns a cache key for the git command `argv` (without the leading `git`) run in `cwd`
+    or `None` if its output can't be cached.
+
+    The key covers the repo, `HEAD`, the normalized arguments, and the sha every named revision currently resolves to,
+    so moving a ref changes the key.
+    It also covers what changes output without being named: the stamps of every config file git reads
+    (system, global, repo, and worktree), `.mailmap`, and `info/grafts`, notes and replace refs, and `GIT_*` environment variables.
+    Commands that show ref names (`describe`, `--decorate`, `--all`, ...) are keyed on every ref.
+    """
+    subcommand = _subcommand(argv)
+    if subcommand not in CACHEABLE:
+        return None
+    args = argv[argv.index(subcommand) + 1 :]
+    resolved: list[str | None] = []
+    has_revision = False
+    all_refs = subcommand == "describe"
+    for arg in args:
+        if arg == "--":
+            break
+        if UNCACHEABLE.search(arg):
+            return None
+        all_refs = all_refs or bool(ALL_REFS.search(arg))
+        if arg.startswith("-"):
+            continue
+        if arg.startswith(":"):
+            # Index entries
+            return None
+        for part in re.split(r"\.\.\.?", arg):
+            base = REVISION_BASE.match(part)
+            assert base
+            name = base.group() or "HEAD"
+            sha = store.resolve(name)
+            if sha:
+                has_revision = True
+            elif (cwd / part).exists():
+                # A path, its content is read at the resolved revisions
+                continue
+            elif not ABBREVIATED_SHA.match(name):
+                # An option value or something else that can't be resolved without git
+                return None
+            resolved.append(sha)
+    if not has_revision:
+        if subcommand not in DEFAULTS_TO_HEAD and not all_refs:
+            return None
+        resolved.append(store.resolve("HEAD"))
+    try:
+        head = (git_dir / "HEAD").read_text().strip()
+    except OSError:
+        return None
+    files = [*config_files(git_dir), common_dir(git_dir) / "info" / "grafts"]
+    if work_tree := find_work_tree(cwd):
+        files.append(work_tree / ".mailmap")
+    refs = store.refs()
+    key = [
+        str(git_dir),
+        str(cwd),
+        head,
+        stamps(files),
+        sorted(item for item in os.environ.items() if item[0].startswith("GIT_")),
+        argv,
+        resolved,
+    ]
+    if all_refs:
+        key.append(sorted(refs.items()))
+    else:
+        key.append(
+            sorted(item for item in refs.items() if item[0].startswith(DISPLAY_REFS))
+        )
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+
+class QueryCache:
+    """Results of read-only git commands (`log`, `show`, `blame`, `describe`, ...) keyed by `query_key`.
+
+    Recent results are held in memory, least recently used first out once there are more than `max_entries`
+    or they take up more than `max_bytes`.
+    If `path` is given, results are also stored in a SQLite database there and survive between sessions.
+
+    Keys include the sha every named ref resolves to, so when a ref moves its old results are simply never looked up again
+    and age out of the cache.
+
+    >>> git = Git(True)
+    >>> git.query_cache = QueryCache()
+    >>> git.log("--oneline v1.0..v2.0")  # runs git
+    >>> git.log("--oneline v1.0..v2.0")  # doesn't"""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        path: Pathish | None = None,
+        max_disk_entries: int = 100_000,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_disk_entries = max_disk_entries
+        self._entries: OrderedDict[str, Output] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._db: sqlite3.Connection | None = None
+        if path:
+            path = Pathier(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, return_code TEXT, stdout TEXT, stderr TEXT, used REAL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def _size(output: Output) -> int:
+        return len(output.stdout) + len(output.stderr)
+
+    def _remember(self, key: str, output: Output):
+        """Add to the in-memory tier and evict down to the limits. Call with the lock held."""
+        if key in self._entries:
+            self._bytes -= self._size(self._entries.pop(key))
+        self._entries[key] = output
+        self._bytes += self._size(output)
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= self._size(evicted)
+
+    def get(self, key: str) -> Output | None:
+        with self._lock:
+            output = self._entries.get(key)
+            if output is not None:
+                self._entries.move_to_end(key)
+            elif self._db:
+                row = self._db.execute(
+                    "SELECT return_code, stdout, stderr FROM results WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row:
+                    output = Output(json.loads(row[0]), row[1], row[2])
+                    self._db.execute(
+                        "UPDATE results SET used = ? WHERE key = ?", (time.time(), key)
+                    )
+                    self._db.commit()
+                    self._remember(key, output)
+            if output is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return Output(list(output.return_code), output.stdout, output.stderr)
+
+    def put(self, key: str, output: Output):
+        with self._lock:
+            self._remember(key, output)
+            if self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        json.dumps(output.return_code),
+                        output.stdout,
+                        output.stderr,
+                        time.time(),
+                    ),
+                )
+                self._db.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._db:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db:
+                self._db.close()
+                self._db = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,274 @@
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from typing import Iterator
+
+from pathier import Pathier
+
+from gitbetter.gitdir import common_dir
+
+FULL_SHA = re.compile(r"^([0-9a-f]{40}|[0-9a-f]{64})$")
+
+
+class PackedRefs:
+    """Reader for a repo's `packed-refs` file.
+
+    The file is memory mapped, so single lookups bisect over the sorted file without parsing it,
+    and the full parse is only done when every ref is needed.
+    It's only mapped for the length of a lookup, holding it open in between would stop git from replacing it on Windows.
+
+    Parsed results are cached against the file's mtime and size."""
+
+    def __init__(self, path: Pathier):
+        self.path = path
+        self._stamp: tuple[int, int] | None = None
+        self._header_read = False
+        self._sorted = False
+        self._body_start = 0
+        self._refs: dict[str, str] | None = None
+        self._peeled: dict[str, str] = {}
+
+    def _restamp(self, stat: os.stat_result | None):
+        """Forget cached results if the file changed since they were read."""
+        stamp = (stat.st_mtime_ns, stat.st_size) if stat else None
+        if stamp != self._stamp:
+            self._stamp = stamp
+            self._header_read = False
+            self._refs = None
+            self._peeled = {}
+
+    def _refresh(self):
+        try:
+            self._restamp(self.path.stat())
+        except OSError:
+            self._restamp(None)
+
+    @contextmanager
+    def _mapped(self) -> Iterator[mmap.mmap | None]:
+        """Map the file for the duration of the context, yields `None` if it's missing or empty."""
+        try:
+            file = open(self.path, "rb")
+        except OSError:
+            self._restamp(None)
+            yield None
+            return
+        with file:
+            stat = os.fstat(file.fileno())
+            self._restamp(stat)
+            if not stat.st_size:
+                yield None
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if not self._header_read:
+                    self._sorted = False
+                    self._body_start = 0
+                    if mm[:1] == b"#":
+                        header_end = mm.find(b"\n") + 1
+                        self._sorted = b" sorted" in mm[:header_end]
+                        self._body_start = header_end
+                    self._header_read = True
+                yield mm
+
+    def _parse(self, mm: mmap.mmap) -> dict[str, str]:
+        if self._refs is None:
+            refs: dict[str, str] = {}
+            peeled: dict[str, str] = {}
+            last = ""
+            for line in mm[self._body_start :].decode().splitlines():
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("^"):
+                    peeled[last] = line[1:]
+                    continue
+                sha, last = line.split(" ", 1)
+                refs[last] = sha
+            self._refs = refs
+            self._peeled = peeled
+        return self._refs
+
+    def close(self):
+        """Forget cached results. Nothing stays mapped between lookups, so there's nothing else to release."""
+        self._restamp(None)
+
+    def get(self, name: str) -> str | None:
+        """Returns the sha for the full ref `name` or `None` if it isn't packed."""
+        with self._mapped() as mm:
+            if mm is None:
+                return None
+            if not self._sorted:
+                return self._parse(mm).get(name)
+            target = name.encode()
+            lo = self._body_start
+            hi = len(mm)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                start = max(mm.rfind(b"\n", lo, mid) + 1, lo)
+                if mm[start : start + 1] == b"^":
+                    # Peeled lines belong to the ref line above them
+                    start = max(mm.rfind(b"\n", lo, start - 1) + 1, lo)
+                end = mm.find(b"\n", start)
+                if end == -1:
+                    end = len(mm)
+                line = mm[start:end]
+                space = line.find(b" ")
+                refname = line[space + 1 :]
+                if refname == target:
+                    return line[:space].decode()
+                if refname < target:
+                    lo = end + 1
+                    if mm[lo : lo + 1] == b"^":
+                        lo = mm.find(b"\n", lo) + 1 or len(mm)
+                else:
+                    hi = start
+            return None
+
+    @property
+    def refs(self) -> dict[str, str]:
+        """All packed refs as a mapping of full ref name to sha."""
+        self._refresh()
+        if self._refs is not None:
+            return self._refs
+        with self._mapped() as mm:
+            return self._parse(mm) if mm is not None else {}
+
+    @property
+    def peeled(self) -> dict[str, str]:
+        """Mapping of annotated tag ref names to the sha of the object they point to, as recorded in the file."""
+        self.refs
+        return self._peeled
+
+
+class RefStore:
+    """Reads a repo's refs straight from disk without starting git.
+
+    Loose refs under `refs/` take precedence over `packed-refs`, same as git.
+    Results are cached and re-read only when `packed-refs` or a directory under `refs/` changes.
+
+    >>> store = RefStore(find_git_dir())
+    >>> store.branches()["main"]"""
+
+    def __init__(self, git_dir: Pathier):
+        self.git_dir = git_dir
+        self.common_dir = common_dir(git_dir)
+        self.packed = PackedRefs(self.common_dir / "packed-refs")
+        self._loose: dict[str, str] = {}
+        # directory -> mtime_ns
+        self._loose_stamps: dict[str, int] = {}
+        self._loose_generation = 0
+        self._all: dict[str, str] = {}
+        self._all_key: tuple[object, ...] | None = None
+
+    def _ref_dirs(self) -> dict[str, int]:
+        stamps: dict[str, int] = {}
+        stack = [str(self.common_dir / "refs")]
+        while stack:
+            directory = stack.pop()
+            try:
+                stamps[directory] = os.stat(directory).st_mtime_ns
+                with os.scandir(directory) as entries:
+                    stack.extend(entry.path for entry in entries if entry.is_dir())
+            except OSError:
+                continue
+        return stamps
+
+    def _loose_refs(self) -> dict[str, str]:
+        """Loose refs, re-read only when a directory under `refs/` changed.
+
+        Updating a ref renames a lock file over it, so the containing directory's mtime always moves.
+        """
+        stamps = self._ref_dirs()
+        if stamps == self._loose_stamps:
+            return self._loose
+        loose: dict[str, str] = {}
+        for directory in stamps:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.is_file() or entry.name.endswith(".lock"):
+                        continue
+                    try:
+                        with open(entry.path) as file:
+                            content = file.read().strip()
+                    except OSError:
+                        continue
+                    name = Pathier(entry.path).relative_to(self.common_dir).as_posix()
+                    loose[name] = content
+        self._loose = loose
+        self._loose_stamps = stamps
+        self._loose_generation += 1
+        return loose
+
+    def _resolve(self, value: str, refs: dict[str, str], depth: int = 0) -> str | None:
+        """Follow symbolic refs (`ref: refs/...`) to a sha."""
+        if not value.startswith("ref: "):
+            return value
+        if depth > 5:
+            return None
+        target = refs.get(value[5:]) or self.packed.get(value[5:])
+        return self._resolve(target, refs, depth + 1) if target else None
+
+    def get(self, name: str) -> str | None:
+        """Returns the sha for the full ref `name` (e.g. `refs/tags/v1.0.0`) or `None` if it doesn't exist."""
+        loose = self._loose_refs()
+        if name in loose:
+            return self._resolve(loose[name], loose)
+        return self.packed.get(name)
+
+    def resolve(self, name: str) -> str | None:
+        """Returns the sha for `name` (a ref name or full sha without any `~`, `^`, or `:` suffix),
+        trying `refs/`, `refs/tags/`, `refs/heads/`, and `refs/remotes/` the same way git's dwim rules do.
+
+        Returns `None` if it doesn't resolve.
+        >>> store.resolve("main")"""
+        if name in ("HEAD", "@"):
+            try:
+                head = (self.git_dir / "HEAD").read_text().strip()
+            except OSError:
+                return None
+            return self.get(head[5:]) if head.startswith("ref: ") else head
+        if FULL_SHA.match(name):
+            return name
+        for candidate in (
+            name,
+            f"refs/{name}",
+            f"refs/tags/{name}",
+            f"refs/heads/{name}",
+            f"refs/remotes/{name}",
+            f"refs/remotes/{name}/HEAD",
+        ):
+            if candidate.startswith("refs/") and (sha := self.get(candidate)):
+                return sha
+        return None
+
+    def refs(self) -> dict[str, str]:
+        """All refs as a mapping of full ref name to sha."""
+        loose = self._loose_refs()
+        packed = self.packed.refs
+        key = (self._loose_generation, self.packed._stamp)
+        if key != self._all_key:
+            refs = dict(packed)
+            for name, value in loose.items():
+                sha = self._resolve(value, loose)
+                if sha:
+                    refs[name] = sha
+            self._all = refs
+            self._all_key = key
+        return self._all
+
+    def _with_prefix(self, prefix: str) -> dict[str, str]:
+        return {
+            name.removeprefix(prefix): sha
+            for name, sha in self.refs().items()
+            if name.startswith(prefix)
+        }
+
+    def branches(self) -> dict[str, str]:
+        """Local branches as a mapping of branch name to sha."""
+        return self._with_prefix("refs/heads/")
+
+    def tags(self) -> dict[str, str]:
+        """Tags as a mapping of tag name to the sha the tag ref points to."""
+        return self._with_prefix("refs/tags/")
+
+    def close(self):
+        self.packed.close()
@@ -0,0 +1,177 @@
+import re
+import subprocess
+import threading
+from typing import Iterable
+from urllib.parse import urlparse
+
+from pathier import Pathier, Pathish
+
+from gitbetter.gitdir import common_dir, find_git_dir
+
+# user@host:path, but not a windows drive like C:\path
+SCP_URL = re.compile(r"^(?:[^@/]+@)?(?P<host>[^:/]{2,}):(?P<path>(?!//).+)$")
+# `[remote "origin"]` or the deprecated `[remote.origin]`, section names are case insensitive
+REMOTE_SECTION = re.compile(
+    r'^\[\s*remote(?:\s+"(?P<name>(?:[^"\\]|\\.)*)"|\.(?P<dotted>[^\s\]]+))\s*\]',
+    re.IGNORECASE,
+)
+SECTION = re.compile(r"^\[[^\]]*\]")
+INCLUDE_SECTION = re.compile(r"^\s*\[\s*include(?:if)?\b", re.IGNORECASE | re.MULTILINE)
+
+
+def parse_remote_url(url: str) -> tuple[str, str]:
+    """Returns the `(host, path)` for a remote url with any `.git` suffix and surrounding slashes stripped from the path.
+
+    Handles `https://`, `ssh://`, and `git://` urls as well as scp style urls (`git@github.com:owner/repo.git`),
+    which `urlparse` doesn't understand.
+
+    >>> parse_remote_url("git@github.com:matt-manes/gitbetter.git")
+    >>> ('github.com', 'matt-manes/gitbetter')"""
+    url = url.strip()
+    if "://" in url:
+        parsed = urlparse(url)
+        host, path = parsed.hostname or "", parsed.path
+    elif match := SCP_URL.match(url):
+        host, path = match.group("host"), match.group("path")
+    else:
+        host, path = "", url
+    path = path.strip("/").removesuffix(".git")
+    return host, path
+
+
+def owner_reponame(url: str) -> str:
+    """Returns "owner/repo-name" from a GitHub remote url."""
+    _, path = parse_remote_url(url)
+    parts = path.split("/")
+    if len(parts) < 2:
+        raise ValueError(f"Can't get an owner and repo name from `{url}`.")
+    return "/".join(parts[-2:])
+
+
+def _unquote(value: str) -> str:
+    """Strip inline comments and quotes from a git config value."""
+    result: list[str] = []
+    quoted = False
+    chars = iter(value.strip())
+    for char in chars:
+        if char == "\\":
+            result.append(next(chars, ""))
+        elif char == '"':
+            quoted = not quoted
+        elif char in "#;" and not quoted:
+            break
+        else:
+            result.append(char)
+    return "".join(result).strip()
+
+
+def parse_remotes(config: str) -> dict[str, str]:
+    """Returns a mapping of remote name to url from the text of a git config file.
+
+    The first `url` of each remote is used, same as `git remote get-url`.
+    `include` directives and `url.<base>.insteadOf` rewrites aren't applied, see `RemoteCache` for includes.
+    """
+    remotes: dict[str, str] = {}
+    remote: str | None = None
+    for line in config.splitlines():
+        line = line.strip()
+        if not line or line[0] in "#;":
+            continue
+        if line.startswith("["):
+            match = REMOTE_SECTION.match(line)
+            remote = None
+            if match and match.group("dotted"):
+                # Git lowercases subsections written this way
+                remote = match.group("dotted").lower()
+            elif match:
+                remote = re.sub(r"\\(.)", r"\1", match.group("name"))
+            # Allow `[remote "origin"] url = ...` on one line
+            line = line[(match or SECTION.match(line) or re.match("", line)).end() :]
+            if not line.strip():
+                continue
+        if remote is None or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        if key.strip().lower() == "url" and remote not in remotes:
+            remotes[remote] = _unquote(value)
+    return remotes
+
+
+def _git_remotes(git_dir: Pathier) -> dict[str, str]:
+    """Returns a mapping of remote name to url as git itself reads them, from every config file and include."""
+    output = subprocess.run(
+        ["git", f"--git-dir={git_dir}", "config", "--get-regexp", r"^remote\..*\.url$"],
+        capture_output=True,
+        text=True,
+    )
+    remotes: dict[str, str] = {}
+    for line in output.stdout.splitlines():
+        key, _, url = line.partition(" ")
+        remotes.setdefault(key[len("remote.") : -len(".url")], url)
+    return remotes
+
+
+class RemoteCache:
+    """Remote urls per repo, read straight from the repo's config file and cached against its mtime and size.
+
+    One instance is shared by every `GitHub` object, so resolving the same repos repeatedly only stats their config files.
+    Config files with `include` or `includeIf` sections are read by git instead, since remotes may be defined in the included files.
+    The cache is still keyed on the repo's config file, so edits to only an included file aren't noticed.
+    """
+
+    def __init__(self):
+        # config path -> (mtime_ns, size, remotes)
+        self._cache: dict[str, tuple[int, int, dict[str, str]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def remotes(self, repo: Pathish | None = None) -> dict[str, str]:
+        """Returns a mapping of remote name to url for the repo containing `repo` (defaults to the current working directory)."""
+        git_dir = find_git_dir(repo)
+        if not git_dir:
+            return {}
+        config = common_dir(git_dir) / "config"
+        try:
+            stat = config.stat()
+        except OSError:
+            return {}
+        key = str(config)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                self.hits += 1
+                return cached[2]
+            self.misses += 1
+        text = config.read_text(encoding="utf-8", errors="replace")
+        if INCLUDE_SECTION.search(text):
+            remotes = _git_remotes(git_dir)
+        else:
+            remotes = parse_remotes(text)
+        with self._lock:
+            self._cache[key] = (stat.st_mtime_ns, stat.st_size, remotes)
+        return remotes
+
+    def url(self, repo: Pathish | None = None, name: str = "origin") -> str | None:
+        """Returns the url for remote `name` or `None` if there isn't one."""
+        return self.remotes(repo).get(name)
+
+    def owner_reponames(
+        self, repos: Iterable[Pathish], name: str = "origin"
+    ) -> dict[Pathier, str]:
+        """Resolve "owner/repo-name" for many repos at once.
+
+        Repos without a usable `name` remote are left out."""
+        resolved: dict[Pathier, str] = {}
+        for repo in repos:
+            url = self.url(repo, name)
+            if not url:
+                continue
+            try:
+                resolved[Pathier(repo)] = owner_reponame(url)
+            except ValueError:
+                continue
+        return resolved
+
+
+remote_cache = RemoteCache()
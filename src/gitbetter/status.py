@@ -0,0 +1,172 @@
+import os
+from dataclasses import dataclass, field
+from typing import Collection
+
+from pathier import Pathier
+
+
+@dataclass(slots=True)
+class StatusEntry:
+    """A single path from `git status --porcelain=v2`.
+
+    #### Fields:
+    * `path: str`
+    * `kind: str` (one of `changed`, `renamed`, `unmerged`, `untracked`, or `ignored`)
+    * `index_status: str` (`X` in git's `XY` notation, `.` when unchanged)
+    * `worktree_status: str` (`Y` in git's `XY` notation, `.` when unchanged)
+    * `orig_path: str | None` (the source path for renames and copies)"""
+
+    path: str
+    kind: str
+    index_status: str = "."
+    worktree_status: str = "."
+    orig_path: str | None = None
+
+    @property
+    def staged(self) -> bool:
+        return self.kind in ("changed", "renamed") and self.index_status != "."
+
+    @property
+    def unstaged(self) -> bool:
+        return self.kind in ("changed", "renamed") and self.worktree_status != "."
+
+    @property
+    def conflicted(self) -> bool:
+        return self.kind == "unmerged"
+
+    @property
+    def untracked(self) -> bool:
+        return self.kind == "untracked"
+
+
+@dataclass
+class StatusSnapshot:
+    """A structured view of the working tree at a point in time.
+
+    #### Fields:
+    * `branch: str | None` (`None` when detached)
+    * `oid: str | None` (`None` before the first commit)
+    * `upstream: str | None`
+    * `ahead: int`
+    * `behind: int`
+    * `entries: dict[str, StatusEntry]`
+    * `taken_at: int` (`time.time_ns()` from just before the scan started)
+    * `index_stamp: tuple[int, int]` (`.git/index` mtime and size at scan time)
+    * `ignored_dirs: list[str]` (ignored directories, `/` terminated, that incremental scans don't look inside)
+    """
+
+    branch: str | None = None
+    oid: str | None = None
+    upstream: str | None = None
+    ahead: int = 0
+    behind: int = 0
+    entries: dict[str, StatusEntry] = field(default_factory=dict)
+    taken_at: int = 0
+    index_stamp: tuple[int, int] = (0, 0)
+    ignored_dirs: list[str] = field(default_factory=list)
+
+    @property
+    def staged(self) -> list[StatusEntry]:
+        return [entry for entry in self.entries.values() if entry.staged]
+
+    @property
+    def unstaged(self) -> list[StatusEntry]:
+        return [entry for entry in self.entries.values() if entry.unstaged]
+
+    @property
+    def untracked(self) -> list[StatusEntry]:
+        return [entry for entry in self.entries.values() if entry.untracked]
+
+    @property
+    def conflicted(self) -> list[StatusEntry]:
+        return [entry for entry in self.entries.values() if entry.conflicted]
+
+    @property
+    def clean(self) -> bool:
+        return not any(entry.kind != "ignored" for entry in self.entries.values())
+
+
+def parse_porcelain_v2(output: str) -> StatusSnapshot:
+    """Parse the output of `git status --porcelain=v2 -z --branch`."""
+    snapshot = StatusSnapshot()
+    tokens = iter(output.split("\0"))
+    for token in tokens:
+        if not token:
+            continue
+        kind = token[0]
+        if kind == "#":
+            _, key, value = token.split(" ", 2)
+            if key == "branch.oid":
+                snapshot.oid = None if value == "(initial)" else value
+            elif key == "branch.head":
+                snapshot.branch = None if value == "(detached)" else value
+            elif key == "branch.upstream":
+                snapshot.upstream = value
+            elif key == "branch.ab":
+                ahead, behind = value.split()
+                snapshot.ahead = int(ahead)
+                snapshot.behind = -int(behind)
+        elif kind == "1":
+            parts = token.split(" ", 8)
+            xy = parts[1]
+            entry = StatusEntry(parts[8], "changed", xy[0], xy[1])
+            snapshot.entries[entry.path] = entry
+        elif kind == "2":
+            parts = token.split(" ", 9)
+            xy = parts[1]
+            entry = StatusEntry(parts[9], "renamed", xy[0], xy[1], next(tokens))
+            snapshot.entries[entry.path] = entry
+        elif kind == "u":
+            parts = token.split(" ", 10)
+            xy = parts[1]
+            entry = StatusEntry(parts[10], "unmerged", xy[0], xy[1])
+            snapshot.entries[entry.path] = entry
+        elif kind == "?":
+            snapshot.entries[token[2:]] = StatusEntry(token[2:], "untracked")
+        elif kind == "!":
+            snapshot.entries[token[2:]] = StatusEntry(token[2:], "ignored")
+    return snapshot
+
+
+def changed_since(
+    root: Pathier, since_ns: int, skip: Collection[str] = ()
+) -> list[str]:
+    """Returns paths under `root`, relative and `/` separated, whose mtime is at or after `since_ns`.
+
+    A changed directory is returned in place of its contents since its mtime only moves when entries are added, removed, or renamed,
+    and re-checking the directory covers all of those.
+    If `root` itself changed, `["."]` is returned.
+    `.git` directories and the relative paths in `skip` (i.e. ignored directories like `node_modules`) are never looked at.
+    """
+    skip = set(skip)
+    try:
+        if os.stat(root).st_mtime_ns >= since_ns:
+            return ["."]
+    except OSError:
+        return ["."]
+    changed: list[str] = []
+    stack = [(str(root), "")]
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name == ".git":
+                        continue
+                    relative = f"{prefix}{entry.name}"
+                    if relative in skip:
+                        continue
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if stat.st_mtime_ns >= since_ns:
+                        changed.append(relative)
+                        if is_dir:
+                            continue
+                    if is_dir:
+                        stack.append((entry.path, f"{relative}/"))
+        except OSError:
+            continue
+    return changed
@@ -0,0 +1,74 @@
+import subprocess
+from typing import IO, Iterator
+
+from pathier import Pathish
+
+
+class OutputStream:
+    """Iterate over a command's stdout while the command is still running.
+
+    Output is pulled off the pipe only as fast as it's consumed, so a slow consumer blocks the child instead of buffering its output in memory.
+    Leaving the context (or calling `close()`) before the output is exhausted kills the child.
+
+    Iterating yields lines (without trailing newlines) unless `chunk_size` is given, in which case it yields `bytes` chunks of up to that size.
+
+    stderr goes wherever `stderr` says, the terminal by default.
+
+    >>> with OutputStream(["git", "log", "-p"]) as stream:
+    >>>     for line in stream:
+    >>>         if "TODO" in line:
+    >>>             break"""
+
+    def __init__(
+        self,
+        command: list[str],
+        cwd: Pathish | None = None,
+        chunk_size: int | None = None,
+        stderr: IO | int | None = None,
+    ):
+        self.command = command
+        self.chunk_size = chunk_size
+        self._process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=stderr, cwd=cwd
+        )
+        self._exhausted = False
+
+    def __enter__(self) -> "OutputStream":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self) -> Iterator:
+        if self.chunk_size:
+            return self.chunks(self.chunk_size)
+        return self.lines()
+
+    @property
+    def return_code(self) -> int | None:
+        """The command's exit code or `None` if it's still running."""
+        return self._process.poll()
+
+    def chunks(self, size: int = 65536) -> Iterator[bytes]:
+        """Yield stdout in chunks of up to `size` bytes as they become available."""
+        stdout = self._process.stdout
+        assert stdout
+        while chunk := stdout.read1(size):
+            yield chunk
+        self._exhausted = True
+
+    def lines(self) -> Iterator[str]:
+        """Yield stdout line by line as lines become available."""
+        stdout = self._process.stdout
+        assert stdout
+        for line in stdout:
+            yield line.decode(errors="replace").rstrip("\n")
+        self._exhausted = True
+
+    def close(self):
+        """Kill the command if its output wasn't read to the end and release the pipe."""
+        if not self._exhausted and self._process.poll() is None:
+            self._process.kill()
+        if self._process.stdout:
+            self._process.stdout.close()
+        self._process.wait()
@@ -1,9 +1,29 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
 from datetime import datetime
 
 import pytest
+from morbin import Output
 from pathier import Pathier
 
-from gitbetter import Git
+from gitbetter import AsyncGit, Git, GitHub, fleet
+from gitbetter.asyncgit import AsyncOutputStream
+from gitbetter import git as git_module
+from gitbetter.git import combine_outputs
+from gitbetter.gitbetter import GitBetter
+from gitbetter.gitdir import find_git_dir
+from gitbetter.hooks import Check, Hooks
+from gitbetter.liveprompt import LivePrompt, PollingWatcher
+from gitbetter.pacing import Pacer
+from gitbetter.profiling import Profiler
+from gitbetter.querycache import QueryCache
+from gitbetter.remotes import owner_reponame, parse_remote_url, remote_cache
+from gitbetter.status import changed_since
 
 root = Pathier(__file__).parent
 
@@ -34,6 +54,11 @@ def test__init_commit(dummyrepo: Pathier, git: Git):
 
 def test__current_branch(dummyrepo: Pathier, git: Git):
     assert git.current_branch == "main"
+    misses = git.branch_cache_misses
+    hits = git.branch_cache_hits
+    assert git.current_branch == "main"
+    assert git.branch_cache_misses == misses
+    assert git.branch_cache_hits == hits + 1
 
 
 def test__create_new_branch(dummyrepo: Pathier, git: Git):
@@ -97,3 +122,1154 @@ def test__untrack(dummyrepo: Pathier, git: Git):
 
 def test__dob(dummyrepo: Pathier, git: Git):
     assert datetime.now().strftime("%Y-%m-%d") == git.dob.strftime("%Y-%m-%d")
+
+
+def test__read_object(dummyrepo: Pathier, git: Git):
+    obj = git.read_object("HEAD:file.py")
+    assert obj and obj.type == "blob"
+    assert obj.data == (dummyrepo / "file.py").read_bytes()
+    assert git.read_object("HEAD:nonexistent.py") is None
+    info = git.object_info("HEAD")
+    assert info and info.type == "commit" and len(info.sha) == 40
+    # Names with spaces split like a found object's header
+    assert git.read_object("HEAD:x y.txt") is None
+    assert git.object_info("HEAD:x y.txt") is None
+    with pytest.raises(ValueError):
+        git.read_object("HEAD\nHEAD")
+    assert git.read_object("HEAD:file.py").data == obj.data  # type: ignore
+
+
+def test__read_many(dummyrepo: Pathier, git: Git):
+    objs = list(git.read_many(["HEAD", "HEAD:file.py", "nope"] * 500))
+    assert len(objs) == 1500
+    assert objs[0] and objs[0].type == "commit"
+    assert objs[1] and objs[1].type == "blob"
+    assert objs[2] is None
+
+
+def test__catfile_restart(dummyrepo: Pathier, git: Git):
+    git.read_object("HEAD")
+    assert git._catfile._process
+    git._catfile._process.kill()
+    git._catfile._process.wait()
+    obj = git.read_object("HEAD")
+    assert obj and obj.type == "commit"
+    git.close()
+    assert not git._catfile.alive
+
+
+def test__iter_commits(dummyrepo: Pathier, git: Git):
+    commits = list(git.iter_commits())
+    assert commits[-1].subject == "Initial commit"
+    assert commits[-1].parents == ()
+    assert all(commit.parents for commit in commits[:-1])
+    assert commits[0].sha == git.object_info("HEAD").sha  # type: ignore
+    assert all(commit.body is None for commit in commits)
+    commits = list(
+        git.iter_commits("HEAD", ["file.py"], fields=("sha", "subject", "body"))
+    )
+    assert [commit.subject for commit in commits] == [
+        "refactor: change string value",
+        "Initial commit",
+    ]
+    assert commits[0].author_name is None
+    with pytest.raises(ValueError, match="doesnotexist"):
+        list(git.iter_commits("doesnotexist"))
+
+
+def test__current_branch_worktree(dummyrepo: Pathier, git: Git, tmp_path):
+    worktree = Pathier(tmp_path) / "worktree"
+    assert git.worktree(f"add -b worktree-branch {worktree}").return_code[0] == 0
+    worktree.mkcwd()
+    assert git.current_branch == "worktree-branch"
+    dummyrepo.mkcwd()
+    assert git.current_branch == "main"
+
+
+def test__async_git(dummyrepo: Pathier):
+    async def run() -> list[Output]:
+        git = AsyncGit(max_processes=2)
+        with git.capturing_output():
+            return await asyncio.gather(*[git.log("--oneline") for _ in range(6)])
+
+    outputs = asyncio.run(run())
+    assert all(output.return_code == [0] for output in outputs)
+    assert len({output.stdout for output in outputs}) == 1
+    assert "Initial commit" in outputs[0].stdout
+
+
+def test__async_git_across_loops(dummyrepo: Pathier):
+    git = AsyncGit(True, max_processes=1, timeout=10)
+
+    async def run() -> list[Output]:
+        return await asyncio.gather(*[git.log("--oneline") for _ in range(4)])
+
+    for _ in range(2):
+        assert all(output.return_code == [0] for output in asyncio.run(run()))
+
+
+def test__async_git_stream(dummyrepo: Pathier, tmp_path, monkeypatch):
+    async def run() -> list[str]:
+        git = AsyncGit()
+        lines = []
+        async for line in git.stream("log --format=%s"):
+            lines.append(line)
+        return lines
+
+    assert asyncio.run(run())[-1] == "Initial commit"
+
+    async def elsewhere() -> tuple[Output, list[str], AsyncOutputStream]:
+        git = AsyncGit(True, cwd=dummyrepo)
+        output = await git.run("rev-parse --show-toplevel")
+        async with git.stream("log nosuchref") as stream:
+            lines = [line async for line in stream]
+        return output, lines, stream
+
+    monkeypatch.chdir(tmp_path)
+    output, lines, stream = asyncio.run(elsewhere())
+    assert Pathier(output.stdout.strip()) == Pathier(dummyrepo).resolve()
+    assert lines == []
+    assert stream.return_code == 128 and "nosuchref" in stream.stderr
+
+
+def test__async_git_timeout(dummyrepo: Pathier):
+    async def run():
+        git = AsyncGit(True)
+        return await git.run("-c 'alias.slow=!sleep 1' slow", timeout=0.2)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(run())
+
+
+def test__fleet(dummyrepo: Pathier, tmp_path):
+    repos = Pathier(tmp_path) / "fleet"
+    for name in ["repo1", "repo2", "empty"]:
+        (repos / name).mkdir()
+        Git(cwd=repos / name).new_repo()
+    (repos / "not_a_repo").mkdir()
+    for name in ["repo1", "repo2"]:
+        (repos / name / "file.txt").write_text(name)
+        Git(cwd=repos / name).commit_all("Initial commit")
+    results = list(fleet.run([repos / "*"], "log", "--oneline"))
+    assert len(results) == 3
+    by_name = {result.repo.name: result for result in results}
+    assert by_name["repo1"].ok and "Initial commit" in by_name["repo1"].output.stdout
+    assert by_name["repo2"].ok
+    assert not by_name["empty"].ok
+    assert all(result.elapsed > 0 for result in results)
+    with pytest.raises(ValueError):
+        list(fleet.run([repos / "*"], "current_branch"))
+
+
+def test__add_files_batched(dummyrepo: Pathier, git: Git):
+    generated = dummyrepo / "generated dir"
+    generated.mkdir()
+    files = [generated / f"file {i}.txt" for i in range(500)]
+    for file in files:
+        file.write_text(file.stem)
+    assert git.add_files(files).return_code == [0]
+    assert git.commit_files(files, "chore: add generated files").return_code == [0]
+    assert git.object_info("HEAD:generated dir/file 499.txt")
+    # A pattern matching nothing doesn't stop the rest from being untracked
+    assert git.untrack(*files, "typo*.txt").return_code == [0]
+    with git.capturing_output():
+        assert not git.run("ls-files generated").stdout
+
+
+def test__combine_outputs():
+    outputs = [Output([i], f"{i}", "") for i in range(1000)]
+    assert combine_outputs(outputs) == sum(outputs[1:], outputs[0])
+
+
+def test__status_snapshot(dummyrepo: Pathier, git: Git):
+    git.commit_all("chore: clean up")
+    snapshot = git.status_snapshot()
+    assert snapshot.branch == "main" and snapshot.clean
+    (dummyrepo / "file.py").write_text("file = 'test3'")
+    (dummyrepo / "staged.py").write_text("staged = True")
+    git.add_files(["staged.py"])
+    (dummyrepo / "sub").mkdir()
+    (dummyrepo / "sub" / "untracked file.py").write_text("")
+    snapshot = git.status_snapshot()
+    assert [entry.path for entry in snapshot.staged] == ["staged.py"]
+    assert [entry.path for entry in snapshot.unstaged] == ["file.py"]
+    assert [entry.path for entry in snapshot.untracked] == ["sub/"]
+    assert snapshot.oid and not snapshot.conflicted
+
+
+def test__status_snapshot_incremental(dummyrepo: Pathier, git: Git):
+    full = git.status_snapshot()
+    assert git.status_snapshot(full).entries == full.entries
+    (dummyrepo / "sub" / "untracked file.py").delete()
+    (dummyrepo / "sub" / "another.py").write_text("")
+    (dummyrepo / "file9000.py").write_text("changed")
+    incremental = git.status_snapshot(full)
+    assert incremental.entries == git.status_snapshot().entries
+    assert "file9000.py" in incremental.entries
+    git.commit_all("chore: commit everything")
+    assert git.status_snapshot(incremental).clean
+
+
+def test__status_snapshot_ignored(dummyrepo: Pathier, tmp_path):
+    repo = tmp_path / "ignored"
+    (repo / "build" / "deep").mkdir(parents=True)
+    git = Git(True, cwd=repo)
+    git.new_repo()
+    (repo / ".gitignore").write_text("build/\n*.pyc\n")
+    (repo / "build" / "deep" / "out.o").write_text("")
+    (repo / "a.py").write_text("a")
+    (repo / "a.pyc").write_text("")
+    git.initcommit()
+    full = git.status_snapshot()
+    assert full.clean and not full.entries
+    assert full.ignored_dirs == ["build/"]
+    since = time.time_ns()
+    time.sleep(0.01)
+    (repo / "build" / "deep" / "out.o").write_text("rebuilt")
+    (repo / "a.py").write_text("touched")
+    assert sorted(changed_since(repo, since)) == ["a.py", "build/deep/out.o"]
+    assert changed_since(repo, since, ["build"]) == ["a.py"]
+    (repo / "build" / "deep" / "more.o").write_text("")
+    (repo / "a.py").write_text("changed")
+    incremental = git.status_snapshot(full)
+    assert incremental.entries == git.status_snapshot().entries
+    assert incremental.ignored_dirs == ["build/"]
+    # A changed `.gitignore` can change what's ignored anywhere, so everything is re-checked
+    (repo / ".gitignore").write_text("*.pyc\n")
+    incremental = git.status_snapshot(incremental)
+    assert "build/" in incremental.entries and not incremental.ignored_dirs
+    git.close()
+
+
+def test__refs(dummyrepo: Pathier, git: Git):
+    head = git.object_info("HEAD").sha  # type: ignore
+    for i in range(200):
+        git.tag(f"v0.{i}.0")
+    git.tag('-a v1.0.0 -m "Release"')
+    git.pack_refs("--all")
+    git.tag("v2.0.0")
+    git.branch("loose-branch")
+    tags = git.tags()
+    assert len(tags) == 202
+    assert tags["v0.199.0"] == head
+    assert tags["v1.0.0"] != head
+    assert git.ref_store.packed.peeled["refs/tags/v1.0.0"] == head
+    assert git.branches()["main"] == head
+    assert git.branches()["loose-branch"] == head
+    assert git.resolve_ref("refs/tags/v0.57.0") == head
+    assert git.resolve_ref("refs/tags/v2.0.0") == head
+    assert git.resolve_ref("refs/tags/v0.57.1") is None
+    assert all(git.resolve_ref(f"refs/tags/{tag}") == sha for tag, sha in tags.items())
+    # Nothing stays mapped between lookups, so git can replace the file
+    if sys.platform.startswith("linux"):
+        assert "packed-refs" not in Pathier("/proc/self/maps").read_text()
+    assert git.refs() == {
+        name: sha
+        for sha, name in (
+            line.split() for line in Git(True).run("show-ref").stdout.splitlines()
+        )
+    }
+
+
+def test__profiler(dummyrepo: Pathier, tmp_path):
+    git = Git(True)
+    git.profiler = Profiler()
+    git.status()
+    git.status("-s")
+    git.log("--oneline")
+    git.run("-c core.pager=cat log -1")
+    summary = git.profiler.summary()
+    assert summary["git status"]["calls"] == 2
+    assert summary["git log"]["calls"] == 2
+    invocation = git.profiler.invocations[2]
+    assert invocation.stdout_bytes == len(git.log("--oneline").stdout.encode())
+    assert invocation.wall_time > 0 and invocation.return_code == 0
+    assert "git status" in git.profiler.histogram()
+    jsonl = Pathier(tmp_path) / "stats.jsonl"
+    git.profiler.to_jsonl(jsonl)
+    assert len(jsonl.read_text().splitlines()) == 5
+    trace = Pathier(tmp_path) / "trace.json"
+    git.profiler.to_chrome_trace(trace)
+    assert len(trace.loads()["traceEvents"]) == 5
+    assert not any(
+        invocation.cpu_time_approximate for invocation in git.profiler.invocations
+    )
+    # Sizes of output that went straight to the terminal aren't known
+    git.capture_output = False
+    git.run("--version")
+    assert git.profiler.invocations[-1].stdout_bytes is None
+    git.profiler.to_jsonl(jsonl)
+    assert "stdout_bytes" not in jsonl.read_text().splitlines()[-1]
+    # Child CPU time is process wide, so overlapping calls are marked approximate
+    profiler = Profiler()
+
+    def slow() -> Output:
+        time.sleep(0.05)
+        return Output([0])
+
+    threads = [
+        threading.Thread(target=profiler.measure, args=("git", ("status",), slow))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(invocation.cpu_time_approximate for invocation in profiler.invocations)
+    assert "~" in profiler.histogram()
+
+
+def test__startup_budget():
+    """Getting to the prompt shouldn't load anything the shell doesn't need yet.
+
+    `argshell` is excluded from the budget since everything else depends on it."""
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import sys;from gitbetter.gitbetter import GitBetter;GitBetter();"
+            "print(*[m for m in ('asyncio', 'concurrent.futures', 'gitbetter.git', 'morbin') if m in sys.modules])",
+        ],
+        capture_output=True,
+        text=True,
+        env=os.environ | {"PYTHONPATH": str(root.parent / "src")},
+    )
+    assert output.stdout.strip() == ""
+    cumulative = {
+        line.split("|")[2].strip(): int(line.split("|")[1])
+        for line in output.stderr.splitlines()
+        if line.startswith("import time:") and "cumulative" not in line
+    }
+    budget_us = 100_000
+    assert cumulative["gitbetter.gitbetter"] - cumulative["argshell"] < budget_us
+
+
+def test__one_shot_command(dummyrepo: Pathier):
+    output = subprocess.run(
+        [sys.executable, "-m", "gitbetter.gitbetter", "-c", "branch", "-c", "dob"],
+        capture_output=True,
+        text=True,
+        env=os.environ | {"PYTHONPATH": str(root.parent / "src")},
+    )
+    assert output.returncode == 0
+    assert "* main" in output.stdout
+    assert datetime.now().strftime("%m/%d/%Y") in output.stdout
+    for commands in (
+        ["git switch doesnotexist", "branch"],
+        ["log doesnotexist"],
+        ["cd doesnotexist"],
+        ["false"],
+    ):
+        output = subprocess.run(
+            [sys.executable, "-m", "gitbetter.gitbetter"]
+            + [arg for command in commands for arg in ("-c", command)],
+            capture_output=True,
+            text=True,
+            env=os.environ | {"PYTHONPATH": str(root.parent / "src")},
+        )
+        assert output.returncode != 0, commands
+    # Paged commands are profiled and record their exit status
+    shell = GitBetter()
+    shell.git.profiler = Profiler()
+    shell.onecmd("log --oneline -1")
+    assert shell.git.last_output.return_code == [0]
+    assert shell.git.profiler.invocations[-1].subcommand == "log"
+    assert shell.run_commands(["log doesnotexist"]) == 128
+
+
+def test__help_catalogue(capsys):
+    shell = GitBetter()
+    GitBetter._help_text.pop(GitBetter, None)
+    shell.do_help("")
+    first = capsys.readouterr().out
+    assert GitBetter in GitBetter._help_text
+    shell.do_help("")
+    assert capsys.readouterr().out == first
+    git_commands, convenience_commands = first.split("Convenience commands")
+    assert "commitall" in convenience_commands and "commitall" not in git_commands
+    assert "cherry_pick" in git_commands and "cherry_pick" not in convenience_commands
+
+
+def test__stream(dummyrepo: Pathier, git: Git):
+    with git.capturing_output():
+        expected = git.log("--oneline").stdout.splitlines()
+    with git.stream("log", "--oneline") as stream:
+        assert list(stream) == expected
+    assert stream.return_code == 0
+    with git.stream("log", "-p", chunk_size=16) as stream:
+        chunks = list(stream)
+    assert all(len(chunk) <= 16 for chunk in chunks)
+    with git.capturing_output():
+        assert b"".join(chunks).decode() == git.log("-p").stdout
+    # Bail out early on a command that would otherwise run for a while
+    with git.stream("-c 'alias.forever=!yes'", "forever") as stream:
+        for i, _ in enumerate(stream):
+            if i == 10:
+                break
+    assert stream.return_code not in (None, 0)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://github.com/matt-manes/gitbetter",
+        "https://github.com/matt-manes/gitbetter.git",
+        "https://user@github.com/matt-manes/gitbetter.git/",
+        "ssh://git@github.com/matt-manes/gitbetter.git",
+        "ssh://git@github.com:22/matt-manes/gitbetter.git",
+        "git@github.com:matt-manes/gitbetter.git",
+        "github.com:matt-manes/gitbetter",
+    ],
+)
+def test__parse_remote_url(url: str):
+    assert parse_remote_url(url) == ("github.com", "matt-manes/gitbetter")
+    assert owner_reponame(url) == "matt-manes/gitbetter"
+
+
+def test__github_owner_reponame(dummyrepo: Pathier, git: Git):
+    git.add_remote_url("git@github.com:matt-manes/dummyrepo.git")
+    github = GitHub(cwd=dummyrepo)
+    misses = remote_cache.misses
+    assert github.owner == "matt-manes"
+    assert github.repo_name == "dummyrepo"
+    assert remote_cache.misses == misses + 1
+    assert remote_cache.owner_reponames([dummyrepo, dummyrepo.parent]) == {
+        dummyrepo: "matt-manes/dummyrepo"
+    }
+    git.remote("set-url origin https://github.com/someone/else.git")
+    assert GitHub().owner == "someone"
+
+
+def test__remote_cache_config_forms(tmp_path):
+    repo = Pathier(tmp_path) / "remotes"
+    Git(cwd=repo.parent).run_argv(["init", "-q", repo])
+    config = repo / ".git" / "config"
+    config.write_text(
+        config.read_text()
+        + '[Remote "origin"]\n\turl = git@github.com:a/b.git\n'
+        + "[remote.Upstream]\n\tURL = https://github.com/c/d\n"
+    )
+    remotes = remote_cache.remotes(repo)
+    assert remotes == {
+        "origin": "git@github.com:a/b.git",
+        "upstream": "https://github.com/c/d",
+    }
+    # Remotes in included files are read through git
+    (repo / "extra.config").write_text(
+        '[remote "fork"]\n\turl = https://github.com/e/f\n'
+    )
+    config.write_text(config.read_text() + "[include]\n\tpath = ../extra.config\n")
+    assert remote_cache.url(repo, "fork") == "https://github.com/e/f"
+    assert remote_cache.remotes(repo) == remotes | {"fork": "https://github.com/e/f"}
+
+
+GH_STUB = """#!{python}
+import json, sys
+from pathlib import Path
+
+stub = Path(__file__).parent
+key = " ".join(sys.argv[1:])
+stdin = "" if sys.stdin.isatty() else sys.stdin.read()
+with open(stub / "calls.jsonl", "a") as file:
+    file.write(json.dumps({{"args": key, "stdin": stdin}}) + "\\n")
+responses = json.loads((stub / "responses.json").read_text())
+queue = responses.get(key) or responses.get(sys.argv[2] if len(sys.argv) > 2 else "", [])
+stdout, stderr, code = queue.pop(0) if len(queue) > 1 else (queue[0] if queue else ("", "", 0))
+(stub / "responses.json").write_text(json.dumps(responses))
+sys.stdout.write(stdout)
+sys.stderr.write(stderr)
+sys.exit(code)
+"""
+
+
+@pytest.fixture
+def gh_stub(tmp_path, monkeypatch):
+    """Put a fake `gh` first on PATH that records its calls and replies from `responses.json`."""
+    gh = tmp_path / "gh"
+    gh.write_text(GH_STUB.format(python=sys.executable))
+    gh.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+    def respond(responses: dict) -> Pathier:
+        (tmp_path / "responses.json").write_text(json.dumps(responses))
+        return tmp_path / "calls.jsonl"
+
+    return respond
+
+
+def test__github_bulk_edit(gh_stub):
+    lookup = {
+        "data": {
+            "rateLimit": {"remaining": 4999, "resetAt": "2030-01-01T00:00:00Z"},
+            "r0": {"id": "A", "nameWithOwner": "me/a", "visibility": "PUBLIC"},
+            "r1": {"id": "B", "nameWithOwner": "me/b", "visibility": "PRIVATE"},
+            "r2": None,
+        }
+    }
+    calls = gh_stub({"graphql": [[json.dumps(lookup), "", 0]], "-X": [["{}", "", 0]]})
+    results = GitHub().bulk_edit(["me/a", "me/b", "me/c"], "private")
+    assert results["me/a"].return_code == [0]
+    assert "already private" in results["me/b"].stdout
+    assert results["me/c"].return_code == [1]
+    logged = [json.loads(line) for line in calls.read_text().splitlines()]
+    assert [call["args"] for call in logged] == [
+        "api graphql --input -",
+        "api -X PATCH repos/me/a -f visibility=private",
+    ]
+    request = json.loads(logged[0]["stdin"])
+    assert request["variables"] == {
+        "o0": "me",
+        "n0": "a",
+        "o1": "me",
+        "n1": "b",
+        "o2": "me",
+        "n2": "c",
+    }
+
+
+def test__github_bulk_create(gh_stub):
+    response = {
+        "data": {"r0": {"repository": {"url": "https://github.com/me/a"}}, "r1": None},
+        "errors": [{"path": ["r1"], "message": "Name already exists"}],
+    }
+    calls = gh_stub({"graphql": [[json.dumps(response), "", 1]]})
+    results = GitHub().bulk_create(["a", "b"])
+    assert results["a"].stdout == "https://github.com/me/a"
+    assert results["b"].stderr == "Name already exists"
+    assert len(calls.read_text().splitlines()) == 1
+    assert "visibility: PRIVATE" in calls.read_text()
+
+
+def test__github_paced_retry(gh_stub):
+    calls = gh_stub(
+        {
+            "-X": [
+                ["", "HTTP 403: API rate limit exceeded", 1],
+                ["{}", "", 0],
+            ]
+        }
+    )
+    pacer = Pacer(max_delay=0.01)
+    output = GitHub()._paced_run(pacer, "api -X DELETE repos/me/a")
+    assert output.return_code == [0]
+    assert len(calls.read_text().splitlines()) == 2
+    assert pacer.delay < 0.01
+
+
+CHECK_SCRIPT = """import sys
+from pathlib import Path
+
+with open(Path(__file__).with_name("checked.log"), "a") as log:
+    log.write("\\n".join(sys.argv[1:]) + "\\n")
+bad = [file for file in sys.argv[1:] if "bad" in Path(file).read_text()]
+print(*bad)
+sys.exit(1 if bad else 0)
+"""
+
+
+def test__commit_hooks(dummyrepo: Pathier, tmp_path, monkeypatch):
+    repo = tmp_path / "hooked"
+    repo.mkdir()
+    script = tmp_path / "check.py"
+    script.write_text(CHECK_SCRIPT)
+    log = tmp_path / "checked.log"
+    git = Git(True, cwd=repo)
+    git.new_repo()
+    git.hooks = Hooks(
+        [Check("nobad", f"{sys.executable} {script}", ("*.txt",))], max_workers=2
+    )
+    for i in range(4):
+        (repo / f"{i}.txt").write_text("good")
+    (repo / "skipped.md").write_text("bad")
+    assert git.commit_all("first").return_code[-1] == 0
+    assert sorted(log.read_text().split()) == [f"{i}.txt" for i in range(4)]
+    # Unchanged blobs aren't checked again, failures block the commit
+    log.write_text("")
+    head = git.run("rev-parse HEAD").stdout
+    (repo / "0.txt").write_text("bad")
+    (repo / "4.txt").write_text("also good")
+    output = git.commit_all("second")
+    assert output.return_code[-1] == 1
+    assert "nobad failed" in output.stderr and "0.txt" in output.stderr
+    assert git.run("rev-parse HEAD").stdout == head
+    assert sorted(log.read_text().split()) == ["0.txt", "4.txt"]
+    (repo / "0.txt").write_text("good again")
+    assert git.commit_files(["0.txt", "4.txt"], "third").return_code[-1] == 0
+    assert git.staged_blobs() == {}
+    # The cache only keeps the most recently seen shas of configured checks
+    cache = Pathier(repo) / ".git" / "gitbetter" / "hooks.json"
+    cache.dumps(cache.loads() | {"removed:check": ["0" * 40]})
+    git.hooks.max_cached = 2
+    (repo / "5.txt").write_text("five")
+    assert git.commit_all("fourth").return_code[-1] == 0
+    shas = cache.loads()
+    assert list(shas) == [git.hooks.checks[0].key]
+    assert len(shas[git.hooks.checks[0].key]) == 2
+    assert (
+        git.run("rev-parse HEAD:5.txt").stdout.strip() in shas[git.hooks.checks[0].key]
+    )
+    # Files staged for checks that fail are unstaged again
+    (repo / "6.txt").write_text("bad")
+    assert git.commit_files(["6.txt"], "fifth").return_code[-1] == 1
+    assert "6.txt" not in git.index
+    # The shell only reads the hooks config again when it changes
+    monkeypatch.chdir(repo)
+    shell = GitBetter()
+    shell._load_hooks()
+    assert shell.git.hooks is None
+    git.run_argv(["config", "gitbetter-check.nobad.command", "true"])
+    shell._load_hooks()
+    hooks = shell.git.hooks
+    assert hooks and hooks.checks[0].command == "true"
+    shell._load_hooks()
+    assert shell.git.hooks is hooks
+    git.close()
+
+
+def test__hooks_from_config():
+    hooks = Hooks.from_config(
+        "gitbetter-check.black.command black --check\n"
+        "gitbetter-check.black.pattern *.py\n"
+        "gitbetter-check.black.pattern *.pyi\n"
+        "gitbetter-check.size.command ./check_size.sh\n"
+    )
+    assert hooks.checks == [
+        Check("black", "black --check", ("*.py", "*.pyi")),
+        Check("size", "./check_size.sh", ("*",)),
+    ]
+
+
+def test__query_cache(dummyrepo: Pathier, tmp_path, monkeypatch):
+    repo = tmp_path / "cached"
+    repo.mkdir()
+    git = Git(True, cwd=repo)
+    git.new_repo()
+    (repo / "a.txt").write_text("a")
+    git.commit_all("first")
+    cache = git.enable_query_cache()
+    first = git.log("--oneline")
+    assert git.log("--oneline") == first
+    assert (cache.hits, cache.misses) == (1, 1)
+    # Moving HEAD changes the key
+    (repo / "a.txt").write_text("b")
+    git.commit_all("second")
+    assert "second" in git.log("--oneline").stdout
+    assert git.log("--oneline HEAD~1").stdout == first.stdout
+    assert cache.hits == 1
+    # So does switching to another branch pointing at the same commit
+    git.create_new_branch("other")
+    assert git.run("rev-parse --abbrev-ref HEAD").stdout.strip() == "other"
+    git.switch_branch("main")
+    assert git.run("rev-parse --abbrev-ref HEAD").stdout.strip() == "main"
+    # Output also depends on `.mailmap`, notes, and global config
+    monkeypatch.setenv("GIT_CONFIG_GLOBAL", str(tmp_path / "global.gitconfig"))
+    author = git.log("-1 --format=%aN").stdout
+    (repo / ".mailmap").write_text(f"Mapped <{os.environ['GIT_AUTHOR_EMAIL']}>\n")
+    assert git.log("-1 --format=%aN").stdout == "Mapped\n" != author
+    assert "Notes" not in git.log("-1").stdout
+    git.notes("add -m noted HEAD")
+    assert "noted" in git.log("-1").stdout
+    short = git.log("--oneline -1").stdout
+    (tmp_path / "global.gitconfig").write_text("[core]\n\tabbrev = 20\n")
+    assert git.log("--oneline -1").stdout != short
+    # Clock and working tree dependent output isn't cached
+    hits, misses = cache.hits, cache.misses
+    git.log("--since=1.day")
+    git.blame("a.txt")
+    git.status()
+    assert (cache.hits, cache.misses) == (hits, misses)
+    git.enable_query_cache(disk=True)
+    show = git.show("HEAD~1 --stat")
+    other = Git(True, cwd=repo)
+    disk = other.enable_query_cache(disk=True)
+    assert other.show("HEAD~1 --stat") == show
+    assert disk.hits == 1
+    assert (repo / ".git" / "gitbetter-cache" / "queries.sqlite3").exists()
+    for cached in (git, other):
+        assert cached.query_cache
+        cached.query_cache.close()
+        cached.close()
+
+
+def test__query_cache_eviction():
+    cache = QueryCache(max_entries=2, max_bytes=10)
+    cache.put("a", Output([0], "1"))
+    cache.put("b", Output([0], "2"))
+    cache.get("a")
+    cache.put("c", Output([0], "3"))
+    assert cache.get("b") is None
+    assert cache.get("a") == Output([0], "1")
+    cache.put("d", Output([0], "x" * 10))
+    assert len(cache) == 1
+
+
+def make_remote(path: Pathier, file: str) -> Pathier:
+    """Create a bare repo at `path` with one commit adding `file`."""
+    work = path.with_name(f"{path.stem}-work")
+    work.mkdir()
+    git = Git(True, cwd=work)
+    git.new_repo()
+    (work / file).write_text(file)
+    git.commit_all(f"add {file}")
+    subprocess.run(["git", "clone", "-q", "--bare", str(work), str(path)], check=True)
+    return path
+
+
+def test__fetch_all(dummyrepo: Pathier, tmp_path):
+    repo = tmp_path / "fetching"
+    repo.mkdir()
+    git = Git(True, cwd=repo)
+    git.new_repo()
+    for name in ("one", "two", "three"):
+        git.add_remote_url(str(make_remote(tmp_path / f"{name}.git", name)), name)
+    git.add_remote_url(str(tmp_path / "missing.git"), "missing")
+    progress = []
+    results = git.fetch_all(
+        parallel=3,
+        retry_delay=0,
+        progress=lambda result, done, total: progress.append((done, total)),
+    )
+    assert list(results) == ["one", "two", "three", "missing"]
+    assert [results[name].ok for name in results] == [True, True, True, False]
+    assert results["missing"].attempts == 3
+    assert results["one"].attempts == 1
+    assert sorted(progress) == [(i, 4) for i in range(1, 5)]
+    assert set(git.refs()) >= {
+        f"refs/remotes/{name}/main" for name in ("one", "two", "three")
+    }
+    git.close()
+
+
+def test__update_submodules(dummyrepo: Pathier, tmp_path, monkeypatch):
+    # Local file remotes for submodules are off by default since git 2.38.1
+    monkeypatch.setenv("GIT_CONFIG_COUNT", "1")
+    monkeypatch.setenv("GIT_CONFIG_KEY_0", "protocol.file.allow")
+    monkeypatch.setenv("GIT_CONFIG_VALUE_0", "always")
+    superproject = tmp_path / "super"
+    superproject.mkdir()
+    git = Git(True, cwd=superproject)
+    git.new_repo()
+    for name in ("a", "b"):
+        remote = make_remote(tmp_path / f"{name}.git", name)
+        git.submodule(f"add {remote} libs/{name}")
+    git.commit_all("add submodules")
+    clone = tmp_path / "clone"
+    subprocess.run(["git", "clone", "-q", str(superproject), str(clone)], check=True)
+    cloned = Git(True, cwd=clone)
+    assert cloned.submodule_paths() == ["libs/a", "libs/b"]
+    assert not (clone / "libs" / "a" / "a").exists()
+    results = cloned.update_submodules(parallel=2)
+    assert all(result.ok for result in results.values())
+    assert (clone / "libs" / "a" / "a").read_text() == "a"
+    assert (clone / "libs" / "b" / "b").read_text() == "b"
+    git.close()
+    cloned.close()
+
+
+def test__diff_stats_and_churn(dummyrepo: Pathier, tmp_path):
+    repo = tmp_path / "churny"
+    (repo / "src").mkdir(parents=True)
+    git = Git(True, cwd=repo)
+    git.new_repo()
+    (repo / "src" / "a.py").write_text("1\n2\n3\n")
+    (repo / "blob.bin").write_bytes(b"\0\1\2")
+    git.commit_all("first")
+    git.tag("v1")
+    (repo / "src" / "a.py").write_text("1\n3\n4\n5\n")
+    (repo / "b with space.py").write_text("b\n")
+    git.commit_all("second")
+    git.run("mv src/a.py src/c.py")
+    git.run("commit -m third --author='other <other@example.com>'")
+
+    stats = git.diff_stats("v1..HEAD")
+    assert stats["src/c.py"] == (2, 1, 1, 0)
+    assert stats["b with space.py"] == (1, 0, 1, 0)
+    assert "blob.bin" not in stats
+    assert git.diff_stats("v1..HEAD", ["src"]).keys == ["src/c.py"]
+
+    by_path = git.churn()
+    assert by_path["src/a.py"] == (5, 1, 2, 0)
+    assert by_path["src/c.py"] == (0, 0, 1, 0)
+    assert by_path["blob.bin"] == (0, 0, 1, 1)
+    assert by_path.totals == (6, 1)
+    by_dir = git.churn(by="dir")
+    assert by_dir["src"] == (5, 1, 3, 0)
+    assert by_dir["."] == (1, 0, 2, 1)
+    by_author = git.churn(by="author")
+    assert set(by_author.keys) == {os.environ["GIT_AUTHOR_NAME"], "other"}
+    assert by_author.top(1)[0][1:3] == (6, 1)
+    assert git.churn(since="2000-01-01", until="2000-01-02").keys == []
+
+    assert by_dir.to_csv(tmp_path / "dirs.csv").splitlines()[0] == (
+        "dir,added,deleted,commits,binary"
+    )
+    assert (tmp_path / "dirs.csv").read_text().splitlines()[1] == "src,5,1,3,0"
+    assert json.loads(by_dir.to_json())[0] == {
+        "dir": "src",
+        "added": 5,
+        "deleted": 1,
+        "commits": 3,
+        "binary": 0,
+    }
+    with pytest.raises(ValueError):
+        git.churn(by="file")
+    with pytest.raises(ValueError, match="nosuchrev"):
+        git.churn(rev="nosuchrev")
+    with pytest.raises(ValueError, match="nosuchrev"):
+        git.diff_stats("v1..nosuchrev")
+    git.close()
+
+
+def test__run_argv(dummyrepo: Pathier, tmp_path, monkeypatch):
+    repo = tmp_path / "argv"
+    repo.mkdir()
+    git = Git(True, cwd=repo)
+    git.profiler = Profiler()
+    git.new_repo()
+    message = 'fix: "quoted" $HOME `tick` \\ back\n\nbody line\n' + "x" * 100_000
+    (repo / "it's a file.txt").write_text("1")
+    assert git.commit_all(message).return_code[-1] == 0
+    assert git.run_argv(["log", "-1", "--format=%B"]).stdout.strip() == message.strip()
+    names = [f'odd "name" {i}.txt' for i in range(20)]
+    for name in names:
+        (repo / name).write_text("2")
+    git.add_files(names)
+    assert git.commit_files(names[:10], "argv paths").return_code[-1] == 0
+    monkeypatch.setattr(git_module, "ARGV_PATHS_LIMIT", 10)
+    assert git.commit_files(names[10:], "pathspec file").return_code[-1] == 0
+    committed = git.run_argv(["ls-files", "-z"]).stdout.split("\0")
+    assert set(names) | {"it's a file.txt"} <= set(committed)
+    git.rename_file(repo / names[0], "renamed 'again'.txt")
+    assert git.commit_message("rename").return_code[-1] == 0
+    assert "renamed 'again'.txt" in git.run_argv(["ls-files"]).stdout
+    assert git.profiler.summary()["git ls-files"]["calls"] == 2
+    git.profiler = None
+    git.close()
+
+
+def all_objects(repo: Pathier) -> dict[str, tuple[str, int]]:
+    output = subprocess.run(
+        [
+            "git",
+            "cat-file",
+            "--batch-all-objects",
+            "--batch-check=%(objectname) %(objecttype) %(objectsize)",
+        ],
+        cwd=repo,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return {
+        sha: (kind, int(size))
+        for sha, kind, size in (line.split() for line in output.splitlines())
+    }
+
+
+def test__odb(dummyrepo: Pathier, tmp_path):
+    repo = tmp_path / "odb"
+    repo.mkdir()
+    git = Git(True, cwd=repo)
+    git.new_repo()
+    lines = [f"line {i}\n" for i in range(2000)]
+    for i in range(30):
+        lines[i * 50] = f"changed {i}\n"
+        (repo / "big.txt").write_text("".join(lines))
+        (repo / f"small{i % 3}.txt").write_text(f"{i}\n" * i)
+        git.commit_all(f"commit {i}")
+    git.tag("-a v1 -m 'annotated'")
+    for repack in (
+        ["repack", "-adf"],
+        ["-c", "repack.useDeltaBaseOffset=false", "repack", "-adf"],
+    ):
+        git.run_argv(repack)
+        objects = all_objects(repo)
+        assert len(objects) > 90
+        with Git(True, cwd=repo) as reader:
+            for sha, (kind, size) in objects.items():
+                obj = reader.odb.read(sha)
+                assert obj and (obj.type, obj.size) == (kind, size)
+                assert obj.data == reader.read_object(sha).data  # type: ignore
+                assert reader.odb.info(sha) == reader.object_info(sha)
+            assert reader.odb.cache_misses
+    # Loose objects and new packs are picked up by the same instance
+    odb = git.odb
+    (repo / "loose.txt").write_text("loose")
+    git.commit_all("loose")
+    head = git.resolve_ref("refs/heads/main")
+    assert head and (repo / ".git" / "objects" / head[:2] / head[2:]).exists()
+    assert odb.read(head).data == git.read_object(head).data  # type: ignore
+    assert odb.info(head) == git.object_info(head)
+    assert "0" * 40 not in odb and head in odb
+    assert odb.read("0" * 40) is None
+    # Maps are released before git rewrites packs
+    git.run_argv(["repack", "-ad"])
+    assert not odb._packs
+    assert odb.read(head).data == git.read_object(head).data  # type: ignore
+    # and unmapped once they're gone when something else rewrote them
+    subprocess.run(["git", "repack", "-adf", "-q"], cwd=repo, check=True)
+    assert odb.read(head).data == git.read_object(head).data  # type: ignore
+    assert [pack.name for pack in odb._pack_order] == [
+        str(path) for path in (repo / ".git" / "objects" / "pack").glob("*.pack")
+    ]
+    if sys.platform.startswith("linux"):
+        maps = Pathier("/proc/self/maps").read_text().splitlines()
+        assert not [line for line in maps if ".pack" in line and "(deleted)" in line]
+    git.close()
+
+
+def test__ancestry(dummyrepo: Pathier, tmp_path, monkeypatch):
+    repo = tmp_path / "ancestry"
+    repo.mkdir()
+    git = Git(True, cwd=repo)
+    git.new_repo()
+
+    def commit(message: str) -> str:
+        (repo / f"{message}.txt").write_text(message)
+        git.commit_all(message)
+        return git._commit_sha("HEAD")
+
+    base = commit("base")
+    git.create_new_branch("feature")
+    feature = [commit(f"feature{i}") for i in range(3)]
+    git.switch_branch("main")
+    main = [commit(f"main{i}") for i in range(2)]
+    git.run_argv(["merge", "--no-edit", "feature~1"])
+    merged = git._commit_sha("HEAD")
+    shas = [base, *feature, *main, merged]
+    revs = [*shas, "main", "feature", "feature~2"]
+
+    def expected(a: str, b: str) -> tuple[bool, str, tuple[int, int]]:
+        with git.capturing_output():
+            is_ancestor = not any(
+                git.run_argv(["merge-base", "--is-ancestor", a, b]).return_code
+            )
+            base = git.run_argv(["merge-base", a, b]).stdout.strip()
+            counts = git.run_argv(["rev-list", "--left-right", "--count", f"{a}...{b}"])
+        ahead, behind = counts.stdout.split()
+        return is_ancestor, base, (int(ahead), int(behind))
+
+    answers = {(a, b): expected(a, b) for a in revs for b in revs}
+    for graph in (None, feature, shas):
+        if graph:
+            git.run_argv(
+                ["commit-graph", "write", "--stdin-commits"], input="\n".join(graph)
+            )
+        for (a, b), answer in answers.items():
+            assert (
+                git.is_ancestor(a, b),
+                git.merge_base(a, b),
+                git.ahead_behind(a, b),
+            ) == answer
+    assert git.ancestry._graph and len(git.ancestry._graph) == 7
+    # Too deep to walk in process, answered by git
+    git.ancestry.max_commits = 1
+    (repo / ".git" / "objects" / "info" / "commit-graph").unlink()
+    assert git.ahead_behind("main", "feature") == (3, 1)
+    assert git.is_ancestor("feature~1", "main")
+    # `main` already has `feature~1`, so merging only switches
+    git.switch_branch("feature~1")
+    assert git.merge_to().return_code == [0]
+    assert git.current_branch == "main"
+    assert git._commit_sha("main") == merged
+    # `main` can be fast-forwarded to `feature` without checking it out first
+    git.switch_branch("feature")
+    git.run_argv(["merge", "--no-edit", "main"])
+    head = git._commit_sha("HEAD")
+    git.merge_to()
+    assert git.current_branch == "main"
+    assert git._commit_sha("main") == head
+    assert git.ahead_behind("main", "feature") == (0, 0)
+    reflog = git.run_argv(["reflog", "show", "-1", "--format=%gs", "main"])
+    assert reflog.stdout.strip() == "merge feature: Fast-forward"
+    # A `post-merge` hook means a real `git merge`
+    hook = repo / ".git" / "hooks" / "post-merge"
+    hook.write_text(f"#!/bin/sh\necho merged >> {repo / 'hooked.log'}\n")
+    hook.chmod(0o755)
+    git.switch_branch("feature")
+    commit("hooked")
+    git.merge_to()
+    assert (repo / "hooked.log").read_text() == "merged\n"
+    hook.unlink()
+    # Repos that want merge commits still get them
+    git.run_argv(["config", "merge.ff", "false"])
+    git.switch_branch("feature")
+    (repo / "ff.txt").write_text("ff")
+    git.add_files(["ff.txt"])
+    git.commit_message("ff")
+    feature_head = git._commit_sha("HEAD")
+    git.merge_to()
+    assert git.current_branch == "main"
+    assert git._commit_sha("main") != feature_head
+    assert git._commit_sha("main^2") == feature_head
+    # Criss-cross merges have several best common ancestors, git decides which one is the merge base
+    git.ancestry.max_commits = 50_000
+    git.run_argv(["switch", "-c", "left"])
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "1700000000 +0000")
+    left = commit("left")
+    git.run_argv(["switch", "-c", "right", "main"])
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "1700000100 +0000")
+    right = commit("right")
+    monkeypatch.delenv("GIT_COMMITTER_DATE")
+    git.run_argv(["merge", "--no-edit", left])
+    git.switch_branch("left")
+    git.run_argv(["merge", "--no-edit", right])
+    commit("left2")
+    git.switch_branch("right")
+    commit("right2")
+    assert (
+        len(git.ancestry.merge_bases(git._commit_sha("left"), git._commit_sha("right")))
+        == 2
+    )
+    for a, b in (("left", "right"), ("right", "left")):
+        assert git.merge_base(a, b) == expected(a, b)[1]
+    git.close()
+
+
+def test__batch(dummyrepo: Pathier, tmp_path):
+    repo = tmp_path / "batch"
+    repo.mkdir()
+    git = Git(True, cwd=repo)
+    git.new_repo()
+    for name in "abc":
+        (repo / f"{name}.txt").write_text(name)
+    git.initcommit()
+    git.profiler = Profiler()
+    (repo / "a.txt").write_text("changed")
+    (repo / "new.txt").write_text("new")
+    with git.batch() as batch:
+        git.add_files(["a.txt"])
+        git.commit_message("change a")
+        git.rename_file(repo / "b.txt", "renamed.txt")
+        git.add_files(["new.txt"])
+        # `new.txt` and `renamed.txt` are untracked, so these adds can't be folded into the commit
+        git.amend(["c.txt"])
+    assert batch.recorded == 7
+    assert [step.argv[0] for step in batch.steps] == ["commit", "add", "commit"]
+    assert "--include" in batch.steps[0].argv and batch.saved == 4
+    assert len(git.profiler.invocations) == 3
+    assert not any(batch.output.return_code)
+    breakdown = batch.breakdown()
+    assert "git rm" in breakdown and "# new.txt" in breakdown
+    git.profiler = None
+    with git.capturing_output():
+        files = git.run_argv(["ls-files"]).stdout.split()
+        log = git.run_argv(["log", "-1", "--format=%s", "--name-status"]).stdout
+    assert files == ["a.txt", "c.txt", "new.txt", "renamed.txt"]
+    assert log.startswith("change a")
+    for change in ("M\ta.txt", "A\tnew.txt", "R100\tb.txt\trenamed.txt"):
+        assert change in log
+    # Other commands see queued changes
+    with git.batch():
+        (repo / "d.txt").write_text("d")
+        git.add_files(["d.txt"])
+        assert "d.txt" in git.staged_blobs()
+    # A failing step stops the batch and puts the index back
+    (repo / "e.txt").write_text("e")
+    with git.batch() as batch:
+        git.add_files(["e.txt"])
+        git.run_argv(["rm", "--cached", "missing.txt"])
+        git.commit_message("never")
+    assert [step.ok for step in batch.steps] == [True, False, False]
+    assert batch.steps[-1].output is None
+    assert "e.txt" not in git.staged_blobs()
+    assert "d.txt" in git.staged_blobs()
+    with pytest.raises(RuntimeError):
+        with git.batch():
+            git.add_files(["e.txt"])
+            raise RuntimeError
+    assert "e.txt" not in git.staged_blobs()
+    git.close()
+
+
+def test__index(dummyrepo: Pathier, tmp_path):
+    repo = tmp_path / "index"
+    (repo / "src" / "deep").mkdir(parents=True)
+    git = Git(True, cwd=repo)
+    git.new_repo()
+    # Older than the index will be, so nothing is racily clean after being staged
+    past = time.time_ns() - 10_000_000_000
+    names = ["a.txt", "src/b.py", "src/deep/c.py", "src/deep/ü.txt", "zz.txt"]
+    for name in names:
+        (repo / name).write_text(name)
+        os.utime(repo / name, ns=(past, past))
+    git.initcommit()
+    assert git.index.version == 2 and git.tracked_files() == names
+    (repo / "new.txt").write_text("new")
+    os.utime(repo / "new.txt", ns=(past, past))
+    git.run_argv(["add", "-N", "new.txt"])
+    git.run_argv(["update-index", "--skip-worktree", "zz.txt"])
+    with git.capturing_output():
+        expected = git.run_argv(["ls-files", "-z"]).stdout.split("\0")[:-1]
+    # Extended flags need at least version 3
+    for version in (3, 4):
+        git.run_argv(["update-index", f"--index-version={version}"])
+        assert git.index.version == version
+        assert git.tracked_files() == expected
+    assert git.index.get("new.txt").intent_to_add  # type: ignore
+    assert git.index.get("zz.txt").skip_worktree  # type: ignore
+    assert git.is_tracked("src/deep") and git.is_tracked("src/deep/ü.txt")
+    assert not git.is_tracked("src/de") and not git.is_tracked("missing.txt")
+    assert git.dirty_files() == ["new.txt"]
+    (repo / "a.txt").write_text("changed")
+    os.utime(repo / "a.txt", ns=(past, past))
+    (repo / "src" / "b.py").unlink()
+    assert git.dirty_files() == ["a.txt", "new.txt", "src/b.py"]
+    assert git.is_dirty("a.txt") and not git.is_dirty("src/deep/c.py")
+    # Work the index shows isn't needed never starts git
+    git.profiler = Profiler()
+    assert git.untrack("missing.txt", "untracked.txt").return_code == [0]
+    assert git.add_files(["src/deep/c.py", "gone.txt"]).return_code == [0]
+    assert not git.profiler.invocations
+    git.add_files(["a.txt", "src/deep/c.py"])
+    assert len(git.profiler.invocations) == 1
+    assert not git.is_dirty("a.txt")
+    (repo / "loose.txt").write_text("loose")
+    git.rename_file(repo / "loose.txt", "renamed.txt")
+    assert [invocation.subcommand for invocation in git.profiler.invocations] == [
+        "add",
+        "add",
+    ]
+    assert git.is_tracked("renamed.txt")
+    git.profiler = None
+    git.close()
+
+
+def test__live_prompt(dummyrepo: Pathier, tmp_path):
+    repo = tmp_path / "prompt"
+    repo.mkdir()
+    git = Git(True, cwd=repo)
+    git.new_repo()
+    past = time.time_ns() - 10_000_000_000
+    for name in ("a.txt", "b.txt"):
+        (repo / name).write_text(name)
+        os.utime(repo / name, ns=(past, past))
+    git.initcommit()
+    git.run_argv(["update-ref", "refs/remotes/origin/main", "HEAD"])
+    polling = PollingWatcher(find_git_dir(repo), interval=0.01)  # type: ignore
+    assert not polling.wait(0)
+    prompt = LivePrompt(repo, debounce=0.01, poll_interval=0.05)
+    assert prompt.wait(10)
+    assert prompt.render() == f"gitbetter::{repo} [main]>"
+    (repo / "a.txt").write_text("changed")
+    prompt.refresh()
+    assert prompt.stale or prompt.state.dirty == 1  # type: ignore
+    assert prompt.wait(10) and prompt.state.dirty == 1  # type: ignore
+    # Committing changes `.git`, which the watcher picks up without a `refresh()`
+    git.commit_all("Change a")
+    deadline = time.time() + 10
+    while (prompt.state.ahead, prompt.state.dirty) != (1, 0) and time.time() < deadline:  # type: ignore
+        time.sleep(0.01)
+    prompt.wait(10)
+    assert prompt.render().endswith(" [main ↑1]>")
+    assert polling.wait(0)
+    prompt.close()
+    git.close()
+    outside = LivePrompt(tmp_path)
+    assert outside.render() == f"gitbetter::{tmp_path}>" and not outside.stale
+    shell = GitBetter()
+    shell.do_prompt("on")
+    assert shell.prompt.startswith(f"gitbetter::{dummyrepo}")
+    shell.do_prompt("off")
+    assert shell.prompt == f"gitbetter::{dummyrepo}>" and not shell._live_prompt